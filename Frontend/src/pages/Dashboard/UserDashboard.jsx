@@ -11,6 +11,7 @@ const UserDashboard = () => {
   const [location, setLocation] = useState("");
   const [isLocating, setIsLocating] = useState(false);
   const [recipes, setRecipes] = useState([]);
+  const [recipesCreated, setRecipesCreated] = useState(0);
   const [restaurants, setRestaurants] = useState([]);
   const [loading, setLoading] = useState(false);
   const [searchQuery, setSearchQuery] = useState("");
@@ -25,17 +26,23 @@ const UserDashboard = () => {
   const fetchUserContent = async () => {
     try {
       setLoading(true);
-      const [recipesRes, restaurantsRes] = await Promise.all([
-        axios.get(`${API_BASE_URL}/recipes/`, {
+      // The user's recipe count comes from the dashboard endpoint
+      const [recipesRes, restaurantsRes, dashboardRes] = await Promise.all([
+        axios.get(`${API_BASE_URL}/recipes/trending/`, {
           headers: { Authorization: `Bearer ${token}` },
+          params: { limit: 3 },
         }),
         axios.get(`${API_BASE_URL}/restaurants/`, {
           headers: { Authorization: `Bearer ${token}` },
         }),
+        axios.get(`${API_BASE_URL}/user-dashboard/`, {
+          headers: { Authorization: `Bearer ${token}` },
+        }),
       ]);
 
       setRecipes(recipesRes.data.recipes || []);
       setRestaurants(restaurantsRes.data.restaurants || []);
+      setRecipesCreated(dashboardRes.data.stats?.recipes_created || 0);
     } catch (err) {
       console.error("Failed to load content:", err);
     } finally {
@@ -175,7 +182,7 @@ const UserDashboard = () => {
                 <div>
                   <p className="text-gray-600 text-sm mb-1">Recipes Created</p>
                   <p className="text-4xl font-bold text-indigo-600">
-                    {recipes.length}
+                    {recipesCreated}
                   </p>
                 </div>
                 <span className="text-4xl">📖</span>
@@ -237,7 +244,7 @@ const UserDashboard = () => {
           <div className="mb-16">
             <div className="flex justify-between items-center mb-8">
               <h2 className="text-3xl font-bold text-gray-900">
-                Recent Recipes 📖
+                Trending Recipes 📖
               </h2>
               <button
                 onClick={() => navigate("/recipes")}
@@ -14,6 +14,7 @@ const Orders = () => {
   const [cart, setCart] = useState([]);
   const [selectedStore, setSelectedStore] = useState(null);
   const [orders, setOrders] = useState([]);
+  const [ordersCursor, setOrdersCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(null);
@@ -26,9 +27,12 @@ const Orders = () => {
 
   useEffect(() => {
     fetchStores();
-    fetchOrders();
   }, []);
 
+  useEffect(() => {
+    fetchOrders();
+  }, [filter]);
+
   const fetchStores = async () => {
     try {
       const response = await axios.get(`${API_BASE_URL}/restaurants/`, {
@@ -59,12 +63,19 @@ const Orders = () => {
     }
   };
 
-  const fetchOrders = async () => {
+  // Order history is cursor paginated and filtered by status on the server
+  const fetchOrders = async (cursor = null) => {
     try {
+      const params = { page_size: 20 };
+      if (filter !== "all") params.status = filter;
+      if (cursor) params.cursor = cursor;
       const response = await axios.get(`${API_BASE_URL}/orders/`, {
         headers: { Authorization: `Bearer ${token}` },
+        params,
       });
-      setOrders(response.data.orders || []);
+      const page = response.data.orders || [];
+      setOrders((prev) => (cursor ? [...prev, ...page] : page));
+      setOrdersCursor(response.data.next_cursor);
     } catch (err) {
       console.error("Failed to load orders:", err);
     }
@@ -216,11 +227,6 @@ const Orders = () => {
     }
   };
 
-  const filteredOrders =
-    filter === "all"
-      ? orders
-      : orders.filter((order) => order.status?.toLowerCase() === filter);
-
   return (
     <div className="min-h-screen bg-gradient-to-br from-green-50 to-blue-50 py-12">
       <div className="max-w-6xl mx-auto px-4">
@@ -539,7 +545,7 @@ const Orders = () => {
               ))}
             </div>
 
-            {filteredOrders.length === 0 ? (
+            {orders.length === 0 ? (
               <div className="bg-white rounded-lg shadow-md p-12 text-center">
                 <p className="text-3xl mb-4">📭</p>
                 <p className="text-gray-600 text-lg mb-6">
@@ -554,7 +560,7 @@ const Orders = () => {
               </div>
             ) : (
               <div className="space-y-4">
-                {filteredOrders.map((order) => (
+                {orders.map((order) => (
                   <div
                     key={order.id}
                     className="bg-white rounded-lg shadow-md hover:shadow-lg transition-shadow p-6"
@@ -613,6 +619,14 @@ const Orders = () => {
                     )}
                   </div>
                 ))}
+                {ordersCursor && (
+                  <button
+                    onClick={() => fetchOrders(ordersCursor)}
+                    className="w-full px-6 py-2 bg-white text-gray-700 border border-gray-200 rounded-lg hover:bg-gray-50 transition-colors font-medium"
+                  >
+                    Load more orders
+                  </button>
+                )}
               </div>
             )}
           </div>
@@ -24,6 +24,9 @@ const RecipeDetail = () => {
   const [userRating, setUserRating] = useState(null);
   const [successMessage, setSuccessMessage] = useState("");
   const [ratingSort, setRatingSort] = useState("recent");
+  const [reviews, setReviews] = useState([]);
+  const [reviewsCursor, setReviewsCursor] = useState(null);
+  const [reviewsPaged, setReviewsPaged] = useState(false);
 
   useEffect(() => {
     fetchRecipeDetails();
@@ -38,6 +41,9 @@ const RecipeDetail = () => {
       });
       setRecipe(response.data);
       setUserRating(response.data.user_rating);
+      setReviews(response.data.ratings || []);
+      setReviewsCursor(null);
+      setReviewsPaged(false);
       setError(null);
     } catch (err) {
       setError("Failed to load recipe details");
@@ -46,6 +52,31 @@ const RecipeDetail = () => {
     }
   };
 
+  // The recipe embeds only its latest reviews; the rest are cursor paginated.
+  // The first page replaces the embedded ones (same order), later pages append.
+  const fetchReviews = async (cursor = null) => {
+    try {
+      const params = { page_size: 20 };
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API_BASE_URL}/recipes/${id}/ratings/`, {
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem("access_token")}`,
+        },
+        params,
+      });
+      const page = response.data.ratings || [];
+      setReviews((prev) => (cursor ? [...prev, ...page] : page));
+      setReviewsCursor(response.data.next_cursor);
+      setReviewsPaged(true);
+    } catch (err) {
+      console.error("Failed to load reviews:", err);
+    }
+  };
+
+  const hasMoreReviews = reviewsPaged
+    ? Boolean(reviewsCursor)
+    : reviews.length < (recipe?.rating_count || 0);
+
   const handleToggleFavorite = (recipe) => {
     if (isFavoriteRecipe(recipe.id)) {
       removeRecipeFromFavorites(recipe.id);
@@ -273,7 +304,7 @@ const RecipeDetail = () => {
             <div className="mb-8 bg-white rounded-lg shadow-md p-6">
               <div className="flex justify-between items-center mb-6">
                 <h2 className="text-2xl font-bold text-gray-900">
-                  Reviews & Ratings ({recipe.ratings.length})
+                  Reviews & Ratings ({recipe.rating_count})
                 </h2>
                 {recipe.ratings.length > 0 && (
                   <select
@@ -299,12 +330,10 @@ const RecipeDetail = () => {
                       <p className="text-sm text-gray-600">Average Rating</p>
                     </div>
                     {[5, 4, 3, 2, 1].map((stars) => {
-                      const count = recipe.ratings.filter(
-                        (r) => r.rating === stars,
-                      ).length;
+                      const count = recipe.rating_histogram[stars] || 0;
                       const percentage =
-                        recipe.ratings.length > 0
-                          ? Math.round((count / recipe.ratings.length) * 100)
+                        recipe.rating_count > 0
+                          ? Math.round((count / recipe.rating_count) * 100)
                           : 0;
                       return (
                         <div key={stars} className="text-center">
@@ -409,7 +438,7 @@ const RecipeDetail = () => {
               )}
 
               <div className="space-y-4">
-                {recipe.ratings
+                {[...reviews]
                   .sort((a, b) => {
                     if (ratingSort === "recent")
                       return new Date(b.created_at) - new Date(a.created_at);
@@ -461,7 +490,16 @@ const RecipeDetail = () => {
                   ))}
               </div>
 
-              {recipe.ratings.length === 0 && !ratingForm && (
+              {hasMoreReviews && (
+                <button
+                  onClick={() => fetchReviews(reviewsCursor)}
+                  className="w-full mt-4 px-6 py-2 bg-white text-gray-700 border border-gray-200 rounded-lg hover:bg-gray-50 transition-colors font-medium"
+                >
+                  Show more reviews
+                </button>
+              )}
+
+              {reviews.length === 0 && !ratingForm && (
                 <div className="text-center py-8 text-gray-500">
                   <p className="mb-3">📝 Be the first to review this recipe!</p>
                   {user && (
@@ -486,7 +524,7 @@ const RecipeDetail = () => {
                   {recipe.avg_rating}⭐
                 </div>
                 <p className="text-sm text-gray-600">
-                  {recipe.ratings.length} ratings
+                  {recipe.rating_count} ratings
                 </p>
               </div>
 
@@ -21,6 +21,7 @@ const Recipes = () => {
   } = useAuth();
   const navigate = useNavigate();
   const [recipes, setRecipes] = useState([]);
+  const [recipesCursor, setRecipesCursor] = useState(null);
   const [filteredRecipes, setFilteredRecipes] = useState([]);
   const [showForm, setShowForm] = useState(false);
   const [editingId, setEditingId] = useState(null);
@@ -51,19 +52,15 @@ const Recipes = () => {
   const [ratingForm, setRatingForm] = useState(null);
   const [ratingData, setRatingData] = useState({ rating: 5, comment: "" });
 
-  // Fetch all recipes
+  // Difficulty is filtered on the server, so refetch from the first page
   useEffect(() => {
     fetchRecipes();
-  }, []);
+  }, [filterDifficulty]);
 
-  // Filter recipes when search or filter changes
+  // Filter loaded recipes when the search term changes
   useEffect(() => {
     let filtered = recipes;
 
-    if (filterDifficulty !== "all") {
-      filtered = filtered.filter((r) => r.difficulty === filterDifficulty);
-    }
-
     if (searchTerm) {
       filtered = filtered.filter(
         (r) =>
@@ -73,16 +70,23 @@ const Recipes = () => {
     }
 
     setFilteredRecipes(filtered);
-  }, [recipes, filterDifficulty, searchTerm]);
+  }, [recipes, searchTerm]);
 
-  const fetchRecipes = async () => {
+  // Recipes are cursor paginated, newest first
+  const fetchRecipes = async (cursor = null) => {
     try {
+      const params = { page_size: 24 };
+      if (filterDifficulty !== "all") params.difficulty = filterDifficulty;
+      if (cursor) params.cursor = cursor;
       const response = await axios.get(`${API_BASE_URL}/recipes/`, {
         headers: {
           Authorization: `Bearer ${localStorage.getItem("access_token")}`,
         },
+        params,
       });
-      setRecipes(response.data.recipes || []);
+      const page = response.data.recipes || [];
+      setRecipes((prev) => (cursor ? [...prev, ...page] : page));
+      setRecipesCursor(response.data.next_cursor);
       setListError(null);
     } catch (err) {
       setListError("Failed to load recipes");
@@ -508,6 +512,7 @@ const Recipes = () => {
             <div className="flex items-end">
               <p className="text-sm text-gray-600">
                 Found {filteredRecipes.length} recipe(s)
+                {recipesCursor && " so far"}
               </p>
             </div>
           </div>
@@ -705,6 +710,15 @@ const Recipes = () => {
             ))}
           </div>
         )}
+
+        {!recipesLoading && recipesCursor && (
+          <button
+            onClick={() => fetchRecipes(recipesCursor)}
+            className="w-full mt-8 px-6 py-2 bg-white text-gray-700 border border-gray-200 rounded-lg hover:bg-gray-50 transition-colors font-medium"
+          >
+            Load more recipes
+          </button>
+        )}
       </div>
     </div>
   );
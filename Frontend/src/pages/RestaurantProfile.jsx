@@ -31,21 +31,15 @@ const RestaurantProfile = () => {
   const fetchRestaurantDetails = async () => {
     try {
       setLoading(true);
-      const [restaurantRes, menuRes, ratingsRes] = await Promise.all([
-        axios.get(`${API_BASE_URL}/restaurants/${id}/`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        axios.get(`${API_BASE_URL}/restaurants/${id}/menu/`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        axios.get(`${API_BASE_URL}/restaurants/${id}/rating/`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-      ]);
+      // One composite request; the browser revalidates it with its ETag
+      const response = await axios.get(`${API_BASE_URL}/restaurants/${id}/page/`, {
+        params: { include: "location,menu,ratings", ratings_limit: 50 },
+        headers: { Authorization: `Bearer ${token}` },
+      });
 
-      setRestaurant(restaurantRes.data);
-      setMenu(menuRes.data.menu || []);
-      setRatings(ratingsRes.data.ratings || []);
+      setRestaurant(response.data);
+      setMenu(response.data.menu || []);
+      setRatings(response.data.ratings || []);
       setError(null);
     } catch (err) {
       setError("Failed to load restaurant details");
@@ -140,34 +134,34 @@ const RestaurantProfile = () => {
                 ⭐ {restaurant.rating_avg || "N/A"}
               </p>
               <p className="text-orange-100 text-sm">
-                ({restaurant.number_of_ratings || 0} reviews)
+                ({restaurant.total_ratings || 0} reviews)
               </p>
             </div>
 
-            {restaurant.restaurant_location && (
+            {restaurant.location && (
               <>
                 <div>
                   <p className="text-orange-100 text-sm">Location</p>
                   <p className="text-xl font-semibold">
-                    {restaurant.restaurant_location.city},{" "}
-                    {restaurant.restaurant_location.country}
+                    {restaurant.location.city},{" "}
+                    {restaurant.location.country}
                   </p>
                 </div>
 
-                {restaurant.restaurant_location.phone && (
+                {restaurant.location.phone_number && (
                   <div>
                     <p className="text-orange-100 text-sm">Phone</p>
                     <p className="text-xl font-semibold">
-                      {restaurant.restaurant_location.phone}
+                      {restaurant.location.phone_number}
                     </p>
                   </div>
                 )}
 
-                {restaurant.restaurant_location.hours && (
+                {restaurant.location.hours && (
                   <div>
                     <p className="text-orange-100 text-sm">Hours</p>
                     <p className="text-xl font-semibold">
-                      {restaurant.restaurant_location.hours}
+                      {restaurant.location.hours}
                     </p>
                   </div>
                 )}
@@ -198,7 +192,7 @@ const RestaurantProfile = () => {
         {/* Details Tab */}
         {activeTab === "details" && (
           <div className="bg-white rounded-lg shadow-lg p-8 space-y-6">
-            {restaurant.restaurant_location && (
+            {restaurant.location && (
               <>
                 <div>
                   <h3 className="text-xl font-bold text-gray-900 mb-4">
@@ -208,20 +202,20 @@ const RestaurantProfile = () => {
                     <div>
                       <p className="text-gray-600 text-sm">City</p>
                       <p className="text-lg font-semibold">
-                        {restaurant.restaurant_location.city}
+                        {restaurant.location.city}
                       </p>
                     </div>
                     <div>
                       <p className="text-gray-600 text-sm">Country</p>
                       <p className="text-lg font-semibold">
-                        {restaurant.restaurant_location.country}
+                        {restaurant.location.country}
                       </p>
                     </div>
-                    {restaurant.restaurant_location.postal_code && (
+                    {restaurant.location.postal_code && (
                       <div>
                         <p className="text-gray-600 text-sm">Postal Code</p>
                         <p className="text-lg font-semibold">
-                          {restaurant.restaurant_location.postal_code}
+                          {restaurant.location.postal_code}
                         </p>
                       </div>
                     )}
@@ -233,19 +227,19 @@ const RestaurantProfile = () => {
                     📞 Contact Information
                   </h3>
                   <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
-                    {restaurant.restaurant_location.phone && (
+                    {restaurant.location.phone_number && (
                       <div>
                         <p className="text-gray-600 text-sm">Phone</p>
                         <p className="text-lg font-semibold">
-                          {restaurant.restaurant_location.phone}
+                          {restaurant.location.phone_number}
                         </p>
                       </div>
                     )}
-                    {restaurant.restaurant_location.website && (
+                    {restaurant.location.website && (
                       <div>
                         <p className="text-gray-600 text-sm">Website</p>
                         <a
-                          href={restaurant.restaurant_location.website}
+                          href={restaurant.location.website}
                           target="_blank"
                           rel="noopener noreferrer"
                           className="text-lg font-semibold text-blue-600 hover:text-blue-700"
@@ -254,11 +248,11 @@ const RestaurantProfile = () => {
                         </a>
                       </div>
                     )}
-                    {restaurant.restaurant_location.hours && (
+                    {restaurant.location.hours && (
                       <div className="md:col-span-2">
                         <p className="text-gray-600 text-sm">Hours</p>
                         <p className="text-lg font-semibold">
-                          {restaurant.restaurant_location.hours}
+                          {restaurant.location.hours}
                         </p>
                       </div>
                     )}
@@ -267,13 +261,13 @@ const RestaurantProfile = () => {
               </>
             )}
 
-            {restaurant.description && (
+            {restaurant.restaurant_description && (
               <div className="border-t pt-6">
                 <h3 className="text-xl font-bold text-gray-900 mb-4">
                   About
                 </h3>
                 <p className="text-gray-700 leading-relaxed">
-                  {restaurant.description}
+                  {restaurant.restaurant_description}
                 </p>
               </div>
             )}
@@ -18,6 +18,7 @@ const RestaurantSearch = () => {
   const navigate = useNavigate();
   const [restaurants, setRestaurants] = useState([]);
   const [filteredRestaurants, setFilteredRestaurants] = useState([]);
+  const [restaurantsCursor, setRestaurantsCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [useLocation, setUseLocation] = useState(false);
@@ -62,18 +63,16 @@ const RestaurantSearch = () => {
   const searchNearbyRestaurants = async (lat, lng) => {
     try {
       setLoading(true);
-      const response = await axios.post(
-        `${API_BASE_URL}/restaurants/nearby/`,
-        {
-          latitude: lat,
-          longitude: lng,
+      // GET so the browser and the server can reuse results for the same area
+      const response = await axios.get(`${API_BASE_URL}/restaurants/nearby/`, {
+        params: {
+          latitude: lat.toFixed(6),
+          longitude: lng.toFixed(6),
           radius: searchParams.radius,
           cuisine_type: searchParams.cuisineType || undefined,
         },
-        {
-          headers: { Authorization: `Bearer ${token}` },
-        },
-      );
+        headers: { Authorization: `Bearer ${token}` },
+      });
 
       setRestaurants(response.data.restaurants || []);
       setFilteredRestaurants(response.data.restaurants || []);
@@ -86,16 +85,20 @@ const RestaurantSearch = () => {
     }
   };
 
-  // Load all restaurants (non-geolocation search)
-  const loadAllRestaurants = async () => {
+  // Load all restaurants (non-geolocation search), one cursor page at a time
+  const loadAllRestaurants = async (cursor = null) => {
     try {
       setLoading(true);
+      const params = { page_size: 50 };
+      if (cursor) params.cursor = cursor;
       const response = await axios.get(`${API_BASE_URL}/restaurants/`, {
+        params,
         headers: { Authorization: `Bearer ${token}` },
       });
 
-      setRestaurants(response.data.restaurants || []);
-      setFilteredRestaurants(response.data.restaurants || []);
+      const page = response.data.restaurants || [];
+      setRestaurants((prev) => (cursor ? [...prev, ...page] : page));
+      setRestaurantsCursor(response.data.next_cursor);
       setUseLocation(false);
       setError(null);
     } catch (err) {
@@ -115,17 +118,22 @@ const RestaurantSearch = () => {
 
     if (useLocation && searchParams.latitude && searchParams.longitude) {
       searchNearbyRestaurants(searchParams.latitude, searchParams.longitude);
-    } else {
-      let filtered = restaurants;
-      if (cuisine) {
-        filtered = restaurants.filter((r) =>
-          r.cuisine_type?.toLowerCase().includes(cuisine.toLowerCase()),
-        );
-      }
-      setFilteredRestaurants(filtered);
     }
   };
 
+  // Outside location search the cuisine filter applies to the pages loaded so far
+  useEffect(() => {
+    if (useLocation) return;
+    const cuisine = searchParams.cuisineType.toLowerCase();
+    setFilteredRestaurants(
+      cuisine
+        ? restaurants.filter((r) =>
+            r.cuisine_type?.toLowerCase().includes(cuisine),
+          )
+        : restaurants,
+    );
+  }, [restaurants, searchParams.cuisineType, useLocation]);
+
   // Handle radius change
   const handleRadiusChange = (e) => {
     const newRadius = parseInt(e.target.value);
@@ -252,7 +260,7 @@ const RestaurantSearch = () => {
             {useLocation && (
               <div className="md:col-span-2">
                 <button
-                  onClick={loadAllRestaurants}
+                  onClick={() => loadAllRestaurants()}
                   className="w-full px-6 py-3 border-2 border-gray-300 text-gray-700 rounded-lg hover:bg-gray-50 transition-colors font-medium"
                 >
                   View All Restaurants
@@ -334,7 +342,8 @@ const RestaurantSearch = () => {
             <h2 className="text-3xl font-bold text-gray-900">
               {useLocation ? "Nearby Restaurants" : "All Restaurants"}
               <span className="text-lg text-gray-600 font-normal ml-2">
-                ({filteredRestaurants.length})
+                ({filteredRestaurants.length}
+                {!useLocation && restaurantsCursor && "+"})
               </span>
             </h2>
           </div>
@@ -462,6 +471,15 @@ const RestaurantSearch = () => {
               ))}
             </div>
           )}
+
+          {!useLocation && !loading && restaurantsCursor && (
+            <button
+              onClick={() => loadAllRestaurants(restaurantsCursor)}
+              className="w-full mt-6 px-6 py-2 bg-white text-gray-700 border border-gray-200 rounded-lg hover:bg-gray-50 transition-colors font-medium"
+            >
+              Load more restaurants
+            </button>
+          )}
         </div>
 
         {/* Map Info */}
@@ -23,8 +23,9 @@ const Home = () => {
     try {
       const token = localStorage.getItem("access_token");
       const [recipesRes, restaurantsRes] = await Promise.all([
-        axios.get(`${API_BASE_URL}/recipes/`, {
+        axios.get(`${API_BASE_URL}/recipes/trending/`, {
           headers: { Authorization: `Bearer ${token}` },
+          params: { limit: 6 },
         }),
         axios.get(`${API_BASE_URL}/restaurants/`, {
           headers: { Authorization: `Bearer ${token}` },
@@ -158,7 +159,7 @@ const Home = () => {
           {(user?.role === "chef" || user?.role === "restaurant" || user?.role === "admin" || user?.role === "normal" || user?.role === "customer") && (
             <div className="mb-16">
               <div className="flex justify-between items-center mb-8">
-                <h2 className="text-3xl font-bold text-gray-900">Latest Recipes 🔥</h2>
+                <h2 className="text-3xl font-bold text-gray-900">Trending Recipes 🔥</h2>
                 <Link to="/recipes" className="text-orange-600 hover:text-orange-700 font-semibold">
                   View All →
                 </Link>
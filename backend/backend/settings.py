@@ -99,6 +99,56 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Cache
+# LocMemCache is per process; use a shared backend (Redis/Memcached) when
+# running several workers so signal-driven invalidation reaches all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+RECIPE_CACHE_TIMEOUT = 300  # seconds
+
+# Recipe view counter: hits are buffered per process and spilled to the
+# RecipeViewBuffer table; run `manage.py flush_recipe_views` periodically.
+RECIPE_VIEW_SPILL_INTERVAL = 30  # seconds
+RECIPE_VIEW_SPILL_THRESHOLD = 500  # hits
+
+# Trending recipes: interactions lose half their weight every N hours
+TRENDING_HALF_LIFE_HOURS = 48
+
+# GET /api/restaurants/nearby/ snaps the search point to a grid cell and
+# caches results per cell; NEARBY_TILE_DEGREES is the invalidation granularity
+NEARBY_GRID_DEGREES = 0.01  # ~1.1 km
+NEARBY_TILE_DEGREES = 1.0
+NEARBY_CACHE_TIMEOUT = 120  # seconds
+NEARBY_CACHE_MAX_AGE = 30  # seconds, sent to clients
+
+# GET /api/restaurants/tiles/<z>/<x>/<y>/ returns clusters below this zoom and
+# individual restaurants from it on
+MAP_CLUSTER_MAX_ZOOM = 14
+MAP_TILE_CACHE_TIMEOUT = 300  # seconds
+
+# Upper edges of the price range facet of GET /api/store-products/catalog/
+CATALOG_PRICE_BUCKETS = (5, 10, 25, 50, 100)
+
+# Orders hold their stock this long awaiting payment; run
+# `manage.py release_expired_reservations` every minute or so to return it
+ORDER_RESERVATION_MINUTES = 15
+
+# Responses stored for Idempotency-Key headers are replayed this long;
+# `manage.py purge_idempotency_keys` deletes older ones
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# GET /api/store-orders/?wait=N long-polls for at most this many seconds; each
+# waiting request holds a worker, so size the worker pool accordingly
+ORDER_INBOX_MAX_WAIT = 25
+ORDER_INBOX_RECHECK_SECONDS = 5
+# The inbox holds back changes younger than this, so order writes still in
+# flight commit before a cursor can move past them; keep it above the longest
+# order transaction
+ORDER_INBOX_SETTLE_SECONDS = 2
+
 # JWT Configuration
 from datetime import timedelta
 
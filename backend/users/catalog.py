@@ -0,0 +1,116 @@
+"""
+Cross-store product catalog: filtering, full-text relevance and facets.
+
+On SQLite, products are indexed in the `product_fts` FTS5 table, kept in sync
+by triggers created in migration 0020; other databases fall back to icontains
+matching without relevance ordering. Facet counts for the whole result set
+come from one GROUP BY category pass with conditional counts, so browsing
+costs one aggregate query plus one query per page.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, FloatField, Max, Min, Q
+from django.db.models.expressions import RawSQL
+
+from .models import StoreProduct
+from .search import TOKEN_RE, build_match_query
+
+# product_fts: name, description, category
+PRODUCT_BM25_WEIGHTS = (10.0, 2.0, 4.0)
+
+# Sort options for the catalog: keyset ordering, always ending in a unique column
+PRODUCT_SORTS = {
+    'relevance': ('-search_rank', 'id'),
+    'newest': ('-created_at', 'id'),
+    'price': ('price', 'id'),
+    'price_desc': ('-price', 'id'),
+    'name': ('name', 'id'),
+}
+
+
+def price_bucket_edges():
+    return tuple(getattr(settings, 'CATALOG_PRICE_BUCKETS', (5, 10, 25, 50, 100)))
+
+
+def full_text_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def catalog_products(text=None, min_price=None, max_price=None, in_stock=False, store_id=None):
+    """Products of verified stores matching every given filter except category"""
+    products = StoreProduct.objects.filter(store__is_verified=True)
+    if store_id is not None:
+        products = products.filter(store_id=store_id)
+    if in_stock:
+        products = products.filter(is_available=True, stock__gt=0)
+    if min_price is not None:
+        products = products.filter(price__gte=min_price)
+    if max_price is not None:
+        products = products.filter(price__lte=max_price)
+
+    match = build_match_query(text) if text else None
+    if match is not None:
+        if full_text_enabled():
+            products = products.filter(pk__in=RawSQL(
+                'SELECT rowid FROM product_fts WHERE product_fts MATCH %s', (match,)
+            ))
+        else:
+            for token in TOKEN_RE.findall(text):
+                products = products.filter(
+                    Q(name__icontains=token) | Q(description__icontains=token) | Q(category__icontains=token)
+                )
+    return products
+
+
+def rank_products(products, text):
+    """Annotate `search_rank` (BM25, higher is better) for the relevance sort"""
+    table = StoreProduct._meta.db_table
+    return products.annotate(search_rank=RawSQL(
+        f"""
+        SELECT -bm25(product_fts, %s, %s, %s) FROM product_fts
+        WHERE product_fts MATCH %s AND product_fts.rowid = {table}.id
+        """,
+        (*PRODUCT_BM25_WEIGHTS, build_match_query(text)),
+        output_field=FloatField(),
+    ))
+
+
+def catalog_facets(products, category=None):
+    """
+    Facets of `products` in one aggregate query. Category counts ignore the
+    category filter so every choice stays visible; the other facets and the
+    total apply it.
+    """
+    edges = price_bucket_edges()
+    bounds = list(zip((0, *edges), (*edges, None)))
+    buckets = {
+        f'price_{index}': Count('id', filter=Q(price__gte=low) & (Q(price__lt=high) if high is not None else Q()))
+        for index, (low, high) in enumerate(bounds)
+    }
+    rows = list(
+        products.order_by().values('category').annotate(
+            count=Count('id'),
+            in_stock=Count('id', filter=Q(is_available=True, stock__gt=0)),
+            price_min=Min('price'),
+            price_max=Max('price'),
+            **buckets,
+        )
+    )
+
+    selected = [row for row in rows if not category or row['category'].lower() == category.lower()]
+    prices_min = [row['price_min'] for row in selected]
+    prices_max = [row['price_max'] for row in selected]
+    return {
+        'count': sum(row['count'] for row in selected),
+        'categories': sorted(
+            ({'category': row['category'], 'count': row['count']} for row in rows),
+            key=lambda facet: (-facet['count'], facet['category']),
+        ),
+        'price_ranges': [
+            {'min': low, 'max': high, 'count': sum(row[f'price_{index}'] for row in selected)}
+            for index, (low, high) in enumerate(bounds)
+        ],
+        'in_stock': sum(row['in_stock'] for row in selected),
+        'price_min': min(prices_min) if prices_min else None,
+        'price_max': max(prices_max) if prices_max else None,
+    }
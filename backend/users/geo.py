@@ -0,0 +1,112 @@
+"""
+Nearby restaurant search.
+
+With NumPy installed, distances come from the in-memory array index in
+users.geo_index and only the final page of restaurants is read from the
+database. Otherwise candidates come from an indexed bounding-box range query
+on RestaurantLocation (latitude, longitude); the exact haversine distance is
+only computed for the rows inside the box.
+"""
+import math
+
+from django.db.models import Q
+
+from .models import RestaurantLocation, RestaurantUserProfile
+from .opening_hours import open_at_filter, open_restaurant_ids
+
+try:
+    from .geo_index import restaurant_index
+except ImportError:  # NumPy is not installed
+    restaurant_index = None
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    (min_lat, max_lat, min_lon, max_lon) enclosing the circle. min_lon > max_lon
+    means the box wraps the antimeridian; a box touching a pole spans all
+    longitudes.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), -180, 180
+
+    # Widest point of the circle in longitude (not at the centre's latitude)
+    dlon = math.degrees(math.asin(min(1.0, math.sin(math.radians(dlat)) / math.cos(math.radians(lat)))))
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def bounding_box_filter(lat, lon, radius_km):
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    in_box = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lon <= max_lon:
+        return in_box & Q(longitude__gte=min_lon, longitude__lte=max_lon)
+    return in_box & (Q(longitude__gte=min_lon) | Q(longitude__lte=max_lon))
+
+
+def nearby_restaurants(lat, lon, radius_km, cuisine='', limit=None, open_at=None):
+    """
+    Verified restaurants within `radius_km`, nearest first, each with
+    `distance_km` set and its location already loaded. With `open_at`, only
+    restaurants open at that time.
+    """
+    if restaurant_index is None:
+        return nearby_from_database(lat, lon, radius_km, cuisine, limit, open_at)
+
+    keep = (lambda candidates: open_restaurant_ids(candidates, open_at)) if open_at else None
+    hits = restaurant_index.nearby(lat, lon, radius_km, cuisine, limit, keep)
+    restaurants = (
+        RestaurantUserProfile.objects.filter(is_verified=True)
+        .select_related('location')
+        .in_bulk([restaurant_id for restaurant_id, _ in hits])
+    )
+    nearby = []
+    for restaurant_id, distance in hits:
+        restaurant = restaurants.get(restaurant_id)
+        if restaurant is not None:
+            restaurant.distance_km = round(distance, 3)
+            nearby.append(restaurant)
+    return nearby
+
+
+def nearby_from_database(lat, lon, radius_km, cuisine='', limit=None, open_at=None):
+    """nearby_restaurants() without the in-memory index"""
+    locations = (
+        RestaurantLocation.objects
+        .filter(bounding_box_filter(lat, lon, radius_km), restaurant__is_verified=True)
+        .select_related('restaurant')
+        .order_by()
+    )
+    if cuisine:
+        locations = locations.filter(restaurant__cuisine_type__icontains=cuisine)
+    if open_at:
+        locations = locations.filter(open_at_filter(open_at, location='pk'))
+
+    nearby = []
+    for location in locations:
+        distance = haversine_km(lat, lon, float(location.latitude), float(location.longitude))
+        if distance <= radius_km:
+            restaurant = location.restaurant
+            restaurant.distance_km = round(distance, 3)
+            nearby.append(restaurant)
+
+    nearby.sort(key=lambda restaurant: (restaurant.distance_km, restaurant.pk))
+    if limit:
+        nearby = nearby[:limit]
+    return nearby
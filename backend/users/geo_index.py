@@ -0,0 +1,175 @@
+"""
+Process-local, array-backed index of verified restaurant locations.
+
+Coordinates (in radians), restaurant ids and cuisine codes are held in
+contiguous NumPy arrays, so a nearby query is a single vectorized haversine
+pass with no ORM objects built for the candidates. Signal handlers in
+users.signals patch single rows after each commit. A version counter in the
+shared cache tells other processes that their snapshot is stale; they rebuild
+it on their next query.
+"""
+import threading
+
+from django.core.cache import cache
+import numpy as np
+
+from .models import RestaurantLocation
+
+VERSION_KEY = 'restaurant:geo-index:version'
+EARTH_RADIUS_KM = 6371.0
+INITIAL_CAPACITY = 1024
+
+
+class GeoIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.version = None
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+
+    def load(self):
+        rows = list(
+            RestaurantLocation.objects.filter(restaurant__is_verified=True)
+            .order_by()
+            .values_list('restaurant_id', 'latitude', 'longitude', 'restaurant__cuisine_type')
+        )
+        self.cuisines = {}
+        self.size = 0
+        self.positions = {}
+        self.allocate(max(INITIAL_CAPACITY, len(rows)))
+        for restaurant_id, latitude, longitude, cuisine_type in rows:
+            self.put(restaurant_id, latitude, longitude, cuisine_type)
+        self.version = cache.get_or_set(VERSION_KEY, 0, None)
+        self.loaded = True
+
+    def allocate(self, capacity):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.lat = np.zeros(capacity, dtype=np.float64)
+        self.lon = np.zeros(capacity, dtype=np.float64)
+        self.cos_lat = np.zeros(capacity, dtype=np.float64)
+        self.cuisine = np.zeros(capacity, dtype=np.int32)
+
+    def grow(self):
+        size = self.size
+        old = self.ids, self.lat, self.lon, self.cos_lat, self.cuisine
+        self.allocate(len(self.ids) * 2)
+        for new, array in zip((self.ids, self.lat, self.lon, self.cos_lat, self.cuisine), old):
+            new[:size] = array[:size]
+
+    def cuisine_code(self, cuisine_type):
+        name = (cuisine_type or '').strip().lower()
+        return self.cuisines.setdefault(name, len(self.cuisines))
+
+    def put(self, restaurant_id, latitude, longitude, cuisine_type):
+        row = self.positions.get(restaurant_id)
+        if row is None:
+            if self.size == len(self.ids):
+                self.grow()
+            row = self.size
+            self.size += 1
+            self.positions[restaurant_id] = row
+        lat = np.radians(float(latitude))
+        self.ids[row] = restaurant_id
+        self.lat[row] = lat
+        self.lon[row] = np.radians(float(longitude))
+        self.cos_lat[row] = np.cos(lat)
+        self.cuisine[row] = self.cuisine_code(cuisine_type)
+
+    def remove(self, restaurant_id):
+        """Swap the last row into the removed one so the arrays stay dense"""
+        row = self.positions.pop(restaurant_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            for array in (self.ids, self.lat, self.lon, self.cos_lat, self.cuisine):
+                array[row] = array[last]
+            self.positions[int(self.ids[row])] = row
+        self.size = last
+
+    # ------------------------------------------------------------------
+    # Freshness
+    # ------------------------------------------------------------------
+
+    def ensure_fresh(self):
+        if not self.loaded or cache.get(VERSION_KEY) != self.version:
+            self.load()
+
+    def bump_version(self):
+        """Advance the shared version; a gap means another process changed rows too"""
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+            version = 1
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+        else:
+            self.loaded = False
+
+    def update_restaurant(self, restaurant_id):
+        """Re-read one restaurant's row after a change to it or its location"""
+        row = (
+            RestaurantLocation.objects.filter(restaurant_id=restaurant_id, restaurant__is_verified=True)
+            .order_by()
+            .values_list('latitude', 'longitude', 'restaurant__cuisine_type')
+            .first()
+        )
+        with self.lock:
+            if self.loaded:
+                if row is None:
+                    self.remove(restaurant_id)
+                else:
+                    self.put(restaurant_id, *row)
+            self.bump_version()
+
+    def invalidate(self):
+        """Force every process to rebuild, e.g. after bulk writes that skip signals"""
+        with self.lock:
+            self.loaded = False
+            self.bump_version()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def nearby(self, lat, lon, radius_km, cuisine='', limit=None, keep=None):
+        """
+        [(restaurant_id, distance_km)] within the radius, nearest first.
+        `keep(ids)`, if given, receives the ids within the radius and returns
+        the ones to keep (e.g. those open now); it runs outside the lock.
+        """
+        with self.lock:
+            self.ensure_fresh()
+            size = self.size
+            ids = self.ids[:size]
+            lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+            dlat = self.lat[:size] - lat_rad
+            dlon = self.lon[:size] - lon_rad
+            a = np.sin(dlat / 2) ** 2 + np.cos(lat_rad) * self.cos_lat[:size] * np.sin(dlon / 2) ** 2
+            distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+            mask = distance <= radius_km
+            if cuisine:
+                needle = cuisine.lower()
+                codes = [code for name, code in self.cuisines.items() if needle in name]
+                mask &= np.isin(self.cuisine[:size], codes)
+            matches = np.flatnonzero(mask)
+            ids = ids[matches].copy()
+            distance = distance[matches]
+
+        if keep is not None and len(ids):
+            kept = np.isin(ids, np.fromiter(keep(ids.tolist()), dtype=np.int64))
+            ids, distance = ids[kept], distance[kept]
+        if limit and limit < len(ids):
+            nearest = np.argpartition(distance, limit - 1)[:limit]
+            ids, distance = ids[nearest], distance[nearest]
+        order = np.lexsort((ids, distance))
+        return [(int(ids[i]), float(distance[i])) for i in order]
+
+
+restaurant_index = GeoIndex()
@@ -0,0 +1,64 @@
+"""
+Idempotency keys for write endpoints.
+
+A client that may retry a request sends the same `Idempotency-Key` header
+each time. The first successful response is stored in the same transaction
+as the writes it describes, keyed by (user, endpoint, key). Later requests
+with that key get the stored response replayed instead of being executed
+again. If two copies of a request race, the unique constraint makes the
+second one roll back, and it then replays the first one's response. Reusing
+a key for a different request body is rejected. Keys are forgotten after
+IDEMPOTENCY_KEY_TTL_HOURS.
+"""
+from datetime import timedelta
+import hashlib
+import json
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body"""
+
+
+def get_key(request):
+    """The request's idempotency key; raises ValueError when it is too long"""
+    key = request.headers.get(HEADER, '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f'{HEADER} must be at most {MAX_KEY_LENGTH} characters')
+    return key or None
+
+
+def request_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def find_replay(user, endpoint, key, data):
+    """Response stored for this key, or None; raises IdempotencyKeyReused"""
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    record = IdempotencyRecord.objects.filter(user=user, endpoint=endpoint, key=key).first()
+    if record is None:
+        return None
+    if record.created_at < cutoff:
+        record.delete()
+        return None
+    if record.request_hash != request_hash(data):
+        raise IdempotencyKeyReused(key)
+    response = Response(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def store_response(user, endpoint, key, data, response):
+    """Remember `response` for the key; call inside the transaction doing the writes"""
+    IdempotencyRecord.objects.create(
+        user=user, endpoint=endpoint, key=key, request_hash=request_hash(data),
+        status_code=response.status_code, response=response.data,
+    )
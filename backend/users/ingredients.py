@@ -0,0 +1,183 @@
+"""
+Ingredient parsing and the Recipe -> Ingredient inverted index.
+
+`Recipe.ingredients` is free text ("2 cups flour, 3 eggs" or a JSON list), so
+it is parsed into normalized names on save and stored as RecipeIngredient
+rows. Pantry queries then intersect posting lists by ingredient id instead of
+parsing every recipe.
+"""
+from collections import defaultdict
+import json
+import re
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField
+from django.db.models.functions import Cast
+
+from .models import Ingredient, Recipe, RecipeIngredient
+
+MAX_NAME_LENGTH = 100
+
+SPLIT_RE = re.compile(r'[,;\n]+')
+PARENTHESES_RE = re.compile(r'\([^)]*\)')
+QUANTITY_RE = re.compile(r'^[\d\s/.,\-½⅓⅔¼¾⅛]+')
+NON_WORD_RE = re.compile(r'[^\w\s-]+', re.UNICODE)
+
+UNITS = {
+    'cup', 'cups', 'c', 'tbsp', 'tbs', 'tablespoon', 'tablespoons', 'tsp', 'teaspoon', 'teaspoons',
+    'g', 'gram', 'grams', 'kg', 'kilogram', 'kilograms', 'mg', 'ml', 'l', 'litre', 'litres', 'liter',
+    'liters', 'oz', 'ounce', 'ounces', 'lb', 'lbs', 'pound', 'pounds', 'pinch', 'dash', 'clove',
+    'cloves', 'can', 'cans', 'slice', 'slices', 'piece', 'pieces', 'handful', 'bunch', 'sprig',
+    'sprigs', 'stick', 'sticks', 'pack', 'packet', 'of',
+}
+DESCRIPTORS = {
+    'fresh', 'freshly', 'chopped', 'diced', 'minced', 'sliced', 'grated', 'large', 'small', 'medium',
+    'finely', 'roughly', 'whole', 'ripe', 'optional', 'to', 'taste', 'for', 'serving', 'some', 'a', 'an',
+}
+
+
+def singularize(word):
+    if len(word) <= 3 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(text):
+    """'2 cups Chopped Tomatoes (ripe)' -> 'tomato'; returns '' when nothing is left"""
+    text = PARENTHESES_RE.sub(' ', text.lower())
+    text = QUANTITY_RE.sub('', text.strip())
+    words = NON_WORD_RE.sub(' ', text).split()
+    while words and (words[0] in UNITS or words[0] in DESCRIPTORS or words[0].isdigit()):
+        words.pop(0)
+    words = [word for word in words if word not in DESCRIPTORS]
+    if not words:
+        return ''
+    words[-1] = singularize(words[-1])
+    return ' '.join(words)[:MAX_NAME_LENGTH]
+
+
+def split_ingredients(raw):
+    """Split the raw ingredients field, accepting a JSON list or delimited text"""
+    raw = (raw or '').strip()
+    if raw.startswith('['):
+        try:
+            items = json.loads(raw)
+        except ValueError:
+            items = None
+        if isinstance(items, list):
+            names = []
+            for item in items:
+                if isinstance(item, dict):
+                    item = item.get('name') or item.get('ingredient') or ''
+                names.append(str(item))
+            return names
+    return SPLIT_RE.split(raw)
+
+
+def parse_ingredients(raw):
+    """Set of normalized ingredient names in a recipe's ingredients field"""
+    return {name for name in map(normalize_ingredient, split_ingredients(raw)) if name}
+
+
+def get_ingredient_ids(names, create=False):
+    """Map normalized names to Ingredient ids, optionally creating missing ones"""
+    names = set(names)
+    if not names:
+        return {}
+    ids = dict(Ingredient.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - ids.keys()
+    if create and missing:
+        Ingredient.objects.bulk_create([Ingredient(name=name) for name in missing], ignore_conflicts=True)
+        ids.update(Ingredient.objects.filter(name__in=missing).values_list('name', 'id'))
+    return ids
+
+
+def sync_recipe_ingredients(recipe):
+    """Bring a recipe's RecipeIngredient rows in line with its ingredients text"""
+    names = parse_ingredients(recipe.ingredients)
+    with transaction.atomic():
+        wanted = set(get_ingredient_ids(names, create=True).values())
+        current = set(
+            RecipeIngredient.objects.filter(recipe=recipe).values_list('ingredient_id', flat=True)
+        )
+        if current - wanted:
+            RecipeIngredient.objects.filter(recipe=recipe, ingredient_id__in=current - wanted).delete()
+        if wanted - current:
+            RecipeIngredient.objects.bulk_create(
+                [RecipeIngredient(recipe=recipe, ingredient_id=pk) for pk in wanted - current],
+                ignore_conflicts=True,
+            )
+        if recipe.ingredient_count != len(wanted):
+            Recipe.objects.filter(pk=recipe.pk).update(ingredient_count=len(wanted))
+            recipe.ingredient_count = len(wanted)
+    return names
+
+
+def prepare_recipe_ingredients(recipes):
+    """
+    Bulk variant of sync_recipe_ingredients for recipes about to be bulk-created:
+    sets `ingredient_count` on each instance and returns the unsaved index rows
+    to bulk_create once the recipes exist.
+    """
+    parsed = {recipe.pk: parse_ingredients(recipe.ingredients) for recipe in recipes}
+    ids = get_ingredient_ids(set().union(*parsed.values()), create=True)
+    for recipe in recipes:
+        recipe.ingredient_count = len(parsed[recipe.pk])
+    return [
+        RecipeIngredient(recipe_id=pk, ingredient_id=ids[name])
+        for pk, names in parsed.items()
+        for name in names
+    ]
+
+
+def recipes_for_pantry(pantry, max_missing=None, limit=20):
+    """
+    Rank recipes by how much of their ingredient list the pantry covers.
+
+    Only the posting lists of the pantry's ingredients are read: one grouped
+    query over RecipeIngredient counts matches per recipe, so recipes sharing
+    nothing with the pantry are never touched. Each returned recipe carries
+    `matched_count`, `missing_count`, `coverage` and `missing_ingredients`.
+    """
+    names = {name for name in map(normalize_ingredient, pantry) if name}
+    ingredient_ids = list(get_ingredient_ids(names).values())
+    if not ingredient_ids:
+        return []
+
+    rows = (
+        RecipeIngredient.objects.filter(ingredient_id__in=ingredient_ids)
+        .values('recipe_id')
+        .annotate(matched=Count('id'), total=F('recipe__ingredient_count'))
+        .annotate(coverage=Cast('matched', FloatField()) / F('total'))
+    )
+    if max_missing is not None:
+        rows = rows.filter(total__lte=F('matched') + max_missing)
+    rows = list(rows.order_by('-coverage', '-matched', 'recipe_id')[:limit])
+
+    recipe_ids = [row['recipe_id'] for row in rows]
+    recipes = Recipe.objects.select_related('author__profile').in_bulk(recipe_ids)
+    missing = defaultdict(list)
+    for recipe_id, name in (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .exclude(ingredient_id__in=ingredient_ids)
+        .values_list('recipe_id', 'ingredient__name')
+    ):
+        missing[recipe_id].append(name)
+
+    results = []
+    for row in rows:
+        recipe = recipes.get(row['recipe_id'])
+        if recipe is None:
+            continue
+        recipe.matched_count = row['matched']
+        recipe.missing_count = row['total'] - row['matched']
+        recipe.coverage = round(row['coverage'], 4)
+        recipe.missing_ingredients = sorted(missing[recipe.pk])
+        results.append(recipe)
+    return results
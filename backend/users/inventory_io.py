@@ -0,0 +1,130 @@
+"""
+Streaming inventory sync of a store's products (NDJSON or CSV).
+
+Records are matched to existing StoreProduct rows on the store-scoped `sku`.
+They are read one at a time (see recipe_io.iter_records) and buffered into
+chunks; each chunk costs one lookup of its SKUs, then one bulk_update for
+changed products and one bulk_create for new ones, in a single transaction.
+Results are yielded per record as soon as their chunk is applied, so memory
+use depends on the chunk size only, never on the file size.
+
+A SKU repeated within a chunk flushes the chunk first, so later lines of the
+file always win. A dry run writes nothing, so it keeps the products it would
+have created or changed in memory and diffs later lines for their SKUs against
+them; its memory use grows with the number of such SKUs.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import StoreProduct
+from .serializers import StoreProductSerializer
+
+CHUNK_SIZE = 500
+
+
+class InventorySync:
+    """Diff records against a store's products and apply them in chunks"""
+
+    def __init__(self, store, chunk_size=CHUNK_SIZE, dry_run=False):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        # (line_number, sku, record) in file order; record is a ready result for invalid lines
+        self.pending = []
+        self.pending_skus = set()
+        self.summary = {'processed': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+        # Products a dry run would have created or changed, by sku
+        self.simulated = {}
+
+    def run(self, records):
+        """Yield one result dict per record, in file order: line, sku, status and, on failure, errors"""
+        for result in self.sync(records):
+            self.summary['processed'] += 1
+            self.summary[result['status']] += 1
+            yield result
+
+    def sync(self, records):
+        for line_number, record in records:
+            sku = None
+            if isinstance(record, Exception):
+                record = self.fail(line_number, None, {'non_field_errors': [str(record)]})
+            elif not isinstance(record, dict):
+                record = self.fail(line_number, None, {'non_field_errors': ['Expected an object']})
+            else:
+                sku = str(record.get('sku') or '').strip() or None
+                if sku is None:
+                    record = self.fail(line_number, None, {'sku': ['This field is required.']})
+
+            if sku in self.pending_skus or len(self.pending) >= self.chunk_size:
+                yield from self.flush()
+            self.pending.append((line_number, sku, record if sku is None else {**record, 'sku': sku}))
+            if sku is not None:
+                self.pending_skus.add(sku)
+        yield from self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        chunk, self.pending, self.pending_skus = self.pending, [], set()
+        try:
+            with transaction.atomic():
+                results = self.apply(chunk)
+        except IntegrityError:
+            # Another writer created one of these SKUs since the lookup
+            results = [
+                record if sku is None else
+                self.fail(line_number, sku, {'non_field_errors': ['Conflicting concurrent change, retry']})
+                for line_number, sku, record in chunk
+            ]
+        yield from results
+
+    def apply(self, chunk):
+        skus = [sku for _, sku, _ in chunk if sku is not None]
+        existing = {
+            product.sku: product
+            for product in StoreProduct.objects.select_for_update().filter(store=self.store, sku__in=skus)
+        } if skus else {}
+        results, to_create, to_update = [], [], []
+        update_fields = {'updated_at'}
+        for line_number, sku, record in chunk:
+            if sku is None:
+                results.append(record)
+                continue
+            product = self.simulated.get(sku) or existing.get(sku)
+            serializer = StoreProductSerializer(product, data=record, partial=product is not None)
+            if not serializer.is_valid():
+                results.append(self.fail(line_number, sku, serializer.errors))
+                continue
+
+            if product is None:
+                product = StoreProduct(store=self.store, **serializer.validated_data)
+                to_create.append(product)
+                results.append({'line': line_number, 'sku': sku, 'status': 'created'})
+                continue
+            changed = {
+                field: value for field, value in serializer.validated_data.items()
+                if getattr(product, field) != value
+            }
+            if not changed:
+                results.append({'line': line_number, 'sku': sku, 'status': 'unchanged'})
+                continue
+            for field, value in changed.items():
+                setattr(product, field, value)
+            update_fields.update(changed)
+            to_update.append(product)
+            results.append({'line': line_number, 'sku': sku, 'status': 'updated', 'fields': sorted(changed)})
+
+        if self.dry_run:
+            self.simulated.update((product.sku, product) for product in (*to_create, *to_update))
+        else:
+            # bulk_update skips auto_now
+            now = timezone.now()
+            for product in to_update:
+                product.updated_at = now
+            if to_update:
+                StoreProduct.objects.bulk_update(to_update, sorted(update_fields))
+            StoreProduct.objects.bulk_create(to_create)
+        return results
+
+    def fail(self, line_number, sku, errors):
+        return {'line': line_number, 'sku': sku, 'status': 'failed', 'errors': errors}
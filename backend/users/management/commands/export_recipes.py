@@ -0,0 +1,22 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from users.recipe_io import FORMATS, export_recipes
+
+
+class Command(BaseCommand):
+    help = "Stream every recipe to NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--output', help="Output file (defaults to stdout)")
+
+    def handle(self, *args, **options):
+        out = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in export_recipes(options['format']):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users.view_counter import apply_buffered_views, spill_views
+
+
+class Command(BaseCommand):
+    help = "Fold buffered recipe view hits into Recipe.views_count (run periodically, e.g. from cron)"
+
+    def handle(self, *args, **options):
+        spill_views()
+        stats = apply_buffered_views()
+        self.stdout.write(self.style.SUCCESS(
+            f"Coalesced {stats['hits']} view hits from {stats['rows']} buffer rows "
+            f"into {stats['updates']} updates across {stats['recipes']} recipes"
+        ))
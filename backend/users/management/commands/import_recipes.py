@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import CustomUser
+from users.recipe_io import CHUNK_SIZE, FORMATS, RecipeImporter, detect_format, iter_records
+
+
+class Command(BaseCommand):
+    help = "Stream recipes from an NDJSON or CSV file into the database in chunked bulk inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import")
+        parser.add_argument('--author', required=True, help="Email of the default author (records may set author_email)")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension, then ndjson")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only")
+        parser.add_argument('--report', help="Write the JSON error report to this path")
+
+    def handle(self, *args, **options):
+        try:
+            author = CustomUser.objects.get(email=options['author'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No user with email {options['author']}")
+
+        fmt = options['format'] or detect_format(options['path'])
+        importer = RecipeImporter(author, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        with open(options['path'], 'rb') as fh:
+            report = importer.run(iter_records(fh, fmt))
+
+        if options['report']:
+            with open(options['report'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+        for error in report['errors'][:20]:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+
+        action = "validated" if options['dry_run'] else "created"
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {report['processed']} records: {report['created']} {action}, {report['failed']} failed"
+        ))
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = "Delete stored idempotent responses older than IDEMPOTENCY_KEY_TTL_HOURS"
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+        deleted, _ = IdempotencyRecord.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idempotency records"))
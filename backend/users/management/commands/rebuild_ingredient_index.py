@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from users.ingredients import sync_recipe_ingredients
+from users.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Parse every recipe's ingredients text into the Ingredient/RecipeIngredient index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Recipes loaded per query")
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.only('pk', 'ingredients', 'ingredient_count').order_by('pk')
+        indexed = links = 0
+        for recipe in recipes.iterator(chunk_size=options['chunk_size']):
+            links += len(sync_recipe_ingredients(recipe))
+            indexed += 1
+            if indexed % 1000 == 0:
+                self.stdout.write(f"Indexed {indexed} recipes...")
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} recipes ({links} ingredient links)"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from users.map_tiles import aggregate_cells, location_points, rebuild_cells
+from users.models import RestaurantClusterCell, RestaurantLocation
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the map cluster cells from verified restaurant locations. "
+        "Run after bulk writes that skip signals or after changing MAP_CLUSTER_MAX_ZOOM; "
+        "cached tiles expire within MAP_TILE_CACHE_TIMEOUT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Cells inserted per batch")
+        parser.add_argument('--dry-run', action='store_true', help="Report the cell count without writing")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cells = aggregate_cells(location_points(RestaurantLocation, options['chunk_size']))
+            self.stdout.write(f"Would write {len(cells)} cluster cells")
+            return
+
+        rebuilt = rebuild_cells(RestaurantLocation, RestaurantClusterCell, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} map cluster cells"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from users.models import RestaurantLocation, RestaurantOpeningInterval
+from users.opening_hours import rebuild_intervals
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the minutes-of-week opening-hours index from RestaurantLocation hours. "
+        "Run after daylight-saving transitions and after bulk writes that skip signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Locations rebuilt per transaction")
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_intervals(RestaurantLocation, RestaurantOpeningInterval, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt opening hours for {rebuilt} locations"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from users.models import Recipe, RecipeLike, RecipeRating
+from users.trending import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Recipe.trending_score from likes, ratings and views. Scores are "
+        "maintained incrementally; this repairs them after bulk writes that bypass the views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Recipes processed per transaction")
+
+    def handle(self, *args, **options):
+        updated = rebuild_scores(Recipe, RecipeLike, RecipeRating, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt trending scores for {updated} recipes"))
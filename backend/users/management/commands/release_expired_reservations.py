@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import Order
+from users.stock import release_reservation
+
+
+class Command(BaseCommand):
+    help = (
+        "Cancel unpaid orders whose stock reservation expired and return their stock. "
+        "Safe to run concurrently with payments and with itself."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Orders looked up per batch")
+        parser.add_argument('--dry-run', action='store_true', help="Only count expired reservations")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Order.objects.filter(reservation_expires_at__lte=now)
+        if options['dry_run']:
+            self.stdout.write(f"{expired.count()} expired reservations")
+            return
+
+        released = 0
+        last_pk = None
+        while True:
+            batch = expired.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:options['chunk_size']])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            released += sum(release_reservation(pk, now) for pk in pks)
+
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservations"))
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from users.models import Recipe, RecipeLike, RecipeRating
+
+AGGREGATE_FIELDS = [
+    'rating_sum', 'rating_count', 'likes_count',
+    'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Recipe.rating_sum/rating_count/likes_count and the star histogram "
+        "from the ratings and likes tables"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Recipes processed per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing fixes")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        checked = drifted = 0
+        last_pk = None
+
+        while True:
+            recipes = Recipe.objects.order_by('pk').only('pk', *AGGREGATE_FIELDS)
+            if last_pk is not None:
+                recipes = recipes.filter(pk__gt=last_pk)
+            chunk = list(recipes[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            pks = [recipe.pk for recipe in chunk]
+
+            ratings = {
+                row['recipe_id']: row
+                for row in RecipeRating.objects.filter(recipe_id__in=pks)
+                .values('recipe_id').annotate(
+                    total=Sum('rating'), count=Count('id'),
+                    **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)},
+                )
+            }
+            likes = dict(
+                RecipeLike.objects.filter(recipe_id__in=pks)
+                .values('recipe_id').annotate(count=Count('id')).values_list('recipe_id', 'count')
+            )
+
+            stale = []
+            for recipe in chunk:
+                row = ratings.get(recipe.pk, {})
+                expected = {
+                    'rating_sum': row.get('total') or 0,
+                    'rating_count': row.get('count') or 0,
+                    'likes_count': likes.get(recipe.pk, 0),
+                    **{f'stars_{stars}': row.get(f'stars_{stars}') or 0 for stars in range(1, 6)},
+                }
+                actual = {field: getattr(recipe, field) for field in AGGREGATE_FIELDS}
+                if expected != actual:
+                    drift = {field: (actual[field], expected[field]) for field in AGGREGATE_FIELDS
+                             if actual[field] != expected[field]}
+                    self.stdout.write(f"Recipe {recipe.pk}: (stored, expected) {drift}")
+                    for field, value in expected.items():
+                        setattr(recipe, field, value)
+                    stale.append(recipe)
+
+            checked += len(chunk)
+            drifted += len(stale)
+            if stale and not dry_run:
+                with transaction.atomic():
+                    Recipe.objects.bulk_update(stale, AGGREGATE_FIELDS)
+
+        action = "found" if dry_run else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} recipes, {action} {drifted} with drift"))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from users.models import RestaurantLocation, RestaurantRating
+from users.nearby_cache import invalidate_points
+
+AGGREGATE_FIELDS = ['rating_sum', 'total_ratings', 'rating_avg']
+
+
+class Command(BaseCommand):
+    help = "Recompute RestaurantLocation.rating_sum/total_ratings/rating_avg from the ratings table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Locations processed per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing fixes")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        checked = drifted = 0
+        last_pk = None
+
+        while True:
+            locations = RestaurantLocation.objects.order_by('pk').only(
+                'pk', 'restaurant_id', 'latitude', 'longitude', *AGGREGATE_FIELDS
+            )
+            if last_pk is not None:
+                locations = locations.filter(pk__gt=last_pk)
+            chunk = list(locations[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            totals = {
+                row['restaurant_id']: row
+                for row in RestaurantRating.objects.filter(restaurant_id__in=[loc.restaurant_id for loc in chunk])
+                .values('restaurant_id').annotate(total=Sum('rating'), count=Count('id'))
+            }
+
+            stale = []
+            for location in chunk:
+                row = totals.get(location.restaurant_id, {})
+                rating_sum, count = row.get('total') or 0, row.get('count') or 0
+                expected = {
+                    'rating_sum': rating_sum,
+                    'total_ratings': count,
+                    'rating_avg': round(rating_sum / count, 2) if count else 0,
+                }
+                actual = {field: getattr(location, field) for field in AGGREGATE_FIELDS}
+                actual['rating_avg'] = float(actual['rating_avg'])
+                if expected != actual:
+                    drift = {field: (actual[field], expected[field]) for field in AGGREGATE_FIELDS
+                             if actual[field] != expected[field]}
+                    self.stdout.write(f"Location {location.pk}: (stored, expected) {drift}")
+                    for field, value in expected.items():
+                        setattr(location, field, value)
+                    stale.append(location)
+
+            checked += len(chunk)
+            drifted += len(stale)
+            if stale and not dry_run:
+                with transaction.atomic():
+                    RestaurantLocation.objects.bulk_update(stale, AGGREGATE_FIELDS)
+                # Cached nearby searches embed the old averages
+                invalidate_points(*[(location.latitude, location.longitude) for location in stale])
+
+        action = "found" if dry_run else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} locations, {action} {drifted} with drift"))
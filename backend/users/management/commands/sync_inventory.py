@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.inventory_io import CHUNK_SIZE, InventorySync
+from users.models import StoreUserProfile
+from users.recipe_io import FORMATS, detect_format, iter_records
+
+
+class Command(BaseCommand):
+    help = "Stream a store's inventory from an NDJSON or CSV file, creating or updating products by SKU"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to sync")
+        parser.add_argument('--store', required=True, help="Email of the store owner")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension, then ndjson")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Validate and diff only")
+        parser.add_argument('--report', help="Write the per-record NDJSON report to this path")
+
+    def handle(self, *args, **options):
+        try:
+            store = StoreUserProfile.objects.get(user__email=options['store'])
+        except StoreUserProfile.DoesNotExist:
+            raise CommandError(f"No store owned by {options['store']}")
+
+        fmt = options['format'] or detect_format(options['path'])
+        sync = InventorySync(store, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        report = open(options['report'], 'w') if options['report'] else None
+        shown = 0
+        try:
+            with open(options['path'], 'rb') as fh:
+                for result in sync.run(iter_records(fh, fmt)):
+                    if report:
+                        report.write(json.dumps(result) + '\n')
+                    if result['status'] == 'failed' and shown < 20:
+                        self.stderr.write(f"Line {result['line']}: {result['errors']}")
+                        shown += 1
+        finally:
+            if report:
+                report.close()
+
+        summary = sync.summary
+        action = "validated" if options['dry_run'] else "applied"
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {summary['processed']} records ({action}): {summary['created']} created, "
+            f"{summary['updated']} updated, {summary['unchanged']} unchanged, {summary['failed']} failed"
+        ))
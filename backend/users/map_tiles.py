@@ -0,0 +1,178 @@
+"""
+Clustered map tiles (Web Mercator z/x/y) for restaurant locations.
+
+Below MAP_CLUSTER_MAX_ZOOM a tile is an 8x8 grid of cells; the cells are the
+tiles of zoom z + CELL_BITS, so one set of precomputed aggregates per level
+serves every tile at the zoom above it. RestaurantClusterCell rows hold the
+count and coordinate sums of the verified restaurants in each cell and are
+patched with F() updates in the same transaction as the location change;
+`manage.py rebuild_map_clusters` recomputes them from scratch. At and above
+MAP_CLUSTER_MAX_ZOOM tiles list individual restaurants. Tile payloads are
+cached and the tiles containing a changed point are dropped after commit.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import RestaurantClusterCell, RestaurantLocation
+
+CELL_BITS = 3  # 2**3 x 2**3 cells per tile
+MAX_ZOOM = 20
+MAX_LATITUDE = 85.05112878
+KEY_PREFIX = 'restaurant:tile:v1'
+
+
+def cluster_max_zoom():
+    return getattr(settings, 'MAP_CLUSTER_MAX_ZOOM', 14)
+
+
+def cell_levels():
+    """Zoom levels of the precomputed cells, one per clustered tile zoom"""
+    return range(CELL_BITS, cluster_max_zoom() + CELL_BITS)
+
+
+def tile_xy(lat, lon, zoom):
+    """Tile containing the point at `zoom`"""
+    n = 2 ** zoom
+    lat = math.radians(max(min(float(lat), MAX_LATITUDE), -MAX_LATITUDE))
+    x = int((float(lon) + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom, x, y):
+    """(min_lat, max_lat, min_lon, max_lon) of a tile"""
+    n = 2 ** zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return latitude(y + 1), latitude(y), x / n * 360 - 180, (x + 1) / n * 360 - 180
+
+
+# ----------------------------------------------------------------------------
+# Precomputed cells
+# ----------------------------------------------------------------------------
+
+def point_cells(lat, lon):
+    return [(level, *tile_xy(lat, lon, level)) for level in cell_levels()]
+
+
+def apply_point(lat, lon, sign):
+    """Add (sign=1) or remove (sign=-1) one restaurant at (lat, lon) from every level"""
+    lat, lon = float(lat), float(lon)
+    cells = point_cells(lat, lon)
+    if sign > 0:
+        RestaurantClusterCell.objects.bulk_create(
+            [RestaurantClusterCell(level=level, x=x, y=y) for level, x, y in cells], ignore_conflicts=True
+        )
+    for level, x, y in cells:
+        RestaurantClusterCell.objects.filter(level=level, x=x, y=y).update(
+            count=F('count') + sign, lat_sum=F('lat_sum') + sign * lat, lon_sum=F('lon_sum') + sign * lon,
+        )
+    if sign < 0:
+        # Only the cells just decremented can have emptied
+        emptied = Q()
+        for level, x, y in cells:
+            emptied |= Q(level=level, x=x, y=y)
+        RestaurantClusterCell.objects.filter(emptied, count__lte=0).delete()
+
+
+def aggregate_cells(points):
+    """{(level, x, y): [count, lat_sum, lon_sum]} for an iterable of (lat, lon)"""
+    cells = {}
+    for lat, lon in points:
+        lat, lon = float(lat), float(lon)
+        for key in point_cells(lat, lon):
+            cell = cells.setdefault(key, [0, 0.0, 0.0])
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += lon
+    return cells
+
+
+def location_points(location_model, chunk_size=2000):
+    return (
+        location_model.objects.filter(restaurant__is_verified=True)
+        .order_by().values_list('latitude', 'longitude').iterator(chunk_size=chunk_size)
+    )
+
+
+def rebuild_cells(location_model, cell_model, chunk_size=2000):
+    """
+    Replace every cell with aggregates recomputed from the verified locations;
+    returns the number of cells. Takes the models so migrations can pass theirs.
+    """
+    cells = aggregate_cells(location_points(location_model, chunk_size))
+    with transaction.atomic():
+        cell_model.objects.all().delete()
+        cell_model.objects.bulk_create(
+            (
+                cell_model(level=level, x=x, y=y, count=count, lat_sum=lat_sum, lon_sum=lon_sum)
+                for (level, x, y), (count, lat_sum, lon_sum) in cells.items()
+            ),
+            batch_size=chunk_size,
+        )
+    return len(cells)
+
+
+# ----------------------------------------------------------------------------
+# Tiles
+# ----------------------------------------------------------------------------
+
+def tile_key(zoom, x, y):
+    return f'{KEY_PREFIX}:{zoom}:{x}:{y}'
+
+
+def build_tile(zoom, x, y):
+    if zoom < cluster_max_zoom():
+        level = zoom + CELL_BITS
+        side = 2 ** CELL_BITS
+        cells = RestaurantClusterCell.objects.filter(
+            level=level, x__gte=x * side, x__lt=(x + 1) * side, y__gte=y * side, y__lt=(y + 1) * side,
+            count__gt=0,
+        ).values_list('count', 'lat_sum', 'lon_sum')
+        return {
+            'clustered': True,
+            'clusters': [
+                {'count': count, 'latitude': round(lat_sum / count, 6), 'longitude': round(lon_sum / count, 6)}
+                for count, lat_sum, lon_sum in cells
+            ],
+        }
+
+    min_lat, max_lat, min_lon, max_lon = tile_bounds(zoom, x, y)
+    rows = RestaurantLocation.objects.filter(
+        restaurant__is_verified=True,
+        latitude__gte=min_lat, latitude__lt=max_lat, longitude__gte=min_lon, longitude__lt=max_lon,
+    ).order_by().values_list(
+        'restaurant_id', 'restaurant__restaurant_name', 'restaurant__cuisine_type', 'latitude', 'longitude'
+    )
+    return {
+        'clustered': False,
+        'restaurants': [
+            {'id': pk, 'restaurant_name': name, 'cuisine_type': cuisine,
+             'latitude': float(lat), 'longitude': float(lon)}
+            for pk, name, cuisine, lat, lon in rows
+        ],
+    }
+
+
+def get_tile(zoom, x, y):
+    key = tile_key(zoom, x, y)
+    payload = cache.get(key)
+    if payload is None:
+        payload = {'zoom': zoom, 'x': x, 'y': y, **build_tile(zoom, x, y)}
+        cache.set(key, payload, getattr(settings, 'MAP_TILE_CACHE_TIMEOUT', 300))
+    return payload
+
+
+def invalidate_tiles(*points):
+    """Drop every cached tile, at every zoom, that contains one of the points"""
+    cache.delete_many([
+        tile_key(zoom, *tile_xy(lat, lon, zoom))
+        for lat, lon in points
+        for zoom in range(MAX_ZOOM + 1)
+    ])
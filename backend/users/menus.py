@@ -0,0 +1,86 @@
+"""
+Bulk menu upsert.
+
+Every item is validated first; nothing is written unless the whole payload is
+valid. Items match existing rows by `id` if given, otherwise by exact `name`.
+Matches are updated with one bulk_update and the rest inserted with one
+bulk_create. In replace mode, rows missing from the payload are deleted. It all
+happens in a single transaction.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RestaurantMenu
+from .serializers import RestaurantMenuSerializer
+
+MAX_ITEMS = 1000
+
+
+class MenuUpsertError(Exception):
+    def __init__(self, errors):
+        super().__init__('Invalid menu items')
+        self.errors = errors
+
+
+def upsert_menu_items(restaurant, items, replace=False):
+    """Returns {'created', 'updated', 'deleted'} counts; raises MenuUpsertError"""
+    if not isinstance(items, list) or not items and not replace:
+        raise MenuUpsertError([{'index': None, 'errors': {'items': ['Expected a non-empty list']}}])
+    if len(items) > MAX_ITEMS:
+        raise MenuUpsertError([{'index': None, 'errors': {'items': [f'At most {MAX_ITEMS} items per request']}}])
+
+    with transaction.atomic():
+        existing = list(RestaurantMenu.objects.select_for_update().filter(restaurant=restaurant))
+        by_id = {item.pk: item for item in existing}
+        by_name = {item.name: item for item in existing}
+
+        errors, to_create, to_update, seen = [], [], [], set()
+        update_fields = {'updated_at'}
+        for index, data in enumerate(items):
+            if not isinstance(data, dict):
+                errors.append({'index': index, 'errors': {'non_field_errors': ['Expected an object']}})
+                continue
+            if data.get('id') is not None:
+                instance = by_id.get(data['id'])
+                if instance is None:
+                    errors.append({'index': index, 'errors': {'id': ['No menu item with this id']}})
+                    continue
+            else:
+                instance = by_name.get(data.get('name'))
+
+            # Patch mode only needs the changed fields of existing items
+            serializer = RestaurantMenuSerializer(instance, data=data, partial=instance is not None and not replace)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            key = instance.pk if instance is not None else ('name', serializer.validated_data['name'])
+            if key in seen:
+                errors.append({'index': index, 'errors': {'non_field_errors': ['Duplicate item in payload']}})
+                continue
+            seen.add(key)
+
+            if instance is None:
+                to_create.append(RestaurantMenu(restaurant=restaurant, **serializer.validated_data))
+            else:
+                for field, value in serializer.validated_data.items():
+                    setattr(instance, field, value)
+                update_fields.update(serializer.validated_data)
+                to_update.append(instance)
+
+        if errors:
+            raise MenuUpsertError(errors)
+
+        deleted = 0
+        if replace:
+            deleted, _ = RestaurantMenu.objects.filter(restaurant=restaurant).exclude(
+                pk__in=[instance.pk for instance in to_update]
+            ).delete()
+
+        now = timezone.now()
+        for instance in to_update:
+            instance.updated_at = now
+        if to_update:
+            RestaurantMenu.objects.bulk_update(to_update, sorted(update_fields))
+        RestaurantMenu.objects.bulk_create(to_create)
+
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': deleted}
@@ -0,0 +1,100 @@
+# Generated by Django 6.0 on 2026-10-17 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The FTS5 index is SQLite specific; other backends fall back to icontains
+# matching in users.search.
+CREATE_FTS = [
+    """
+    CREATE VIRTUAL TABLE recipe_fts USING fts5(
+        title, description, ingredients, dietary_tags,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER recipe_fts_insert AFTER INSERT ON users_recipe BEGIN
+        INSERT INTO users_recipesearchdocument (recipe_id) VALUES (new.id);
+        INSERT INTO recipe_fts (rowid, title, description, ingredients, dietary_tags)
+        SELECT id, new.title, new.description, new.ingredients, new.dietary_tags
+        FROM users_recipesearchdocument WHERE recipe_id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_fts_update
+    AFTER UPDATE OF title, description, ingredients, dietary_tags ON users_recipe BEGIN
+        UPDATE recipe_fts
+        SET title = new.title, description = new.description,
+            ingredients = new.ingredients, dietary_tags = new.dietary_tags
+        WHERE rowid = (SELECT id FROM users_recipesearchdocument WHERE recipe_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER recipe_fts_delete AFTER DELETE ON users_recipe BEGIN
+        DELETE FROM recipe_fts
+        WHERE rowid = (SELECT id FROM users_recipesearchdocument WHERE recipe_id = old.id);
+        DELETE FROM users_recipesearchdocument WHERE recipe_id = old.id;
+    END
+    """,
+    # Index the recipes that already exist
+    "INSERT INTO users_recipesearchdocument (recipe_id) SELECT id FROM users_recipe",
+    """
+    INSERT INTO recipe_fts (rowid, title, description, ingredients, dietary_tags)
+    SELECT d.id, r.title, r.description, r.ingredients, r.dietary_tags
+    FROM users_recipesearchdocument d JOIN users_recipe r ON r.id = d.recipe_id
+    """,
+]
+
+# SQLite drops a table's triggers when a migration rebuilds it (AddField,
+# AlterField, ...); every migration that rebuilds users_recipe ends with
+# RunPython(recreate_triggers).
+TRIGGER_NAMES = ['recipe_fts_insert', 'recipe_fts_update', 'recipe_fts_delete']
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS recipe_fts_insert",
+    "DROP TRIGGER IF EXISTS recipe_fts_update",
+    "DROP TRIGGER IF EXISTS recipe_fts_delete",
+    "DROP TABLE IF EXISTS recipe_fts",
+    "DELETE FROM users_recipesearchdocument",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_FTS:
+            schema_editor.execute(statement)
+
+
+def recreate_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGER_NAMES:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    for statement in CREATE_FTS:
+        if 'CREATE TRIGGER' in statement:
+            schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_FTS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_recipeviewbuffer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='search_document', to='users.recipe')),
+            ],
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-17 11:20
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Adding columns rebuilds users_recipe on SQLite, dropping the FTS triggers
+recreate_fts_triggers = import_module('users.migrations.0008_recipe_fts').recreate_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_recipe_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(recreate_fts_triggers, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='users.ingredient')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='users.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ingredient', 'recipe'], name='recipeingredient_posting_idx')],
+                'unique_together': {('recipe', 'ingredient')},
+            },
+        ),
+    ]
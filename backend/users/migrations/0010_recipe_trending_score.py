@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 13:05
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Adding columns rebuilds users_recipe on SQLite, dropping the FTS triggers
+recreate_fts_triggers = import_module('users.migrations.0008_recipe_fts').recreate_triggers
+
+
+def backfill_scores(apps, schema_editor):
+    """Existing recipes would otherwise sit at 0, below every new recipe"""
+    from users.trending import rebuild_scores
+    rebuild_scores(
+        apps.get_model('users', 'Recipe'), apps.get_model('users', 'RecipeLike'), apps.get_model('users', 'RecipeRating')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_ingredient_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(recreate_fts_triggers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', 'id'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
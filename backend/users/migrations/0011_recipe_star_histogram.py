@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-17 13:50
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Adding columns rebuilds users_recipe on SQLite, dropping the FTS triggers
+recreate_fts_triggers = import_module('users.migrations.0008_recipe_fts').recreate_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_recipe_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='stars_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='stars_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='stars_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='stars_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='stars_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(recreate_fts_triggers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='reciperating',
+            index=models.Index(fields=['recipe', '-created_at', 'id'], name='recipe_rating_recent_idx'),
+        ),
+    ]
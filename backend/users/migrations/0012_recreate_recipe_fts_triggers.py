@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-17 23:40
+
+from importlib import import_module
+
+from django.db import migrations
+
+
+# Databases that ran 0009-0011 before those migrations restored the FTS
+# triggers lost them. Recreate them (a no-op otherwise) and index recipes
+# inserted while they were missing.
+REINDEX_MISSING = [
+    """
+    INSERT INTO users_recipesearchdocument (recipe_id)
+    SELECT r.id FROM users_recipe r
+    WHERE NOT EXISTS (SELECT 1 FROM users_recipesearchdocument d WHERE d.recipe_id = r.id)
+    """,
+    """
+    INSERT INTO recipe_fts (rowid, title, description, ingredients, dietary_tags)
+    SELECT d.id, r.title, r.description, r.ingredients, r.dietary_tags
+    FROM users_recipesearchdocument d JOIN users_recipe r ON r.id = d.recipe_id
+    WHERE d.id NOT IN (SELECT rowid FROM recipe_fts)
+    """,
+]
+
+
+def recreate_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    import_module('users.migrations.0008_recipe_fts').recreate_triggers(apps, schema_editor)
+    for statement in REINDEX_MISSING:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_recipe_star_histogram'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_recreate_recipe_fts_triggers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantlocation',
+            index=models.Index(fields=['latitude', 'longitude'], name='restaurant_loc_lat_lon_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 00:10
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+
+def backfill_aggregates(apps, schema_editor):
+    """Fold in the ratings given so far; restaurant_rating keeps them current from here on"""
+    RestaurantLocation = apps.get_model('users', 'RestaurantLocation')
+    RestaurantRating = apps.get_model('users', 'RestaurantRating')
+    ratings = RestaurantRating.objects.filter(restaurant_id=OuterRef('restaurant_id')).values('restaurant_id')
+    RestaurantLocation.objects.update(
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total')), 0),
+        total_ratings=Coalesce(Subquery(ratings.annotate(count=Count('id')).values('count')), 0),
+    )
+    RestaurantLocation.objects.update(rating_avg=Coalesce(
+        Round(Cast(F('rating_sum'), FloatField()) / NullIf(F('total_ratings'), 0), 2), 0,
+        output_field=models.DecimalField(max_digits=3, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_restaurant_location_geo_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurantlocation',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantlocation',
+            index=models.Index(fields=['-rating_avg', 'id'], name='restaurant_loc_rating_idx'),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_restaurant_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantlocation',
+            index=models.Index(fields=['city', 'rating_avg'], name='restaurant_loc_city_rate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantuserprofile',
+            index=models.Index(fields=['is_verified', 'cuisine_type'], name='restaurant_verif_cuisine_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 00:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_intervals(apps, schema_editor):
+    """Index existing locations; signals keep new and edited ones in sync"""
+    from users.opening_hours import rebuild_intervals
+    rebuild_intervals(apps.get_model('users', 'RestaurantLocation'), apps.get_model('users', 'RestaurantOpeningInterval'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_restaurant_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurantlocation',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text='IANA zone of hours_open/hours_close', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='RestaurantOpeningInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_minute', models.PositiveIntegerField()),
+                ('end_minute', models.PositiveIntegerField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_intervals', to='users.restaurantlocation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start_minute', 'end_minute', 'location'], name='opening_interval_range_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_intervals, migrations.RunPython.noop),
+    ]
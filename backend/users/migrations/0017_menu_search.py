@@ -0,0 +1,91 @@
+# Generated by Django 6.0 on 2026-10-18 01:20
+
+from django.db import migrations, models
+
+
+# Like recipe_fts (0008), the FTS5 index is SQLite specific and other backends
+# fall back to icontains matching in users.search. RestaurantMenu has an
+# integer pk, so it is used as the FTS rowid directly. SQLite drops these
+# triggers whenever users_restaurantmenu is rebuilt (e.g. AddField); any such
+# migration must recreate them.
+CREATE_FTS = [
+    """
+    CREATE VIRTUAL TABLE menu_fts USING fts5(
+        name, description, category, dietary_info,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER menu_fts_insert AFTER INSERT ON users_restaurantmenu BEGIN
+        INSERT INTO menu_fts (rowid, name, description, category, dietary_info)
+        VALUES (new.id, new.name, new.description, new.category, new.dietary_info);
+    END
+    """,
+    """
+    CREATE TRIGGER menu_fts_update
+    AFTER UPDATE OF name, description, category, dietary_info ON users_restaurantmenu BEGIN
+        UPDATE menu_fts
+        SET name = new.name, description = new.description,
+            category = new.category, dietary_info = new.dietary_info
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER menu_fts_delete AFTER DELETE ON users_restaurantmenu BEGIN
+        DELETE FROM menu_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO menu_fts (rowid, name, description, category, dietary_info)
+    SELECT id, name, description, category, dietary_info FROM users_restaurantmenu
+    """,
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS menu_fts_insert",
+    "DROP TRIGGER IF EXISTS menu_fts_update",
+    "DROP TRIGGER IF EXISTS menu_fts_delete",
+    "DROP TABLE IF EXISTS menu_fts",
+]
+
+
+def normalize_categories(apps, schema_editor):
+    """Dish search filters on the canonical category spelling"""
+    from users.models import normalize_menu_category
+    RestaurantMenu = apps.get_model('users', 'RestaurantMenu')
+    for category in list(RestaurantMenu.objects.values_list('category', flat=True).distinct()):
+        normalized = normalize_menu_category(category)
+        if normalized != category:
+            RestaurantMenu.objects.filter(category=category).update(category=normalized)
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_FTS:
+            schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_FTS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_restaurant_opening_hours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantmenu',
+            index=models.Index(fields=['category', 'price'], name='menu_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantmenu',
+            index=models.Index(fields=['is_available', 'price'], name='menu_available_price_idx'),
+        ),
+        migrations.RunPython(normalize_categories, migrations.RunPython.noop),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
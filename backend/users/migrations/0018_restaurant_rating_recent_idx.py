@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_menu_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurantrating',
+            index=models.Index(fields=['restaurant', '-created_at', 'id'], name='restaurant_rating_recent_idx'),
+        ),
+    ]
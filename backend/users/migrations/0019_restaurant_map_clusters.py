@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+def backfill_cells(apps, schema_editor):
+    """Aggregate existing locations; signals patch the cells from here on"""
+    from users.map_tiles import rebuild_cells
+    rebuild_cells(apps.get_model('users', 'RestaurantLocation'), apps.get_model('users', 'RestaurantClusterCell'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_restaurant_rating_recent_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantClusterCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('x', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('lat_sum', models.FloatField(default=0)),
+                ('lon_sum', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('level', 'x', 'y'), name='cluster_cell_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 6.0 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+# Same scheme as menu_fts (0017): SQLite only, the product pk is the FTS rowid,
+# and any later migration that rebuilds users_storeproduct (e.g. AddField)
+# must recreate these triggers.
+CREATE_FTS = [
+    """
+    CREATE VIRTUAL TABLE product_fts USING fts5(
+        name, description, category,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER product_fts_insert AFTER INSERT ON users_storeproduct BEGIN
+        INSERT INTO product_fts (rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER product_fts_update
+    AFTER UPDATE OF name, description, category ON users_storeproduct BEGIN
+        UPDATE product_fts
+        SET name = new.name, description = new.description, category = new.category
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER product_fts_delete AFTER DELETE ON users_storeproduct BEGIN
+        DELETE FROM product_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO product_fts (rowid, name, description, category)
+    SELECT id, name, description, category FROM users_storeproduct
+    """,
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS product_fts_insert",
+    "DROP TRIGGER IF EXISTS product_fts_update",
+    "DROP TRIGGER IF EXISTS product_fts_delete",
+    "DROP TABLE IF EXISTS product_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_FTS:
+            schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_FTS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_restaurant_map_clusters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='storeproduct',
+            index=models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storeproduct',
+            index=models.Index(fields=['store', 'is_available'], name='product_store_available_idx'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+# Adding the column rebuilds users_storeproduct on SQLite, which drops the
+# product_fts triggers from 0020; recreate them afterwards.
+TRIGGER_NAMES = ['product_fts_insert', 'product_fts_update', 'product_fts_delete']
+
+
+def recreate_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from importlib import import_module
+    create_fts = import_module('users.migrations.0020_product_catalog').CREATE_FTS
+    for name in TRIGGER_NAMES:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    for statement in create_fts:
+        if 'CREATE TRIGGER' in statement:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_product_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storeproduct',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Stock keeping unit, unique within the store', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='storeproduct',
+            constraint=models.UniqueConstraint(condition=models.Q(('sku', ''), _negated=True), fields=('store', 'sku'), name='product_store_sku_unique'),
+        ),
+        migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reservation_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('reservation_expires_at__isnull', False)), fields=['reservation_expires_at'], name='order_reservation_expiry_idx'),
+        ),
+    ]
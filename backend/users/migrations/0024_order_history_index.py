@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0023_idempotency_records'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-created_at', 'id'], name='order_customer_recent_idx'),
+        ),
+    ]
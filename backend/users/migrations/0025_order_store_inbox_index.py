@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0024_order_history_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['store', 'updated_at', 'id'], name='order_store_updated_idx'),
+        ),
+    ]
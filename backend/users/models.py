@@ -1,8 +1,11 @@
 from django.db import models
+from django.db.models.functions import Cast, Coalesce, Now, NullIf, Round
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.core.validators import validate_email, URLValidator
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 import random
+import string
 from django.utils import timezone
 import uuid
 
@@ -17,6 +20,10 @@ def generate_otp_code():
 def get_otp_expiry():
     return timezone.now() + timezone.timedelta(minutes=10)
 
+def normalize_menu_category(category):
+    """Canonical spelling of a menu category, so dish search can filter with an exact match"""
+    return string.capwords(category or '')
+
 class CustomUser(AbstractUser):
     # User role choices
     ROLE_CHOICES = [
@@ -103,6 +110,11 @@ class RestaurantUserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_verified', 'cuisine_type'], name='restaurant_verif_cuisine_idx'),
+        ]
+    
     def __str__(self):
         return f"Restaurant: {self.restaurant_name}"
 
@@ -166,18 +178,115 @@ class Recipe(models.Model):
     calories = models.IntegerField(blank=True, null=True)
     dietary_tags = models.CharField(max_length=255, blank=True, help_text="e.g., vegan, gluten-free, low-carb")
     views_count = models.IntegerField(default=0)
+    # Denormalized aggregates, maintained by the rating/like write paths
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    likes_count = models.IntegerField(default=0)
+    # Star histogram: number of 1..5 star ratings
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+    # Number of distinct normalized ingredients, maintained by users.ingredients
+    ingredient_count = models.IntegerField(default=0)
+    # Log-scale, time-decayed popularity, maintained by users.trending
+    trending_score = models.FloatField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination on (-created_at, id)
+            models.Index(fields=['-created_at', 'id'], name='recipe_created_id_idx'),
+            models.Index(fields=['author', '-created_at', 'id'], name='recipe_author_created_idx'),
+            models.Index(fields=['-trending_score', 'id'], name='recipe_trending_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.author.email}"
+    
+    @property
+    def avg_rating(self):
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count, 2)
+        return 0
+    
+    @property
+    def rating_histogram(self):
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+    
+    @staticmethod
+    def star_histogram_update(added=None, removed=None):
+        """QuerySet.update() kwargs moving one rating between star buckets"""
+        if added == removed:
+            return {}
+        updates = {}
+        if removed:
+            updates[f'stars_{removed}'] = models.F(f'stars_{removed}') - 1
+        if added:
+            updates[f'stars_{added}'] = models.F(f'stars_{added}') + 1
+        return updates
+
+
+class RecipeViewBuffer(models.Model):
+    """Recipe view hits spilled by web processes, waiting to be folded into Recipe.views_count"""
+    # No FK constraint: hits for a recipe deleted in the meantime are simply dropped on flush
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    hits = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.hits} views of {self.recipe_id}"
+
+
+class RecipeSearchDocument(models.Model):
+    """
+    Integer rowid for a recipe in the `recipe_fts` FTS5 table (Recipe has a UUID pk).
+    Rows are written and removed by SQLite triggers on users_recipe, see users.search.
+    """
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.DO_NOTHING, db_constraint=False, related_name='search_document'
+    )
+    
+    def __str__(self):
+        return f"Search document {self.id} for {self.recipe_id}"
+
+
+class Ingredient(models.Model):
+    """Normalized ingredient name, e.g. 'tomato' for '2 ripe tomatoes'"""
+    name = models.CharField(max_length=100, unique=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    """Inverted index entry linking a recipe to one of its normalized ingredients"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='recipe_ingredients')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='recipe_ingredients')
+    
+    class Meta:
+        unique_together = ('recipe', 'ingredient')
+        indexes = [
+            # Posting list lookup: all recipes using an ingredient
+            models.Index(fields=['ingredient', 'recipe'], name='recipeingredient_posting_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ingredient.name} in {self.recipe.title}"
 
 
 class RecipeRating(models.Model):
     """User ratings and reviews for recipes"""
+    # Newest first; the embedded latest reviews and the paginated ratings
+    # endpoint must agree so clients can continue from one to the other
+    RECENT_ORDERING = ('-created_at', 'id')
+    
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ratings')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     rating = models.IntegerField(choices=[(i, i) for i in range(1, 6)], help_text="1 to 5 stars")
@@ -188,6 +297,9 @@ class RecipeRating(models.Model):
     class Meta:
         unique_together = ('recipe', 'user')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipe', '-created_at', 'id'], name='recipe_rating_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.rating}★ - {self.recipe.title} by {self.user.email}"
@@ -222,17 +334,82 @@ class RestaurantLocation(models.Model):
     website = models.URLField(blank=True, null=True)
     hours_open = models.TimeField(blank=True, null=True)
     hours_close = models.TimeField(blank=True, null=True)
+    timezone = models.CharField(max_length=64, default='UTC', help_text="IANA zone of hours_open/hours_close")
     is_open = models.BooleanField(default=True)
+    # Maintained by restaurant_rating; `manage.py repair_restaurant_ratings` fixes drift
     rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     total_ratings = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-rating_avg']
+        indexes = [
+            # Bounding-box prefilter for nearby search
+            models.Index(fields=['latitude', 'longitude'], name='restaurant_loc_lat_lon_idx'),
+            models.Index(fields=['-rating_avg', 'id'], name='restaurant_loc_rating_idx'),
+            models.Index(fields=['city', 'rating_avg'], name='restaurant_loc_city_rate_idx'),
+        ]
     
     def __str__(self):
         return f"{self.restaurant.restaurant_name} - {self.city}"
+    
+    @staticmethod
+    def rating_update(sum_delta, count_delta):
+        """QuerySet.update() kwargs folding a rating change into the stored aggregates"""
+        rating_sum = models.F('rating_sum') + sum_delta
+        total_ratings = models.F('total_ratings') + count_delta
+        return {
+            'rating_sum': rating_sum,
+            'total_ratings': total_ratings,
+            # Rating changes must change the restaurant page ETag
+            'updated_at': Now(),
+            # The right-hand side sees the pre-update row, so recompute from the new values
+            'rating_avg': Coalesce(
+                Round(Cast(rating_sum, models.FloatField()) / NullIf(total_ratings, 0), 2), 0,
+                output_field=models.DecimalField(max_digits=3, decimal_places=2),
+            ),
+        }
+
+
+class RestaurantOpeningInterval(models.Model):
+    """
+    One span of a location's opening hours as UTC minutes-of-week [start, end),
+    derived from hours_open/hours_close by users.opening_hours
+    """
+    location = models.ForeignKey(RestaurantLocation, on_delete=models.CASCADE, related_name='opening_intervals')
+    start_minute = models.PositiveIntegerField()
+    end_minute = models.PositiveIntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_minute', 'end_minute', 'location'], name='opening_interval_range_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.location_id}: {self.start_minute}-{self.end_minute}"
+
+
+class RestaurantClusterCell(models.Model):
+    """
+    Verified restaurants within one Web Mercator tile at zoom `level`, as a count
+    and coordinate sums (centroid = sum / count); maintained by users.map_tiles
+    """
+    level = models.PositiveSmallIntegerField()
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    count = models.IntegerField(default=0)
+    lat_sum = models.FloatField(default=0)
+    lon_sum = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'x', 'y'], name='cluster_cell_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.level}/{self.x}/{self.y}: {self.count}"
 
 
 class RestaurantMenu(models.Model):
@@ -250,6 +427,15 @@ class RestaurantMenu(models.Model):
     
     class Meta:
         ordering = ['category', 'name']
+        indexes = [
+            # Dish search filters; full-text matching lives in the menu_fts FTS5 table
+            models.Index(fields=['category', 'price'], name='menu_category_price_idx'),
+            models.Index(fields=['is_available', 'price'], name='menu_available_price_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        self.category = normalize_menu_category(self.category)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.name} - {self.restaurant.restaurant_name}"
@@ -265,6 +451,9 @@ class RestaurantRating(models.Model):
     
     class Meta:
         unique_together = ('restaurant', 'user')
+        indexes = [
+            models.Index(fields=['restaurant', '-created_at', 'id'], name='restaurant_rating_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.rating}★ - {self.restaurant.restaurant_name}"
@@ -277,6 +466,7 @@ class RestaurantRating(models.Model):
 class StoreProduct(models.Model):
     """Products/Ingredients sold by stores"""
     store = models.ForeignKey(StoreUserProfile, on_delete=models.CASCADE, related_name='products')
+    sku = models.CharField(max_length=64, blank=True, help_text="Stock keeping unit, unique within the store")
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
@@ -289,6 +479,14 @@ class StoreProduct(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Catalog browsing by category and price range
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['store', 'is_available'], name='product_store_available_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'sku'], condition=~models.Q(sku=''), name='product_store_sku_unique'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.store.store_name}"
@@ -318,13 +516,44 @@ class Order(models.Model):
     tax = models.DecimalField(max_digits=8, decimal_places=2, default=0)
     delivery_address = models.TextField(blank=True)
     notes = models.TextField(blank=True)
+    # Set while the order holds claimed stock awaiting payment, see users.stock
+    reservation_expires_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Order history: a customer's orders, newest first
+            models.Index(fields=['customer', '-created_at', 'id'], name='order_customer_recent_idx'),
+            # Store inbox delta sync on (updated_at, id)
+            models.Index(fields=['store', 'updated_at', 'id'], name='order_store_updated_idx'),
+            models.Index(fields=['reservation_expires_at'], name='order_reservation_expiry_idx',
+                         condition=models.Q(reservation_expires_at__isnull=False)),
+        ]
+    
     def __str__(self):
         return f"Order {self.order_id} - {self.customer.email}"
 
 
+class IdempotencyRecord(models.Model):
+    """Stored response of a write request sent with an Idempotency-Key header, see users.idempotency"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    endpoint = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='idempotency_user_key_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.endpoint} {self.key}"
+
+
 class OrderItem(models.Model):
     """Items in an order"""
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
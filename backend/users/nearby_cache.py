@@ -0,0 +1,98 @@
+"""
+Server-side cache for GET nearby restaurant searches.
+
+The search point is snapped to the centre of a grid cell of
+NEARBY_GRID_DEGREES, so everyone panning the map around the same spot shares
+one entry keyed by cell, radius, cuisine and limit. Each entry records the
+versions of the coarse invalidation tiles (NEARBY_TILE_DEGREES) its search
+circle overlaps. When a restaurant changes, the tiles under its old and new
+positions are bumped, and every entry that overlapped them stops matching.
+"""
+import hashlib
+import json
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+
+from .geo import bounding_box
+
+KEY_PREFIX = 'restaurant:nearby:v1'
+TILE_PREFIX = 'restaurant:nearby-tile'
+# Searches spanning more tiles than this depend on the world tile instead
+MAX_TILES = 256
+WORLD_TILE = f'{TILE_PREFIX}:world'
+
+
+def grid_degrees():
+    return getattr(settings, 'NEARBY_GRID_DEGREES', 0.01)
+
+
+def tile_degrees():
+    return getattr(settings, 'NEARBY_TILE_DEGREES', 1.0)
+
+
+def quantize(lat, lon):
+    """Centre of the grid cell containing the point"""
+    step = grid_degrees()
+    lat = (math.floor(lat / step) + 0.5) * step
+    lon = (math.floor(lon / step) + 0.5) * step
+    return round(min(max(lat, -90), 90), 6), round(min(max(lon, -180), 180), 6)
+
+
+def tile_key(lat, lon):
+    size = tile_degrees()
+    return f'{TILE_PREFIX}:{math.floor(lat / size)}:{math.floor(lon / size) % round(360 / size)}'
+
+
+def tile_keys_for_search(lat, lon, radius_km):
+    """Keys of every invalidation tile the search circle's bounding box touches"""
+    size = tile_degrees()
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    rows = range(math.floor(min_lat / size), math.floor(max_lat / size) + 1)
+    if min_lon <= max_lon:
+        columns = range(math.floor(min_lon / size), math.floor(max_lon / size) + 1)
+    else:  # wraps the antimeridian
+        columns = range(math.floor(min_lon / size), math.floor((max_lon + 360) / size) + 1)
+    if len(rows) * len(columns) > MAX_TILES:
+        return [WORLD_TILE]
+    wrap = round(360 / size)
+    return [f'{TILE_PREFIX}:{row}:{column % wrap}' for row in rows for column in columns]
+
+
+def search_key(lat, lon, radius_km, cuisine, limit, open_minute=None):
+    open_minute = '' if open_minute is None else open_minute
+    return f'{KEY_PREFIX}:{lat}:{lon}:{radius_km}:{cuisine.lower()}:{limit or ""}:{open_minute}'
+
+
+def get_nearby_payload(lat, lon, radius_km, cuisine, limit, build, open_minute=None):
+    """
+    (payload, etag) for a quantized search, from the cache when none of its
+    tiles changed since it was stored; `build()` computes the payload on a miss.
+    Searches filtered on opening hours are keyed by the minute of week.
+    """
+    tiles = tile_keys_for_search(lat, lon, radius_km)
+    key = search_key(lat, lon, radius_km, cuisine, limit, open_minute)
+    found = cache.get_many([key, *tiles])
+    versions = [found.get(tile, 0) for tile in tiles]
+
+    entry = found.get(key)
+    if entry is not None and entry['versions'] == versions:
+        return entry['payload'], entry['etag']
+
+    payload = build()
+    body = json.dumps(payload, cls=JSONEncoder, sort_keys=True).encode()
+    etag = '"%s"' % hashlib.md5(body).hexdigest()
+    cache.set(key, {'versions': versions, 'payload': payload, 'etag': etag},
+              getattr(settings, 'NEARBY_CACHE_TIMEOUT', 120))
+    return payload, etag
+
+
+def invalidate_points(*points):
+    """Bump the tiles under the given (lat, lon) points and the world tile"""
+    for tile in {tile_key(float(lat), float(lon)) for lat, lon in points} | {WORLD_TILE}:
+        try:
+            cache.incr(tile)
+        except ValueError:
+            cache.set(tile, 1, None)
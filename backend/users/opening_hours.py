@@ -0,0 +1,131 @@
+"""
+"Open now" index over restaurant opening hours.
+
+A location's daily hours (in its own time zone) are expanded into half-open
+intervals of minutes-of-week in UTC, Monday 00:00 = 0, and stored as
+RestaurantOpeningInterval rows. Overnight spans run past midnight and spans
+crossing the end of the week are split in two, so "open at T" is the plain
+range predicate `start_minute <= m < end_minute` on an indexed table for every
+restaurant, whatever its time zone.
+
+UTC offsets are taken for the current week; run
+`manage.py rebuild_opening_hours` after daylight-saving changes.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import RestaurantOpeningInterval
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# Candidate ids per interval query, well under SQLite's bound-parameter limit
+BATCH_SIZE = 500
+
+
+def minute_of_week(at=None):
+    """UTC minute-of-week of an aware datetime (default: now)"""
+    at = (at or timezone.now()).astimezone(dt_timezone.utc)
+    return at.weekday() * MINUTES_PER_DAY + at.hour * 60 + at.minute
+
+
+def week_intervals(hours_open, hours_close, tz_name, is_open=True, week_of=None):
+    """
+    Sorted (start, end) UTC minute-of-week intervals for daily hours.
+    Missing hours mean open around the clock; is_open=False means closed.
+    """
+    if not is_open:
+        return []
+    if hours_open is None or hours_close is None:
+        return [(0, MINUTES_PER_WEEK)]
+
+    tz = ZoneInfo(tz_name)
+    duration = (
+        (hours_close.hour * 60 + hours_close.minute) - (hours_open.hour * 60 + hours_open.minute)
+    ) % MINUTES_PER_DAY or MINUTES_PER_DAY  # equal times: open 24 hours
+
+    today = timezone.now().astimezone(tz).date() if week_of is None else week_of
+    monday = today - timedelta(days=today.weekday())
+    intervals = []
+    for day in range(7):
+        local_open = datetime.combine(monday + timedelta(days=day), time(hours_open.hour, hours_open.minute), tz)
+        start = minute_of_week(local_open)
+        end = start + duration
+        if end <= MINUTES_PER_WEEK:
+            intervals.append((start, end))
+        else:
+            intervals.extend([(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)])
+    return sorted(intervals)
+
+
+def location_intervals(location):
+    return week_intervals(location.hours_open, location.hours_close, location.timezone, location.is_open)
+
+
+def sync_opening_intervals(location):
+    """Replace a location's stored intervals with ones computed from its hours"""
+    with transaction.atomic():
+        RestaurantOpeningInterval.objects.filter(location=location).delete()
+        RestaurantOpeningInterval.objects.bulk_create([
+            RestaurantOpeningInterval(location=location, start_minute=start, end_minute=end)
+            for start, end in location_intervals(location)
+        ])
+
+
+def open_at_filter(at=None, location='location'):
+    """
+    Exists() expression selecting rows whose `location` is open at `at`
+    (default: now); use location='pk' on RestaurantLocation querysets.
+    """
+    minute = minute_of_week(at)
+    return Exists(RestaurantOpeningInterval.objects.filter(
+        location=OuterRef(location), start_minute__lte=minute, end_minute__gt=minute,
+    ))
+
+
+def open_restaurant_ids(restaurant_ids, at=None):
+    """
+    The subset of `restaurant_ids` open at `at`. Only the candidates'
+    intervals are read, in batches, so the cost follows the candidate count
+    rather than the number of restaurants open worldwide.
+    """
+    minute = minute_of_week(at)
+    restaurant_ids = list(restaurant_ids)
+    open_ids = set()
+    for start in range(0, len(restaurant_ids), BATCH_SIZE):
+        open_ids.update(
+            RestaurantOpeningInterval.objects.filter(
+                location__restaurant_id__in=restaurant_ids[start:start + BATCH_SIZE],
+                start_minute__lte=minute, end_minute__gt=minute,
+            ).values_list('location__restaurant_id', flat=True)
+        )
+    return open_ids
+
+
+def rebuild_intervals(location_model, interval_model, chunk_size=1000):
+    """
+    Recompute every location's intervals from its hours; returns the number
+    of locations. Takes the models so migrations can pass theirs.
+    """
+    rebuilt = 0
+    last_pk = None
+    while True:
+        locations = location_model.objects.order_by('pk').only('pk', 'hours_open', 'hours_close', 'timezone', 'is_open')
+        if last_pk is not None:
+            locations = locations.filter(pk__gt=last_pk)
+        chunk = list(locations[:chunk_size])
+        if not chunk:
+            return rebuilt
+        last_pk = chunk[-1].pk
+
+        with transaction.atomic():
+            interval_model.objects.filter(location__in=chunk).delete()
+            interval_model.objects.bulk_create([
+                interval_model(location=location, start_minute=start, end_minute=end)
+                for location in chunk
+                for start, end in location_intervals(location)
+            ])
+        rebuilt += len(chunk)
@@ -0,0 +1,73 @@
+"""
+Change notification for the store order inbox.
+
+Every committed change to a store's orders bumps a per-store version in the
+shared cache (signals for saves, users.stock for queryset updates).
+Long-polling inbox requests watch that version instead of querying the
+database in a loop, and re-check the database only when it moves. They also
+re-check every ORDER_INBOX_RECHECK_SECONDS in case a write skipped the
+notification.
+
+updated_at is stamped when a row is written, not when its transaction
+commits, so a change can commit after a later-stamped one that a client has
+already read past. The inbox therefore only serves changes at least
+ORDER_INBOX_SETTLE_SECONDS old (see `settled`); writers must stamp
+updated_at with the time of the write itself.
+"""
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+KEY_PREFIX = 'store:orders:version'
+POLL_INTERVAL = 0.25  # seconds between cache checks
+
+
+def version_key(store_id):
+    return f'{KEY_PREFIX}:{store_id}'
+
+
+def current_version(store_id):
+    """Read before querying, so a change landing in between still wakes the waiter"""
+    return cache.get(version_key(store_id))
+
+
+def notify_store(store_id):
+    key = version_key(store_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def settle_seconds():
+    return getattr(settings, 'ORDER_INBOX_SETTLE_SECONDS', 2)
+
+
+def settled(orders):
+    """Orders whose last change is old enough that no earlier write can still be in flight"""
+    return orders.filter(updated_at__lte=timezone.now() - timedelta(seconds=settle_seconds()))
+
+
+def wait_for_changes(store_id, version, has_changes, timeout):
+    """
+    Block until `has_changes()` is true or `timeout` seconds pass; returns
+    whether changes were found. `has_changes` is only called once the store's
+    version differs from `version`, again once that change has settled, and
+    otherwise every ORDER_INBOX_RECHECK_SECONDS.
+    """
+    recheck = getattr(settings, 'ORDER_INBOX_RECHECK_SECONDS', 5)
+    settle = settle_seconds()
+    deadline = time.monotonic() + timeout
+    recheck_at = time.monotonic() + recheck
+    while time.monotonic() < deadline:
+        time.sleep(min(POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        current = cache.get(version_key(store_id))
+        if current != version or time.monotonic() >= recheck_at:
+            if has_changes():
+                return True
+            delay = settle if current != version and settle else recheck
+            version, recheck_at = current, time.monotonic() + delay
+    return False
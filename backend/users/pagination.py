@@ -0,0 +1,141 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor (keyset) pagination.
+
+    Pages are sliced with a WHERE clause on the ordering columns instead of
+    OFFSET, and no COUNT(*) is issued, so every page costs the same as the
+    first one as long as an index covers `ordering`. Orderings may use
+    annotations (e.g. a column of a related model) as long as they are never NULL.
+    """
+    ordering = ('-created_at', 'id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        # Fetch one extra row to know whether there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_position_filter(self, position):
+        """
+        Build `(a, b, c) > (x, y, z)` honouring each column's direction:
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self.get_output_field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_output_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps(values, default=str, separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def get_next_cursor(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data, key='results'):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.get_next_cursor(),
+            'page_size': self.page_size,
+            key: data,
+        })
+
+
+class DeltaSyncPagination(KeysetPagination):
+    """
+    Keyset pagination for polling clients: `?since=` is the cursor of the last
+    row the client has seen, and every response carries the cursor to send
+    next, even when it is empty, so the client never re-reads a row.
+    """
+    ordering = ('updated_at', 'id')
+    cursor_query_param = 'since'
+    invalid_cursor_message = 'Invalid since cursor'
+
+    def pending(self, queryset, request):
+        """Rows the client has not seen yet"""
+        position = self.decode_cursor(request, queryset)
+        return queryset if position is None else queryset.filter(self.get_position_filter(position))
+
+    def get_next_cursor(self):
+        if self.page:
+            return self.encode_cursor(self.page[-1])
+        return self.request.query_params.get(self.cursor_query_param)
+
+    def get_paginated_response(self, data, key='results'):
+        return Response({
+            'since': self.get_next_cursor(),
+            'has_more': self.has_next,
+            'page_size': self.page_size,
+            key: data,
+        })
@@ -0,0 +1,64 @@
+"""
+Two-tier recipe detail cache.
+
+The part of the detail payload that is the same for every viewer (recipe
+fields, author, latest ratings, counters) is cached per recipe. The per-user
+part (`user_liked`, `user_rating`) is a small overlay fetched with one indexed
+query. Signal handlers in users.signals drop the shared document whenever a
+recipe, one of its ratings or likes, or its author's profile changes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Subquery
+
+from .models import Recipe, RecipeLike, RecipeRating
+from .serializers import RecipeDocumentSerializer, RecipeRatingSerializer
+
+KEY_PREFIX = 'recipe:document:v2'
+
+
+def document_key(recipe_id):
+    return f'{KEY_PREFIX}:{recipe_id}'
+
+
+def get_recipe_document(recipe_id):
+    """Shared detail payload for a recipe; raises Recipe.DoesNotExist"""
+    key = document_key(recipe_id)
+    document = cache.get(key)
+    if document is None:
+        recipe = Recipe.objects.select_related('author__profile').get(pk=recipe_id)
+        document = RecipeDocumentSerializer(recipe).data
+        cache.set(key, document, getattr(settings, 'RECIPE_CACHE_TIMEOUT', 300))
+    return document
+
+
+def get_user_overlay(recipe_id, user):
+    """`user_liked` and `user_rating` for one viewer, in a single query"""
+    if not user.is_authenticated:
+        return {'user_liked': False, 'user_rating': None}
+
+    my_rating = RecipeRating.objects.filter(recipe=OuterRef('pk'), user=user)
+    row = (
+        Recipe.objects.filter(pk=recipe_id)
+        .annotate(
+            user_liked=Exists(RecipeLike.objects.filter(recipe=OuterRef('pk'), user=user)),
+            rating_id=Subquery(my_rating.values('id')[:1]),
+            rating_value=Subquery(my_rating.values('rating')[:1]),
+            rating_comment=Subquery(my_rating.values('comment')[:1]),
+            rating_created_at=Subquery(my_rating.values('created_at')[:1]),
+        )
+        .values('user_liked', 'rating_id', 'rating_value', 'rating_comment', 'rating_created_at')
+        .first()
+    )
+    if row is None or row['rating_id'] is None:
+        return {'user_liked': bool(row and row['user_liked']), 'user_rating': None}
+
+    rating = RecipeRating(
+        id=row['rating_id'], rating=row['rating_value'], comment=row['rating_comment'],
+        created_at=row['rating_created_at'], user=user,
+    )
+    return {'user_liked': row['user_liked'], 'user_rating': RecipeRatingSerializer(rating).data}
+
+
+def invalidate_recipes(*recipe_ids):
+    cache.delete_many([document_key(recipe_id) for recipe_id in recipe_ids])
@@ -0,0 +1,146 @@
+"""
+Streaming bulk import/export of recipes (NDJSON or CSV).
+
+Imports read the input one record at a time, validate each with
+RecipeCreateUpdateSerializer and insert valid recipes with chunked
+bulk_create, one transaction per chunk. Exports stream rows straight from a
+server-side `.iterator()`. Memory use stays flat however large the file is.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from .ingredients import prepare_recipe_ingredients
+from .models import CustomUser, Recipe, RecipeIngredient
+from .serializers import RecipeCreateUpdateSerializer
+from .trending import log_weight
+
+FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+EXPORT_FIELDS = ['id', 'author_email'] + RecipeCreateUpdateSerializer.Meta.fields + ['created_at']
+
+
+def detect_format(filename, default='ndjson'):
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    return default
+
+
+def iter_records(stream, fmt):
+    """Yield (line_number, record) pairs from a binary or text stream"""
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            # Empty cells mean "use the default", not an empty value
+            yield reader.line_num, {key: value for key, value in record.items() if key and value != ''}
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, ValueError(f'Invalid JSON: {exc}')
+            continue
+        yield line_number, record
+
+
+class RecipeImporter:
+    """Validate records and insert them in chunks, collecting a per-line error report"""
+
+    def __init__(self, default_author, chunk_size=CHUNK_SIZE, dry_run=False):
+        self.default_author = default_author
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.authors = {}
+        self.pending = []
+        self.report = {'processed': 0, 'created': 0, 'failed': 0, 'errors': []}
+
+    def run(self, records):
+        for line_number, record in records:
+            self.add(line_number, record)
+        self.flush()
+        return self.report
+
+    def add(self, line_number, record):
+        self.report['processed'] += 1
+        if isinstance(record, Exception):
+            return self.fail(line_number, {'non_field_errors': [str(record)]})
+        if not isinstance(record, dict):
+            return self.fail(line_number, {'non_field_errors': ['Expected an object']})
+
+        author = self.get_author(record.get('author_email'))
+        if author is None:
+            return self.fail(line_number, {'author_email': ['No user with this email']})
+
+        serializer = RecipeCreateUpdateSerializer(data=record)
+        if not serializer.is_valid():
+            return self.fail(line_number, serializer.errors)
+
+        self.pending.append(Recipe(author=author, **serializer.validated_data))
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        chunk, self.pending = self.pending, []
+        if not self.dry_run:
+            trending_score = log_weight('create')
+            for recipe in chunk:
+                recipe.trending_score = trending_score
+            with transaction.atomic():
+                # bulk_create skips signals; the FTS index is kept by triggers
+                links = prepare_recipe_ingredients(chunk)
+                Recipe.objects.bulk_create(chunk)
+                RecipeIngredient.objects.bulk_create(links, ignore_conflicts=True)
+        self.report['created'] += len(chunk)
+
+    def fail(self, line_number, errors):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line_number, 'errors': errors})
+
+    def get_author(self, email):
+        if not email:
+            return self.default_author
+        if email not in self.authors:
+            self.authors[email] = CustomUser.objects.filter(email=email).first()
+        return self.authors[email]
+
+
+class Echo:
+    """File-like object whose write() just returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_recipes(fmt, chunk_size=2000):
+    """Yield the whole catalog as NDJSON lines or CSV rows"""
+    fields = [field if field != 'author_email' else 'author__email' for field in EXPORT_FIELDS]
+    rows = Recipe.objects.order_by('-created_at', 'id').values_list(*fields).iterator(chunk_size=chunk_size)
+
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), default=str) + '\n'
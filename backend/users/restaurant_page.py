@@ -0,0 +1,76 @@
+"""
+Composite restaurant page: profile plus the sections the client asks for
+(location, menu, latest ratings, the viewer's own rating) in one response.
+
+The restaurant row is loaded together with the freshness markers of every
+section (latest updated_at / created_at and row counts), so the ETag is known
+after one query and an unchanged page costs nothing more. Each included
+section then adds exactly one query, whatever its size.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from .models import RestaurantMenu, RestaurantRating, RestaurantUserProfile
+from .serializers import RestaurantMenuSerializer, RestaurantPageSerializer, RestaurantRatingSerializer
+
+SECTIONS = ('location', 'menu', 'ratings', 'my_rating')
+DEFAULT_RATINGS_LIMIT = 10
+MAX_RATINGS_LIMIT = 50
+
+
+def subquery_aggregate(queryset, aggregate):
+    """Scalar subquery computing `aggregate` over a restaurant's related rows"""
+    return Subquery(
+        queryset.filter(restaurant=OuterRef('pk')).order_by()
+        .values('restaurant').annotate(value=aggregate).values('value')
+    )
+
+
+def get_page_restaurant(restaurant_id):
+    """Restaurant with its location and section freshness markers; raises DoesNotExist"""
+    return (
+        RestaurantUserProfile.objects.select_related('location')
+        .annotate(
+            menu_updated=subquery_aggregate(RestaurantMenu.objects, Max('updated_at')),
+            menu_count=subquery_aggregate(RestaurantMenu.objects, Count('id')),
+            ratings_latest=subquery_aggregate(RestaurantRating.objects, Max('created_at')),
+            ratings_count=subquery_aggregate(RestaurantRating.objects, Count('id')),
+        )
+        .get(pk=restaurant_id)
+    )
+
+
+def page_etag(restaurant, sections, ratings_limit, user):
+    location = getattr(restaurant, 'location', None)
+    parts = [
+        restaurant.pk, restaurant.updated_at, location and location.updated_at,
+        sorted(sections), ratings_limit,
+    ]
+    if 'menu' in sections:
+        parts += [restaurant.menu_updated, restaurant.menu_count]
+    if 'ratings' in sections or 'my_rating' in sections:
+        parts += [restaurant.ratings_latest, restaurant.ratings_count]
+    if 'my_rating' in sections:
+        parts.append(user.pk)
+    return '"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def page_payload(restaurant, sections, ratings_limit, user):
+    payload = RestaurantPageSerializer(restaurant).data
+    if 'location' not in sections:
+        del payload['location']
+    if 'menu' in sections:
+        payload['menu'] = RestaurantMenuSerializer(restaurant.menu_items.all(), many=True).data
+    if 'ratings' in sections:
+        ratings = (
+            RestaurantRating.objects.filter(restaurant=restaurant)
+            .select_related('user').order_by('-created_at', 'id')[:ratings_limit]
+        )
+        payload['ratings'] = RestaurantRatingSerializer(ratings, many=True).data
+    if 'my_rating' in sections:
+        rating = RestaurantRating.objects.filter(restaurant=restaurant, user=user).first()
+        if rating:
+            rating.user = user
+        payload['my_rating'] = RestaurantRatingSerializer(rating).data if rating else None
+    return payload
@@ -0,0 +1,167 @@
+"""
+Recipe and dish full-text search.
+
+On SQLite, recipes are indexed in the `recipe_fts` FTS5 table and menu items
+in `menu_fts`; triggers created in migrations 0008 and 0017 keep them in sync
+with their tables (this also covers bulk_create and queryset.update()).
+Results are ranked with BM25.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Recipe, RestaurantMenu, normalize_menu_category
+
+# BM25 column weights: title, description, ingredients, dietary_tags
+BM25_WEIGHTS = (10.0, 2.0, 4.0, 3.0)
+# menu_fts: name, description, category, dietary_info
+DISH_BM25_WEIGHTS = (10.0, 2.0, 3.0, 3.0)
+SNIPPET_TOKENS = 12
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text):
+    """
+    Turn free user input into a safe FTS5 MATCH expression: every word must
+    match, the last one as a prefix so search-as-you-type works.
+    """
+    tokens = TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' AND '.join(terms)
+
+
+def search_recipes(text, difficulty=None, cuisine_type=None, limit=20, offset=0):
+    """
+    Return up to `limit` recipes matching `text`, best match first.
+    Each recipe carries `search_rank` and `search_snippet` attributes.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return []
+    if connection.vendor != 'sqlite':
+        return _search_recipes_fallback(text, difficulty, cuisine_type, limit, offset)
+
+    filters = []
+    params = [*BM25_WEIGHTS, SNIPPET_TOKENS, match]
+    if difficulty:
+        filters.append('AND r.difficulty = %s')
+        params.append(difficulty)
+    if cuisine_type:
+        filters.append('AND r.cuisine_type = %s COLLATE NOCASE')
+        params.append(cuisine_type)
+    params += [limit, offset]
+
+    sql = f"""
+        SELECT d.recipe_id,
+               bm25(recipe_fts, %s, %s, %s, %s) AS rank,
+               snippet(recipe_fts, -1, '<mark>', '</mark>', '…', %s) AS snippet
+        FROM recipe_fts
+        JOIN users_recipesearchdocument d ON d.id = recipe_fts.rowid
+        JOIN users_recipe r ON r.id = d.recipe_id
+        WHERE recipe_fts MATCH %s {' '.join(filters)}
+        ORDER BY rank
+        LIMIT %s OFFSET %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    recipe_field = Recipe._meta.pk
+    hits = [(recipe_field.to_python(recipe_id), rank, snippet) for recipe_id, rank, snippet in rows]
+    recipes = Recipe.objects.select_related('author__profile').in_bulk([pk for pk, _, _ in hits])
+
+    results = []
+    for pk, rank, snippet in hits:
+        recipe = recipes.get(pk)
+        if recipe is None:
+            continue
+        # bm25() is lower-is-better; expose a positive score
+        recipe.search_rank = -rank
+        recipe.search_snippet = snippet
+        results.append(recipe)
+    return results
+
+
+def _search_recipes_fallback(text, difficulty, cuisine_type, limit, offset):
+    """Unranked icontains search for databases without FTS5"""
+    recipes = Recipe.objects.select_related('author__profile')
+    for token in TOKEN_RE.findall(text):
+        recipes = recipes.filter(
+            Q(title__icontains=token) | Q(description__icontains=token)
+            | Q(ingredients__icontains=token) | Q(dietary_tags__icontains=token)
+        )
+    if difficulty:
+        recipes = recipes.filter(difficulty=difficulty)
+    if cuisine_type:
+        recipes = recipes.filter(cuisine_type__iexact=cuisine_type)
+
+    results = list(recipes[offset:offset + limit])
+    for recipe in results:
+        recipe.search_rank = None
+        recipe.search_snippet = recipe.description[:120]
+    return results
+
+
+def search_dishes(text=None, min_price=None, max_price=None, category=None, dietary=None,
+                  is_available=None, limit=20, offset=0):
+    """
+    Menu items of verified restaurants, filtered and, when `text` is given,
+    full-text matched best match first (otherwise cheapest first). Each item
+    carries `search_rank` and `search_snippet` attributes.
+    """
+    dishes = RestaurantMenu.objects.filter(restaurant__is_verified=True)
+    if min_price is not None:
+        dishes = dishes.filter(price__gte=min_price)
+    if max_price is not None:
+        dishes = dishes.filter(price__lte=max_price)
+    if category:
+        dishes = dishes.filter(category=normalize_menu_category(category))
+    if dietary:
+        dishes = dishes.filter(dietary_info__icontains=dietary)
+    if is_available is not None:
+        dishes = dishes.filter(is_available=is_available)
+    dishes = dishes.select_related('restaurant')
+
+    match = build_match_query(text) if text else None
+    if match is None or connection.vendor != 'sqlite':
+        if match is not None:
+            for token in TOKEN_RE.findall(text):
+                dishes = dishes.filter(
+                    Q(name__icontains=token) | Q(description__icontains=token)
+                    | Q(category__icontains=token) | Q(dietary_info__icontains=token)
+                )
+        results = list(dishes.order_by('price', 'id')[offset:offset + limit])
+        for dish in results:
+            dish.search_rank = None
+            dish.search_snippet = dish.description[:120]
+        return results
+
+    # Rank inside FTS5, restricted to the rows passing the ORM filters
+    sql, params = dishes.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT menu_fts.rowid,
+                   bm25(menu_fts, %s, %s, %s, %s) AS rank,
+                   snippet(menu_fts, 1, '<mark>', '</mark>', '…', %s) AS snippet
+            FROM menu_fts
+            WHERE menu_fts MATCH %s AND menu_fts.rowid IN ({sql})
+            ORDER BY rank
+            LIMIT %s OFFSET %s
+        """, [*DISH_BM25_WEIGHTS, SNIPPET_TOKENS, match, *params, limit, offset])
+        rows = cursor.fetchall()
+
+    found = dishes.in_bulk([pk for pk, _, _ in rows])
+    results = []
+    for pk, rank, snippet in rows:
+        dish = found.get(pk)
+        if dish is None:
+            continue
+        dish.search_rank = -rank
+        dish.search_snippet = snippet
+        results.append(dish)
+    return results
@@ -1,13 +1,19 @@
+import math
+
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from .models import (
     CustomUser, UserProfile, StoreUserProfile, RestaurantUserProfile, OTP, PasswordResetToken,
     Recipe, RecipeRating, RecipeLike, RestaurantLocation, RestaurantMenu, RestaurantRating,
-    StoreProduct, Order, OrderItem, Payment
+    StoreProduct, Order, OrderItem, Payment, normalize_menu_category
 )
+from .trending import current_score
 from django.core.mail import send_mail
+from django.db.models import Avg
 from django.conf import settings
+from django.utils import timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import secrets
 
 # ============================================================================
@@ -339,9 +345,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
     """Serializer for recipe list view"""
     author_email = serializers.CharField(source='author.email', read_only=True)
     author_name = serializers.SerializerMethodField()
-    rating_count = serializers.SerializerMethodField()
-    likes_count = serializers.SerializerMethodField()
-    avg_rating = serializers.SerializerMethodField()
+    avg_rating = serializers.ReadOnlyField()
     
     class Meta:
         model = Recipe
@@ -351,34 +355,57 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'recipe_video', 'dietary_tags', 'views_count', 'rating_count', 'likes_count', 'avg_rating',
             'created_at'
         ]
-        read_only_fields = ['id', 'author_email', 'views_count', 'created_at']
+        read_only_fields = ['id', 'author_email', 'views_count', 'rating_count', 'likes_count', 'created_at']
     
     def get_author_name(self, obj):
         return f"{obj.author.profile.first_name} {obj.author.profile.last_name}".strip() or obj.author.email
+
+
+class RecipeSearchResultSerializer(RecipeListSerializer):
+    """Recipe list item with its full-text search rank and highlighted snippet"""
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+    snippet = serializers.CharField(source='search_snippet', read_only=True)
     
-    def get_rating_count(self, obj):
-        return obj.ratings.count()
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ['rank', 'snippet']
+
+
+class PantryRecipeSerializer(RecipeListSerializer):
+    """Recipe list item with how well a pantry covers its ingredients"""
+    matched_count = serializers.IntegerField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = serializers.ListField(child=serializers.CharField(), read_only=True)
     
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + [
+            'matched_count', 'missing_count', 'coverage', 'missing_ingredients'
+        ]
+
+
+class TrendingRecipeSerializer(RecipeListSerializer):
+    """Recipe list item with its current (decayed) trending score"""
+    trending_score = serializers.SerializerMethodField()
     
-    def get_avg_rating(self, obj):
-        ratings = obj.ratings.all()
-        if ratings.exists():
-            total = sum(r.rating for r in ratings)
-            return round(total / ratings.count(), 2)
-        return 0
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ['trending_score']
+    
+    def get_trending_score(self, obj):
+        return current_score(obj.trending_score)
 
 
-class RecipeDetailSerializer(serializers.ModelSerializer):
-    """Detailed recipe serializer with ratings and likes"""
+class RecipeDocumentSerializer(serializers.ModelSerializer):
+    """
+    Recipe detail fields shared by every viewer (cached per recipe, see users.recipe_cache).
+    Only the latest few ratings are embedded; the rest are paged via recipes/<id>/ratings/.
+    """
+    RECENT_RATINGS = 5
+    
     author_email = serializers.CharField(source='author.email', read_only=True)
     author_name = serializers.SerializerMethodField()
-    ratings = RecipeRatingSerializer(many=True, read_only=True)
-    likes_count = serializers.SerializerMethodField()
-    user_liked = serializers.SerializerMethodField()
-    user_rating = serializers.SerializerMethodField()
-    avg_rating = serializers.SerializerMethodField()
+    ratings = serializers.SerializerMethodField()
+    rating_histogram = serializers.ReadOnlyField()
+    avg_rating = serializers.ReadOnlyField()
     
     class Meta:
         model = Recipe
@@ -386,16 +413,32 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             'id', 'title', 'author_email', 'author_name', 'description', 'ingredients',
             'instructions', 'difficulty', 'cuisine_type', 'preparation_time', 'cooking_time',
             'servings', 'recipe_image', 'recipe_video', 'calories', 'dietary_tags', 'views_count',
-            'likes_count', 'user_liked', 'rating_count', 'user_rating', 'avg_rating',
-            'ratings', 'created_at', 'updated_at'
+            'likes_count', 'rating_count', 'avg_rating', 'rating_histogram', 'ratings',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'views_count', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'views_count', 'likes_count', 'rating_count', 'created_at', 'updated_at']
     
     def get_author_name(self, obj):
         return f"{obj.author.profile.first_name} {obj.author.profile.last_name}".strip() or obj.author.email
     
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    def get_ratings(self, obj):
+        latest = obj.ratings.select_related('user').order_by(*RecipeRating.RECENT_ORDERING)[:self.RECENT_RATINGS]
+        return RecipeRatingSerializer(latest, many=True).data
+
+
+class RecipeDetailSerializer(RecipeDocumentSerializer):
+    """Detailed recipe serializer with ratings and likes"""
+    user_liked = serializers.SerializerMethodField()
+    user_rating = serializers.SerializerMethodField()
+    
+    class Meta(RecipeDocumentSerializer.Meta):
+        fields = [
+            'id', 'title', 'author_email', 'author_name', 'description', 'ingredients',
+            'instructions', 'difficulty', 'cuisine_type', 'preparation_time', 'cooking_time',
+            'servings', 'recipe_image', 'recipe_video', 'calories', 'dietary_tags', 'views_count',
+            'likes_count', 'user_liked', 'rating_count', 'user_rating', 'avg_rating',
+            'rating_histogram', 'ratings', 'created_at', 'updated_at'
+        ]
     
     def get_user_liked(self, obj):
         request = self.context.get('request')
@@ -409,13 +452,6 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             rating = obj.ratings.filter(user=request.user).first()
             return RecipeRatingSerializer(rating).data if rating else None
         return None
-    
-    def get_avg_rating(self, obj):
-        ratings = obj.ratings.all()
-        if ratings.exists():
-            total = sum(r.rating for r in ratings)
-            return round(total / ratings.count(), 2)
-        return 0
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -428,6 +464,13 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             'cuisine_type', 'preparation_time', 'cooking_time', 'servings',
             'recipe_image', 'recipe_video', 'calories', 'dietary_tags'
         ]
+    
+    def update(self, instance, validated_data):
+        # Only write the edited columns so counters maintained with F() aren't clobbered
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 
 # ============================================================================
@@ -444,6 +487,20 @@ class RestaurantMenuSerializer(serializers.ModelSerializer):
             'dietary_info', 'image', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_category(self, value):
+        return normalize_menu_category(value)
+
+
+class DishSearchResultSerializer(RestaurantMenuSerializer):
+    """Menu item found by dish search, with its restaurant and search rank"""
+    restaurant_id = serializers.IntegerField(read_only=True)
+    restaurant_name = serializers.CharField(source='restaurant.restaurant_name', read_only=True)
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+    snippet = serializers.CharField(source='search_snippet', read_only=True)
+    
+    class Meta(RestaurantMenuSerializer.Meta):
+        fields = RestaurantMenuSerializer.Meta.fields + ['restaurant_id', 'restaurant_name', 'rank', 'snippet']
 
 
 class RestaurantLocationSerializer(serializers.ModelSerializer):
@@ -454,10 +511,25 @@ class RestaurantLocationSerializer(serializers.ModelSerializer):
         model = RestaurantLocation
         fields = [
             'id', 'restaurant_name', 'latitude', 'longitude', 'city', 'country',
-            'postal_code', 'phone_number', 'website', 'hours_open', 'hours_close',
+            'postal_code', 'phone_number', 'website', 'hours_open', 'hours_close', 'timezone',
             'is_open', 'rating_avg', 'total_ratings', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'rating_avg', 'total_ratings', 'created_at', 'updated_at']
+    
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ValueError, ZoneInfoNotFoundError):
+            raise serializers.ValidationError("Unknown time zone.")
+        return value
+
+
+def stored_rating_avg(restaurant):
+    """Average kept on RestaurantLocation; restaurants without a location have no aggregates yet"""
+    location = getattr(restaurant, 'location', None)
+    if location is not None:
+        return float(location.rating_avg)
+    return round(restaurant.ratings.aggregate(avg=Avg('rating'))['avg'] or 0, 2)
 
 
 class RestaurantRatingSerializer(serializers.ModelSerializer):
@@ -488,11 +560,7 @@ class RestaurantDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_verified', 'created_at', 'updated_at']
     
     def get_avg_rating(self, obj):
-        ratings = obj.ratings.all()
-        if ratings.exists():
-            total = sum(r.rating for r in ratings)
-            return round(total / ratings.count(), 2)
-        return 0
+        return stored_rating_avg(obj)
     
     def get_user_rating(self, obj):
         request = self.context.get('request')
@@ -502,6 +570,27 @@ class RestaurantDetailSerializer(serializers.ModelSerializer):
         return None
 
 
+class RestaurantPageSerializer(serializers.ModelSerializer):
+    """Profile part of the composite restaurant page, see users.restaurant_page"""
+    location = RestaurantLocationSerializer(read_only=True)
+    rating_avg = serializers.SerializerMethodField()
+    total_ratings = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = RestaurantUserProfile
+        fields = [
+            'id', 'restaurant_name', 'restaurant_description', 'restaurant_address',
+            'cuisine_type', 'is_verified', 'location', 'rating_avg', 'total_ratings',
+            'created_at', 'updated_at'
+        ]
+    
+    def get_rating_avg(self, obj):
+        return stored_rating_avg(obj)
+    
+    def get_total_ratings(self, obj):
+        return obj.ratings_count or 0
+
+
 class RestaurantListSerializer(serializers.ModelSerializer):
     """Serializer for restaurant list view"""
     location = RestaurantLocationSerializer(read_only=True)
@@ -515,19 +604,43 @@ class RestaurantListSerializer(serializers.ModelSerializer):
         ]
     
     def get_rating_avg(self, obj):
-        ratings = obj.ratings.all()
-        if ratings.exists():
-            total = sum(r.rating for r in ratings)
-            return round(total / ratings.count(), 2)
-        return 0
+        return stored_rating_avg(obj)
 
 
-class NearbyRestaurantSerializer(serializers.Serializer):
+class NearbyRestaurantResultSerializer(RestaurantListSerializer):
+    """Restaurant list entry with its distance from the search point"""
+    distance_km = serializers.ReadOnlyField()
+    
+    class Meta(RestaurantListSerializer.Meta):
+        fields = RestaurantListSerializer.Meta.fields + ['distance_km']
+
+
+class RestaurantOpenFilterSerializer(serializers.Serializer):
+    """Optional "open now" / "open at" filter shared by restaurant searches"""
+    open_now = serializers.BooleanField(required=False, default=False)
+    open_at = serializers.DateTimeField(required=False)
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if attrs.get('open_now') and 'open_at' not in attrs:
+            attrs['open_at'] = timezone.now()
+        return attrs
+
+
+class NearbyRestaurantSerializer(RestaurantOpenFilterSerializer):
     """Serializer for nearby restaurant search query"""
-    latitude = serializers.DecimalField(max_digits=9, decimal_places=6)
-    longitude = serializers.DecimalField(max_digits=9, decimal_places=6)
-    radius = serializers.IntegerField(default=10, help_text="Radius in kilometers")
+    latitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-90, max_value=90)
+    longitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-180, max_value=180)
+    radius = serializers.FloatField(default=10, min_value=0.1, max_value=500, help_text="Radius in kilometers")
     cuisine_type = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100,
+                                     help_text="Return only the k nearest restaurants")
+    
+    def validate_radius(self, value):
+        # The range validators let NaN through: every comparison with it is False
+        if not math.isfinite(value):
+            raise serializers.ValidationError("A valid number is required.")
+        return value
 
 
 # ============================================================================
@@ -541,10 +654,32 @@ class StoreProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = StoreProduct
         fields = [
-            'id', 'store_name', 'name', 'description', 'price', 'category',
+            'id', 'store_name', 'sku', 'name', 'description', 'price', 'category',
             'stock', 'is_available', 'image', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate_sku(self, value):
+        """SKUs are unique per store; the store comes from the instance or the `store` context"""
+        if self.instance and value == self.instance.sku:
+            return value
+        store = self.instance.store if self.instance else self.context.get('store')
+        if value and store is not None:
+            duplicates = StoreProduct.objects.filter(store=store, sku=value)
+            if self.instance:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError("Your store already has a product with this SKU")
+        return value
+
+
+class CatalogProductSerializer(StoreProductSerializer):
+    """Product in the cross-store catalog, with its store and search rank (relevance sort only)"""
+    store_id = serializers.IntegerField(read_only=True)
+    rank = serializers.FloatField(source='search_rank', read_only=True, default=None)
+    
+    class Meta(StoreProductSerializer.Meta):
+        fields = StoreProductSerializer.Meta.fields + ['store_id', 'rank']
 
 
 # ============================================================================
@@ -578,6 +713,42 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'order_id', 'total_amount', 'subtotal', 'tax', 'created_at', 'updated_at']
 
 
+class OrderFilterSerializer(serializers.Serializer):
+    """Query params of the order history"""
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
+    store_id = serializers.IntegerField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+
+class StoreInboxSerializer(serializers.Serializer):
+    """Query params of the store order inbox (the `since` cursor is read by the paginator)"""
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
+    wait = serializers.IntegerField(required=False, default=0, min_value=0,
+                                    help_text="Seconds to hold the request while nothing changed")
+
+
+class OrderLineSerializer(serializers.Serializer):
+    """One line of a new order"""
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(default=1, min_value=1, max_value=1000)
+
+
+class OrderCreateSerializer(serializers.Serializer):
+    """Request body for placing an order"""
+    MAX_LINES = 100
+    
+    store_id = serializers.IntegerField()
+    items = OrderLineSerializer(many=True, allow_empty=False)
+    delivery_address = serializers.CharField(required=False, allow_blank=True, default='')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate_items(self, value):
+        if len(value) > self.MAX_LINES:
+            raise serializers.ValidationError(f"At most {self.MAX_LINES} lines per order")
+        return value
+
+
 class PaymentSerializer(serializers.ModelSerializer):
     """Serializer for payments"""
     order_id = serializers.CharField(source='order.order_id', read_only=True)
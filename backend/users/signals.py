@@ -0,0 +1,200 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .geo import restaurant_index
+from .ingredients import sync_recipe_ingredients
+from .map_tiles import apply_point, invalidate_tiles
+from .models import (
+    Order, Recipe, RecipeLike, RecipeRating, RestaurantLocation, RestaurantRating, RestaurantUserProfile,
+    UserProfile
+)
+from .nearby_cache import invalidate_points
+from .order_inbox import notify_store
+from .opening_hours import sync_opening_intervals
+from .recipe_cache import invalidate_recipes
+from .trending import log_weight
+
+OPENING_HOURS_FIELDS = {'hours_open', 'hours_close', 'timezone', 'is_open'}
+
+
+@receiver(pre_save, sender=Recipe)
+def seed_trending_score(sender, instance, **kwargs):
+    """New recipes start with a 'create' event so they get some initial exposure"""
+    if instance._state.adding:
+        instance.trending_score = log_weight('create')
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe_ingredients(sender, instance, created, update_fields=None, **kwargs):
+    """Re-parse the ingredients text into the inverted index when it may have changed"""
+    if update_fields is not None and 'ingredients' not in update_fields:
+        return
+    sync_recipe_ingredients(instance)
+
+
+# Invalidate after commit so a concurrent reader can't re-cache the old state
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_document(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_recipes(instance.pk))
+
+
+@receiver(post_save, sender=RecipeRating)
+@receiver(post_delete, sender=RecipeRating)
+@receiver(post_save, sender=RecipeLike)
+@receiver(post_delete, sender=RecipeLike)
+def invalidate_rated_recipe_document(sender, instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: invalidate_recipes(recipe_id))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_author_recipe_documents(sender, instance, **kwargs):
+    """author_name is embedded in every recipe document of this author"""
+    user_id = instance.user_id
+    transaction.on_commit(
+        lambda: invalidate_recipes(*Recipe.objects.filter(author_id=user_id).values_list('pk', flat=True))
+    )
+
+
+# Keep the in-memory restaurant geo index and the nearby search cache in step
+# with the database
+
+@receiver(pre_save, sender=RestaurantLocation)
+def seed_restaurant_rating_aggregates(sender, instance, **kwargs):
+    """Ratings given before the restaurant had a location still count"""
+    if instance._state.adding:
+        totals = RestaurantRating.objects.filter(restaurant_id=instance.restaurant_id).aggregate(
+            total=Sum('rating'), count=Count('id')
+        )
+        instance.rating_sum = totals['total'] or 0
+        instance.total_ratings = totals['count']
+        instance.rating_avg = (
+            round(Decimal(instance.rating_sum) / instance.total_ratings, 2) if instance.total_ratings else 0
+        )
+
+
+@receiver(post_save, sender=RestaurantLocation)
+def index_opening_hours(sender, instance, update_fields=None, **kwargs):
+    """Re-derive the minutes-of-week intervals when the hours may have changed"""
+    if update_fields is not None and not OPENING_HOURS_FIELDS & set(update_fields):
+        return
+    sync_opening_intervals(instance)
+
+
+@receiver(pre_save, sender=RestaurantLocation)
+def remember_previous_location(sender, instance, **kwargs):
+    """Cached searches around the old position go stale when a restaurant moves"""
+    instance._previous_point = None
+    if not instance._state.adding:
+        instance._previous_point = (
+            RestaurantLocation.objects.filter(pk=instance.pk).values_list('latitude', 'longitude').first()
+        )
+
+
+@receiver(post_save, sender=RestaurantLocation)
+@receiver(post_delete, sender=RestaurantLocation)
+@receiver(post_save, sender=RestaurantUserProfile)
+def patch_restaurant_geo_index(sender, instance, **kwargs):
+    """Location moves, verification and cuisine changes all affect the index"""
+    if sender is RestaurantLocation:
+        restaurant_id = instance.restaurant_id
+        points = [(instance.latitude, instance.longitude)]
+        if getattr(instance, '_previous_point', None):
+            points.append(instance._previous_point)
+    else:
+        restaurant_id = instance.pk
+        points = list(RestaurantLocation.objects.filter(restaurant=instance).values_list('latitude', 'longitude'))
+
+    def apply():
+        if restaurant_index is not None:
+            restaurant_index.update_restaurant(restaurant_id)
+        if points:
+            invalidate_points(*points)
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=RestaurantRating)
+@receiver(post_delete, sender=RestaurantRating)
+def invalidate_rated_restaurant_searches(sender, instance, **kwargs):
+    """Cached nearby results embed rating_avg, which rating writes change through update()"""
+    points = list(
+        RestaurantLocation.objects.filter(restaurant_id=instance.restaurant_id).values_list('latitude', 'longitude')
+    )
+    if points:
+        transaction.on_commit(lambda: invalidate_points(*points))
+
+
+# Map cluster cells are patched inside the saving transaction so they never
+# disagree with committed locations; cached tiles are dropped after commit
+
+def is_verified_restaurant(restaurant_id):
+    return RestaurantUserProfile.objects.filter(pk=restaurant_id, is_verified=True).exists()
+
+
+def same_point(a, b):
+    return [Decimal(str(value)) for value in a] == [Decimal(str(value)) for value in b]
+
+
+@receiver(post_save, sender=RestaurantLocation)
+def update_map_clusters_for_location(sender, instance, created, **kwargs):
+    point = (instance.latitude, instance.longitude)
+    previous = getattr(instance, '_previous_point', None)
+    if previous is not None and same_point(previous, point):
+        return
+    if not is_verified_restaurant(instance.restaurant_id):
+        return
+    if previous is not None:
+        apply_point(*previous, -1)
+    apply_point(*point, 1)
+    points = [point] + ([previous] if previous is not None else [])
+    transaction.on_commit(lambda: invalidate_tiles(*points))
+
+
+@receiver(post_delete, sender=RestaurantLocation)
+def remove_location_from_map_clusters(sender, instance, **kwargs):
+    if not is_verified_restaurant(instance.restaurant_id):
+        return
+    point = (instance.latitude, instance.longitude)
+    apply_point(*point, -1)
+    transaction.on_commit(lambda: invalidate_tiles(point))
+
+
+@receiver(pre_save, sender=RestaurantUserProfile)
+def remember_previous_listing(sender, instance, **kwargs):
+    instance._previous_listing = None
+    if not instance._state.adding:
+        instance._previous_listing = (
+            RestaurantUserProfile.objects.filter(pk=instance.pk)
+            .values_list('is_verified', 'restaurant_name', 'cuisine_type').first()
+        )
+
+
+@receiver(post_save, sender=RestaurantUserProfile)
+def update_map_clusters_for_restaurant(sender, instance, **kwargs):
+    """Verification adds or removes the restaurant; name and cuisine show on high-zoom tiles"""
+    previous = getattr(instance, '_previous_listing', None) or (False, None, None)
+    was_verified = previous[0]
+    if not was_verified and not instance.is_verified:
+        return
+    if was_verified and previous[1:] == (instance.restaurant_name, instance.cuisine_type) and instance.is_verified:
+        return
+    point = RestaurantLocation.objects.filter(restaurant=instance).values_list('latitude', 'longitude').first()
+    if point is None:
+        return
+    if was_verified != instance.is_verified:
+        apply_point(*point, 1 if instance.is_verified else -1)
+    transaction.on_commit(lambda: invalidate_tiles(point))
+
+
+@receiver(post_save, sender=Order)
+def notify_store_order_inbox(sender, instance, **kwargs):
+    """Wake long-polling inbox requests of the order's store once the change is visible"""
+    store_id = instance.store_id
+    transaction.on_commit(lambda: notify_store(store_id))
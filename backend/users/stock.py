@@ -0,0 +1,89 @@
+"""
+Stock reservations for orders.
+
+Placing an order claims stock with one conditional
+`UPDATE ... SET stock = stock - q WHERE id = p AND stock >= q` per product,
+all in one transaction: no product row is read first, so concurrent orders
+never oversell and only contend on the rows they actually share. Products are
+claimed in id order so two orders over the same products cannot deadlock.
+
+The order keeps the stock until `reservation_expires_at`. Paying confirms the
+claim; otherwise `manage.py release_expired_reservations` returns the stock
+and cancels the order. Confirm and release are both conditional updates on
+the order row, so exactly one of them wins.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Order, OrderItem, StoreProduct
+from .order_inbox import notify_store
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(f'Insufficient stock for product {product_id}')
+        self.product_id = product_id
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(minutes=getattr(settings, 'ORDER_RESERVATION_MINUTES', 15))
+
+
+def claim_stock(quantities):
+    """
+    Take {product_id: quantity} out of stock, all or nothing; raises
+    InsufficientStock for the first product that cannot cover its quantity
+    """
+    with transaction.atomic():
+        for product_id, quantity in sorted(quantities.items()):
+            claimed = StoreProduct.objects.filter(
+                pk=product_id, is_available=True, stock__gte=quantity
+            ).update(stock=F('stock') - quantity)
+            if not claimed:
+                raise InsufficientStock(product_id)
+
+
+def order_quantities(order):
+    quantities = Counter()
+    for product_id, quantity in OrderItem.objects.filter(order=order).values_list('product_id', 'quantity'):
+        quantities[product_id] += quantity
+    return quantities
+
+
+def confirm_reservation(order):
+    """Keep the order's claimed stock for good; False if the hold expired or was released"""
+    if order.reservation_expires_at is None:
+        # Orders from before reservations never claimed stock
+        return order.status != 'cancelled'
+    confirmed = Order.objects.filter(
+        pk=order.pk, reservation_expires_at__gt=timezone.now()
+    ).update(reservation_expires_at=None, updated_at=timezone.now())
+    if confirmed:
+        order.reservation_expires_at = None
+    return bool(confirmed)
+
+
+def release_reservation(order_pk, now=None):
+    """
+    Return an order's stock and cancel it if its hold expired by `now`; False
+    if it was confirmed or released meanwhile
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        # `now` is only the expiry cutoff; the inbox cursor needs the time of this write
+        released = Order.objects.filter(pk=order_pk, reservation_expires_at__lte=now).update(
+            reservation_expires_at=None, status='cancelled', updated_at=timezone.now()
+        )
+        if not released:
+            return False
+        for product_id, quantity in sorted(order_quantities(order_pk).items()):
+            StoreProduct.objects.filter(pk=product_id).update(stock=F('stock') + quantity)
+        # update() sends no post_save; tell the store's inbox directly
+        store_id = Order.objects.filter(pk=order_pk).values_list('store_id', flat=True).first()
+        transaction.on_commit(lambda: notify_store(store_id))
+    return True
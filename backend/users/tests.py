@@ -1,3 +1,1229 @@
-from django.test import TestCase
+"""
+Tests for the users API.
 
-# Create your tests here.
+The behaviour tests at the bottom cover the write paths that maintain
+denormalized state. The benchmarks seed a configurable catalog and drive the
+hot endpoints through the test client. They record query count, wall time and
+response size per endpoint. A run fails when an endpoint exceeds its query
+budget; results are written as JSON so runs can be compared.
+
+Volumes and output are configured through environment variables, e.g.
+
+    BENCH_RECIPES=5000 BENCH_RESTAURANTS=2000 BENCH_OUTPUT=/tmp/bench.json \\
+        python manage.py test users
+"""
+from datetime import timedelta
+from decimal import Decimal
+import io
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import django
+from rest_framework.test import APIClient
+
+from .models import (
+    CustomUser, UserProfile, StoreUserProfile, RestaurantUserProfile,
+    Recipe, RecipeRating, RecipeLike, RestaurantClusterCell, RestaurantLocation, RestaurantOpeningInterval,
+    RestaurantRating, StoreProduct, Order, OrderItem, IdempotencyRecord
+)
+from .geo import restaurant_index
+from .idempotency import find_replay
+from .map_tiles import CELL_BITS, rebuild_cells, tile_xy
+from .order_inbox import current_version, notify_store, wait_for_changes
+from .opening_hours import MINUTES_PER_WEEK, open_restaurant_ids, rebuild_intervals
+from .stock import InsufficientStock, claim_stock, confirm_reservation, release_reservation
+from .trending import rebuild_scores
+from .view_counter import spill_views
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+VOLUMES = {
+    'users': env_int('BENCH_USERS', 20),
+    'recipes': env_int('BENCH_RECIPES', 200),
+    'ratings_per_recipe': env_int('BENCH_RATINGS_PER_RECIPE', 5),
+    'restaurants': env_int('BENCH_RESTAURANTS', 50),
+    'stores': env_int('BENCH_STORES', 2),
+    'products_per_store': env_int('BENCH_PRODUCTS', 50),
+    'orders': env_int('BENCH_ORDERS', 20),
+    'items_per_order': env_int('BENCH_ITEMS_PER_ORDER', 3),
+}
+STRESS = {
+    'threads': env_int('BENCH_STRESS_THREADS', 8),
+    'attempts_per_thread': env_int('BENCH_STRESS_ATTEMPTS', 25),
+    'stock': env_int('BENCH_STRESS_STOCK', 50),
+}
+REPEAT = env_int('BENCH_REPEAT', 3)
+OUTPUT = os.environ.get('BENCH_OUTPUT', str(settings.BASE_DIR / 'benchmark_results.json'))
+
+# Kathmandu; restaurants are scattered within ~20 km of it
+CENTER = (27.7172, 85.3240)
+
+# Allowed queries per request: `base` plus `per_row` for every row in the
+# response. A non-zero per_row is a known N+1 that should be driven to 0.
+QUERY_BUDGETS = {
+    'recipe_list': {'base': 1, 'per_row': 0},
+    'recipe_detail_cold': {'base': 3, 'per_row': 0},
+    'recipe_detail_warm': {'base': 1, 'per_row': 0},
+    'recipe_trending': {'base': 1, 'per_row': 0},
+    'restaurant_list': {'base': 1, 'per_row': 0},
+    'restaurant_nearby': {'base': 1, 'per_row': 0},
+    'restaurant_nearby_cached': {'base': 0, 'per_row': 0},
+    'restaurant_tiles_clustered': {'base': 1, 'per_row': 0},
+    'restaurant_tiles_points': {'base': 1, 'per_row': 0},
+    'orders': {'base': 2, 'per_row': 0},
+    'store_order_inbox': {'base': 3, 'per_row': 0},
+    'store_products': {'base': 3, 'per_row': 0},
+    'product_catalog': {'base': 2, 'per_row': 0},
+}
+
+
+class UsersApiBenchmark(TestCase):
+    results = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(42)
+        password = make_password('benchmark-pass')
+
+        def make_users(prefix, count, role):
+            users = CustomUser.objects.bulk_create([
+                CustomUser(email=f'{prefix}{i}@bench.test', username=f'{prefix}{i}@bench.test',
+                           password=password, role=role, is_email_verified=True)
+                for i in range(count)
+            ])
+            UserProfile.objects.bulk_create([
+                UserProfile(user=user, first_name=f'{prefix.title()}', last_name=str(i))
+                for i, user in enumerate(users)
+            ])
+            return users
+
+        users = make_users('user', max(VOLUMES['users'], VOLUMES['ratings_per_recipe'], 1), 'normal')
+        cls.user = users[0]
+
+        recipes = Recipe.objects.bulk_create([
+            Recipe(author=rng.choice(users), title=f'Recipe {i}', description='Benchmark recipe',
+                   ingredients='flour, eggs, milk, salt', instructions='Mix and cook.',
+                   difficulty=rng.choice(['easy', 'medium', 'hard']), cuisine_type='Nepali')
+            for i in range(VOLUMES['recipes'])
+        ])
+        ratings, likes = [], []
+        for recipe in recipes:
+            raters = rng.sample(users, VOLUMES['ratings_per_recipe'])
+            for rater in raters:
+                ratings.append(RecipeRating(recipe=recipe, user=rater, rating=rng.randint(1, 5)))
+            likes.extend(RecipeLike(recipe=recipe, user=rater) for rater in raters[:2])
+            recipe.rating_sum = sum(r.rating for r in ratings[-len(raters):])
+            recipe.rating_count = len(raters)
+            recipe.likes_count = min(len(raters), 2)
+        RecipeRating.objects.bulk_create(ratings)
+        RecipeLike.objects.bulk_create(likes)
+        Recipe.objects.bulk_update(recipes, ['rating_sum', 'rating_count', 'likes_count'])
+        cls.recipe = recipes[0] if recipes else None
+
+        owners = make_users('restaurant', VOLUMES['restaurants'], 'restaurant')
+        restaurants = RestaurantUserProfile.objects.bulk_create([
+            RestaurantUserProfile(user=owner, restaurant_name=f'Restaurant {i}',
+                                  restaurant_address='Bench Street', cuisine_type=rng.choice(['Nepali', 'Indian', 'Thai']),
+                                  is_verified=True)
+            for i, owner in enumerate(owners)
+        ])
+        RestaurantLocation.objects.bulk_create([
+            RestaurantLocation(
+                restaurant=restaurant,
+                latitude=Decimal(f'{CENTER[0] + rng.uniform(-0.18, 0.18):.6f}'),
+                longitude=Decimal(f'{CENTER[1] + rng.uniform(-0.18, 0.18):.6f}'),
+                city='Kathmandu', country='Nepal', phone_number='0000000',
+            )
+            for restaurant in restaurants
+        ])
+        RestaurantRating.objects.bulk_create([
+            RestaurantRating(restaurant=restaurant, user=rater, rating=rng.randint(1, 5))
+            for restaurant in restaurants
+            for rater in rng.sample(users, min(3, len(users)))
+        ])
+        # Bulk-created locations skip the signals that maintain the cluster cells
+        call_command('rebuild_map_clusters', stdout=io.StringIO())
+
+        store_owners = make_users('store', VOLUMES['stores'], 'store')
+        stores = StoreUserProfile.objects.bulk_create([
+            StoreUserProfile(user=owner, store_name=f'Store {i}', store_address='Bench Street', is_verified=True)
+            for i, owner in enumerate(store_owners)
+        ])
+        products = StoreProduct.objects.bulk_create([
+            StoreProduct(store=store, name=f'Product {i}', price=Decimal('2.50'), category='Vegetables', stock=1000)
+            for store in stores
+            for i in range(VOLUMES['products_per_store'])
+        ])
+        cls.store = stores[0] if stores else None
+
+        if stores and products:
+            orders = Order.objects.bulk_create([
+                Order(order_id=f'bench-{i}', customer=cls.user, store=stores[0], status='paid')
+                for i in range(VOLUMES['orders'])
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=1, price=product.price, subtotal=product.price)
+                for order in orders
+                for product in rng.sample(products[:VOLUMES['products_per_store']], VOLUMES['items_per_order'])
+            ])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.results:
+            with open(OUTPUT, 'w') as fh:
+                json.dump({
+                    'timestamp': timezone.now().isoformat(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'volumes': VOLUMES,
+                    'repeat': REPEAT,
+                    'endpoints': cls.results,
+                }, fh, indent=2, sort_keys=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Write buffered recipe views while the test database still exists
+        self.addCleanup(spill_views)
+        # Seed data is bulk-created, which the geo index signals never see
+        if restaurant_index is not None:
+            restaurant_index.invalidate()
+
+    def bench(self, name, method, url, data=None, rows=None, repeat=REPEAT, before=None):
+        """Call an endpoint `repeat` times and check the last call against its budget"""
+        timings = []
+        for _ in range(repeat):
+            if before:
+                before()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, data, format='json')
+                timings.append(time.perf_counter() - started)
+        self.assertLess(response.status_code, 300, response.content[:500])
+
+        row_count = len(rows(response.data)) if rows else 0
+        budget = QUERY_BUDGETS[name]
+        allowed = budget['base'] + budget['per_row'] * row_count
+        self.results[name] = {
+            'queries': len(queries),
+            'query_budget': allowed,
+            'rows': row_count,
+            'response_bytes': len(response.content),
+            'wall_ms_median': round(statistics.median(timings) * 1000, 3),
+            'wall_ms_min': round(min(timings) * 1000, 3),
+        }
+        self.assertLessEqual(
+            len(queries), allowed,
+            f"{name} ran {len(queries)} queries (budget {allowed}):\n"
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
+
+    def test_recipe_list(self):
+        self.bench('recipe_list', 'get', '/api/recipes/', rows=lambda data: data['recipes'])
+
+    def test_recipe_detail(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        self.bench('recipe_detail_cold', 'get', url, before=cache.clear)
+        self.bench('recipe_detail_warm', 'get', url)
+
+    def test_recipe_trending(self):
+        self.bench('recipe_trending', 'get', '/api/recipes/trending/', {'limit': 20},
+                   rows=lambda data: data['recipes'])
+
+    def test_restaurant_list(self):
+        self.bench('restaurant_list', 'get', '/api/restaurants/', rows=lambda data: data['restaurants'])
+
+    def test_restaurant_nearby(self):
+        self.bench('restaurant_nearby', 'post', '/api/restaurants/nearby/',
+                   {'latitude': CENTER[0], 'longitude': CENTER[1], 'radius': 10},
+                   rows=lambda data: data['restaurants'])
+
+    def test_restaurant_nearby_cached(self):
+        self.bench('restaurant_nearby_cached', 'get', '/api/restaurants/nearby/',
+                   {'latitude': CENTER[0], 'longitude': CENTER[1], 'radius': 10},
+                   rows=lambda data: data['restaurants'])
+
+    def test_restaurant_tiles(self):
+        location = RestaurantLocation.objects.order_by('pk').first()
+        for name, zoom in (('restaurant_tiles_clustered', 8), ('restaurant_tiles_points', 15)):
+            x, y = tile_xy(location.latitude, location.longitude, zoom)
+            self.bench(name, 'get', f'/api/restaurants/tiles/{zoom}/{x}/{y}/', before=cache.clear,
+                       rows=lambda data: data.get('clusters', data.get('restaurants')))
+
+    def test_orders(self):
+        self.bench('orders', 'get', '/api/orders/', rows=lambda data: data['orders'])
+
+    def test_store_order_inbox(self):
+        self.client.force_authenticate(self.store.user)
+        self.bench('store_order_inbox', 'get', '/api/store-orders/', rows=lambda data: data['orders'])
+
+    def test_store_products(self):
+        self.bench('store_products', 'get', '/api/store-products/', {'store_id': self.store.pk},
+                   rows=lambda data: data['products'])
+
+    def test_product_catalog(self):
+        self.bench('product_catalog', 'get', '/api/store-products/catalog/',
+                   {'q': 'product', 'category': 'Vegetables', 'in_stock': 'true'},
+                   rows=lambda data: data['products'])
+
+
+class StockReservationStressTest(TransactionTestCase):
+    """
+    Many threads claiming the same scarce products at once must never drive
+    stock below zero or hand out more units than existed. Throughput is added
+    to the benchmark results file.
+    """
+
+    def setUp(self):
+        owner = CustomUser.objects.create(username='stress-store', email='stress-store@bench.test', role='store')
+        store = StoreUserProfile.objects.create(user=owner, store_name='Stress', store_address='Bench Street')
+        self.products = StoreProduct.objects.bulk_create([
+            StoreProduct(store=store, name=f'Scarce {i}', price=Decimal('1.00'), category='Bench', stock=STRESS['stock'])
+            for i in range(2)
+        ])
+
+    def test_no_oversell(self):
+        first, second = (product.pk for product in self.products)
+        outcomes = {'claimed': 0, 'rejected': 0, 'retries': 0}
+        lock = threading.Lock()
+
+        def worker(index):
+            rng = random.Random(index)
+            try:
+                for _ in range(STRESS['attempts_per_thread']):
+                    # Half the orders span both products, in either order
+                    quantities = {first: rng.randint(1, 2)}
+                    if rng.random() < 0.5:
+                        quantities[second] = 1
+                    while True:
+                        try:
+                            claim_stock(quantities)
+                            outcome = 'claimed'
+                        except InsufficientStock:
+                            outcome = 'rejected'
+                        except OperationalError:
+                            # SQLite allows one writer at a time; try again
+                            with lock:
+                                outcomes['retries'] += 1
+                            time.sleep(0.001)
+                            continue
+                        break
+                    with lock:
+                        outcomes[outcome] += 1
+                        if outcome == 'claimed':
+                            for product_id, quantity in quantities.items():
+                                claimed_units[product_id] += quantity
+            finally:
+                connections.close_all()
+
+        claimed_units = {first: 0, second: 0}
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(STRESS['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        stock = dict(StoreProduct.objects.filter(pk__in=claimed_units).values_list('pk', 'stock'))
+        for product_id, units in claimed_units.items():
+            self.assertGreaterEqual(stock[product_id], 0)
+            self.assertEqual(stock[product_id] + units, STRESS['stock'])
+        attempts = STRESS['threads'] * STRESS['attempts_per_thread']
+        self.assertEqual(outcomes['claimed'] + outcomes['rejected'], attempts)
+        self.assertGreater(outcomes['rejected'], 0, "stress run should exhaust the stock")
+
+        self.record({
+            **STRESS, **outcomes,
+            'wall_ms': round(elapsed * 1000, 3),
+            'claims_per_second': round(attempts / elapsed, 1),
+        })
+
+    def record(self, result):
+        try:
+            with open(OUTPUT) as fh:
+                report = json.load(fh)
+        except (OSError, ValueError):
+            report = {'timestamp': timezone.now().isoformat(), 'database': connection.vendor}
+        report['stock_reservation_stress'] = result
+        with open(OUTPUT, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+
+# ============================================================================
+# BEHAVIOUR
+# ============================================================================
+
+def make_user(email, role='normal'):
+    user = CustomUser.objects.create(username=email, email=email, role=role, is_email_verified=True)
+    UserProfile.objects.create(user=user, first_name=email.split('@')[0])
+    return user
+
+
+def make_recipe(author, **fields):
+    fields = {'title': 'Dal bhat', 'description': 'Lentils and rice', 'ingredients': 'lentils, rice',
+              'instructions': 'Cook.', **fields}
+    return Recipe.objects.create(author=author, **fields)
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class RecipeRatingTests(TestCase):
+    def setUp(self):
+        self.recipe = make_recipe(make_user('author@test.local'))
+        self.client = client_for(make_user('rater@test.local'))
+        self.url = f'/api/recipes/{self.recipe.pk}/rating/'
+
+    def assertAggregates(self, rating_sum, rating_count, histogram):
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_sum, self.recipe.rating_count), (rating_sum, rating_count))
+        self.assertEqual(self.recipe.rating_histogram, histogram)
+
+    def test_edits_move_the_aggregates(self):
+        self.assertEqual(self.client.post(self.url, {'rating': 2}).status_code, 201)
+        self.assertAggregates(2, 1, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+        for stars in (5, 4):
+            self.assertEqual(self.client.put(self.url, {'rating': stars}).status_code, 200)
+        self.assertAggregates(4, 1, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+        self.assertEqual(self.client.put(self.url, {'comment': 'Tasty'}).status_code, 200)
+        self.assertAggregates(4, 1, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+        self.assertEqual(self.client.delete(self.url).status_code, 200)
+        self.assertAggregates(0, 0, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0})
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+
+    def test_only_new_ratings_count_towards_trending(self):
+        self.client.post(self.url, {'rating': 5})
+        self.recipe.refresh_from_db()
+        score = self.recipe.trending_score
+        for stars in (1, 5, 1, 5):
+            self.client.put(self.url, {'rating': stars})
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.trending_score, score)
+
+    def test_concurrent_first_rating_conflicts(self):
+        with mock.patch('users.views.RecipeRatingSerializer.save', side_effect=IntegrityError):
+            response = self.client.post(self.url, {'rating': 3})
+        self.assertEqual(response.status_code, 409)
+        self.assertAggregates(0, 0, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0})
+
+
+class RecipeImportExportTests(TestCase):
+    FIELDS = ['title', 'description', 'ingredients', 'instructions', 'difficulty', 'cuisine_type',
+              'preparation_time', 'cooking_time', 'servings', 'calories', 'dietary_tags']
+
+    def setUp(self):
+        self.admin = make_user('admin@test.local', 'admin')
+        self.cook = make_user('cook@test.local')
+        self.client = client_for(self.admin)
+        make_recipe(self.cook, title='Sel roti', difficulty='hard', cuisine_type='Nepali', calories=320,
+                    description='Ring-shaped, "sweet", fried', dietary_tags='vegetarian')
+        make_recipe(self.admin, title='Thukpa', ingredients='noodles, broth\nchilli', servings=2)
+
+    def recipes(self):
+        return sorted(Recipe.objects.values_list('author__email', *self.FIELDS))
+
+    def upload(self, content, name, **data):
+        return self.client.post('/api/recipes/import/', {
+            'file': SimpleUploadedFile(name, content if isinstance(content, bytes) else content.encode('utf-8')),
+            **data,
+        })
+
+    def test_export_then_import_round_trips(self):
+        for fmt in ('csv', 'ndjson'):
+            with self.subTest(fmt=fmt):
+                before = self.recipes()
+                response = self.client.get('/api/recipes/export/', {'file_format': fmt})
+                self.assertEqual(response.status_code, 200)
+                exported = b''.join(response.streaming_content)
+                Recipe.objects.all().delete()
+
+                response = self.upload(exported, f'recipes.{fmt}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['report'], {'processed': 2, 'created': 2, 'failed': 0, 'errors': []})
+                self.assertEqual(self.recipes(), before)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        response = self.upload('\n'.join([
+            json.dumps({'title': 'Momo', 'description': 'Dumplings', 'ingredients': 'flour', 'instructions': 'Steam.'}),
+            json.dumps({'title': 'Kheer', 'author_email': 'nobody@test.local'}),
+            json.dumps({'title': 'Dhido', 'description': 'Porridge', 'ingredients': 'millet', 'instructions': 'Stir.',
+                        'difficulty': 'impossible'}),
+            '{"title": ',
+            '[1, 2]',
+        ]), 'recipes.ndjson')
+        report = response.json()['report']
+        self.assertEqual((report['processed'], report['created'], report['failed']), (5, 1, 4))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3, 4, 5])
+        self.assertIn('author_email', report['errors'][0]['errors'])
+        self.assertIn('difficulty', report['errors'][1]['errors'])
+        self.assertTrue(Recipe.objects.filter(title='Momo', author=self.admin).exists())
+
+        response = self.upload('title,description\nMomo,Dumplings\n', 'recipes.csv', dry_run='true')
+        self.assertEqual(response.json()['report']['failed'], 1)
+        self.assertEqual(Recipe.objects.filter(title='Momo').count(), 1)
+
+    def test_unreadable_files_are_rejected(self):
+        self.assertEqual(self.upload(b'title\n\xff\xfe\x00bad', 'recipes.csv').status_code, 400)
+        self.assertEqual(self.upload('{}', 'recipes.ndjson', file_format='xml').status_code, 400)
+        self.assertEqual(self.client.post('/api/recipes/import/', {}).status_code, 400)
+        self.assertEqual(client_for(self.cook).get('/api/recipes/export/').status_code, 403)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+
+class RecipeRatingsPageTests(TestCase):
+    def test_embedded_reviews_are_the_first_page(self):
+        recipe = make_recipe(make_user('author@test.local'))
+        raters = [make_user(f'rater{i}@test.local') for i in range(7)]
+        RecipeRating.objects.bulk_create([RecipeRating(recipe=recipe, user=user, rating=3) for user in raters])
+        # Identical timestamps leave the order to the id tiebreaker
+        RecipeRating.objects.update(created_at=timezone.now())
+        client = client_for(raters[0])
+
+        embedded = client.get(f'/api/recipes/{recipe.pk}/').json()['ratings']
+        page = client.get(f'/api/recipes/{recipe.pk}/ratings/', {'page_size': len(embedded)}).json()
+        self.assertEqual([r['id'] for r in embedded], [r['id'] for r in page['ratings']])
+        rest = client.get(f'/api/recipes/{recipe.pk}/ratings/', {'cursor': page['next_cursor']}).json()
+        self.assertEqual(len(embedded) + len(rest['ratings']), 7)
+
+
+class RecipeListTests(TestCase):
+    def test_cursor_pages_and_difficulty(self):
+        author = make_user('author@test.local')
+        for i, difficulty in enumerate(['easy', 'hard', 'easy', 'easy']):
+            make_recipe(author, title=f'Recipe {i}', difficulty=difficulty)
+        client = client_for(author)
+
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 2, 'difficulty': 'easy', **({'cursor': cursor} if cursor else {})}
+            data = client.get('/api/recipes/', params).json()
+            seen += [recipe['title'] for recipe in data['recipes']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertCountEqual(seen, ['Recipe 0', 'Recipe 2', 'Recipe 3'])
+
+        stats = client.get('/api/user-dashboard/').json()['stats']
+        self.assertEqual(stats['recipes_created'], 4)
+
+
+@skipUnless(connection.vendor == 'sqlite', "FTS5 indexes are SQLite only")
+class FullTextSearchTests(TestCase):
+    # SQLite silently drops a table's triggers whenever a migration rebuilds
+    # it, leaving the FTS index stale without any error
+    TRIGGERS = [
+        f'{table}_fts_{event}' for table in ('recipe', 'menu', 'product') for event in ('insert', 'update', 'delete')
+    ]
+
+    def test_triggers_survive_migrations(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            present = {row[0] for row in cursor.fetchall()}
+        self.assertEqual([name for name in self.TRIGGERS if name not in present], [])
+
+    def test_recipe_search_follows_writes(self):
+        author = make_user('author@test.local')
+        client = client_for(author)
+        recipe = make_recipe(author, title='Steamed momo', ingredients='flour, minced buffalo')
+
+        def search(text):
+            return [hit['id'] for hit in client.get('/api/recipes/search/', {'q': text}).json()['recipes']]
+
+        self.assertEqual(search('buffalo'), [str(recipe.pk)])
+        recipe.title = 'Fried sel roti'
+        recipe.save()
+        self.assertEqual(search('momo'), [])
+        self.assertEqual(search('roti'), [str(recipe.pk)])
+        recipe.delete()
+        self.assertEqual(search('roti'), [])
+
+
+class TrendingScoreTests(TestCase):
+    def test_rebuild_matches_incremental_scores(self):
+        author, fan = make_user('author@test.local'), make_user('fan@test.local')
+        old = make_recipe(author, title='Old favourite')
+        new = make_recipe(author, title='New arrival')
+        client_for(fan).post(f'/api/recipes/{old.pk}/like/')
+        incremental = Recipe.objects.get(pk=old.pk).trending_score
+
+        # What the 0010 backfill finds for recipes that predate the column
+        Recipe.objects.update(trending_score=0)
+        self.assertEqual(rebuild_scores(Recipe, RecipeLike, RecipeRating), 2)
+        old.refresh_from_db()
+        new.refresh_from_db()
+        self.assertAlmostEqual(old.trending_score, incremental, places=6)
+        self.assertGreater(new.trending_score, 0)
+        trending = client_for(fan).get('/api/recipes/trending/').json()['recipes']
+        self.assertEqual([recipe['title'] for recipe in trending], ['Old favourite', 'New arrival'])
+
+
+def make_restaurant(email, lat=CENTER[0], lon=CENTER[1], **fields):
+    owner = make_user(email, 'restaurant')
+    fields = {'restaurant_name': 'Momo House', 'restaurant_address': 'Thamel', 'is_verified': True, **fields}
+    restaurant = RestaurantUserProfile.objects.create(user=owner, **fields)
+    RestaurantLocation.objects.create(
+        restaurant=restaurant, latitude=Decimal(f'{lat:.6f}'), longitude=Decimal(f'{lon:.6f}'),
+        city='Kathmandu', country='Nepal', phone_number='0000000',
+    )
+    return restaurant
+
+
+class NearbyCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        if restaurant_index is not None:
+            restaurant_index.invalidate()
+
+    def test_rating_change_invalidates_cached_search(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant = make_restaurant('owner@test.local')
+        client = client_for(make_user('diner@test.local'))
+        params = {'latitude': CENTER[0], 'longitude': CENTER[1], 'radius': 5}
+
+        def rating_avg():
+            return client.get('/api/restaurants/nearby/', params).json()['restaurants'][0]['rating_avg']
+
+        self.assertEqual(rating_avg(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(f'/api/restaurants/{restaurant.pk}/rating/', {'rating': 4})
+        self.assertEqual(rating_avg(), 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.delete(f'/api/restaurants/{restaurant.pk}/rating/')
+        self.assertEqual(rating_avg(), 0)
+
+    def test_non_finite_radius_is_rejected(self):
+        client = client_for(make_user('diner@test.local'))
+        for radius in ('nan', 'NaN', 'inf'):
+            params = {'latitude': CENTER[0], 'longitude': CENTER[1], 'radius': radius}
+            response = client.get('/api/restaurants/nearby/', params)
+            self.assertEqual(response.status_code, 400, radius)
+            self.assertIn('radius', response.json())
+            self.assertEqual(client.post('/api/restaurants/nearby/', params, format='json').status_code, 400, radius)
+
+
+class OpenNowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        if restaurant_index is not None:
+            restaurant_index.invalidate()
+
+    def test_nearby_keeps_only_open_restaurants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            open_restaurant = make_restaurant('open@test.local')
+            closed = make_restaurant('closed@test.local', lon=CENTER[1] + 0.01)
+            RestaurantLocation.objects.filter(restaurant=closed).update(is_open=False)
+        call_command('rebuild_opening_hours', stdout=io.StringIO())
+        client = client_for(make_user('diner@test.local'))
+
+        for params in ({'open_now': 'true'}, {}):
+            response = client.post('/api/restaurants/nearby/', {
+                'latitude': CENTER[0], 'longitude': CENTER[1], 'radius': 5, **params,
+            }, format='json')
+            ids = [restaurant['id'] for restaurant in response.json()['restaurants']]
+            expected = [open_restaurant.pk] if params else [open_restaurant.pk, closed.pk]
+            self.assertEqual(ids, expected)
+
+    def test_rebuild_intervals_replaces_stale_rows(self):
+        restaurant = make_restaurant('owner@test.local')
+        location = RestaurantLocation.objects.get(restaurant=restaurant)
+        RestaurantOpeningInterval.objects.filter(location=location).delete()
+        RestaurantOpeningInterval.objects.create(location=location, start_minute=0, end_minute=1)
+
+        self.assertEqual(rebuild_intervals(RestaurantLocation, RestaurantOpeningInterval), 1)
+        self.assertEqual(
+            list(location.opening_intervals.values_list('start_minute', 'end_minute')),
+            [(0, MINUTES_PER_WEEK)],
+        )
+        self.assertEqual(open_restaurant_ids([restaurant.pk, restaurant.pk + 1]), {restaurant.pk})
+
+
+class RestaurantRatingTests(TestCase):
+    def test_edits_move_the_stored_average(self):
+        restaurant = make_restaurant('owner@test.local')
+        url = f'/api/restaurants/{restaurant.pk}/rating/'
+        client_for(make_user('first@test.local')).post(url, {'rating': 5})
+        client = client_for(make_user('second@test.local'))
+        self.assertEqual(client.post(url, {'rating': 2}).status_code, 201)
+        for stars in (4, 1, 3):
+            self.assertEqual(client.put(url, {'rating': stars}).status_code, 200)
+
+        location = RestaurantLocation.objects.get(restaurant=restaurant)
+        self.assertEqual((location.rating_sum, location.total_ratings, location.rating_avg), (8, 2, Decimal('4.00')))
+        self.assertEqual(client.delete(url).status_code, 200)
+        location.refresh_from_db()
+        self.assertEqual((location.rating_sum, location.total_ratings, location.rating_avg), (5, 1, Decimal('5.00')))
+
+    def test_list_filters_on_min_rating(self):
+        rated = make_restaurant('rated@test.local')
+        make_restaurant('unrated@test.local', restaurant_name='Dal Bhat Corner')
+        client_for(make_user('diner@test.local')).post(f'/api/restaurants/{rated.pk}/rating/', {'rating': 4})
+
+        def names(min_rating):
+            response = self.client.get('/api/restaurants/', {'min_rating': min_rating})
+            return response.status_code, [restaurant['id'] for restaurant in response.json().get('restaurants', [])]
+
+        self.assertEqual(names('3.5'), (200, [rated.pk]))
+        self.assertEqual(names('4.5'), (200, []))
+        for value in ('nan', 'inf', '-Infinity', 'good'):
+            self.assertEqual(names(value)[0], 400, value)
+        self.assertEqual(names('1e400'), (200, []))
+
+
+class RestaurantPageTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant('owner@test.local')
+        self.dish = self.restaurant.menu_items.create(name='Momo', description='Dumplings', price='4.50', category='Main')
+        self.diner = client_for(make_user('diner@test.local'))
+        self.rating_url = f'/api/restaurants/{self.restaurant.pk}/rating/'
+        self.diner.post(self.rating_url, {'rating': 4, 'comment': 'Good'})
+        self.url = f'/api/restaurants/{self.restaurant.pk}/page/'
+
+    def etag(self):
+        response = self.diner.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.etag()
+        response = self.diner.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((response['ETag'], response.content), (etag, b''))
+        self.assertEqual(self.diner.get(self.url, {'include': 'menu'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_menu_and_rating_edits_change_the_etag(self):
+        etags = [self.etag()]
+        client_for(self.restaurant.user).patch(f'/api/restaurants/{self.restaurant.pk}/menu/bulk/', {
+            'items': [{'id': self.dish.pk, 'price': '5.00'}],
+        }, format='json')
+        etags.append(self.etag())
+        self.assertEqual(self.diner.put(self.rating_url, {'rating': 2}).status_code, 200)
+        etags.append(self.etag())
+
+        self.assertEqual(len(set(etags)), 3)
+        response = self.diner.get(self.url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([rating['rating'] for rating in response.json()['ratings']], [2])
+        self.assertEqual(self.diner.get(self.url, HTTP_IF_NONE_MATCH=etags[-1]).status_code, 304)
+
+
+class MenuTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant('owner@test.local')
+        self.owner = client_for(self.restaurant.user)
+        self.url = f'/api/restaurants/{self.restaurant.pk}/menu/bulk/'
+
+    def dish(self, name, price, category='Main', **fields):
+        return {'name': name, 'description': f'{name} of the house', 'price': price, 'category': category, **fields}
+
+    def test_bulk_upsert_patches_and_replaces(self):
+        response = self.owner.patch(self.url, {'items': [
+            self.dish('Momo', '4.50', '  main   course '), self.dish('Kheer', '2.00', 'DESSERT'),
+        ]}, format='json')
+        self.assertEqual(response.json(), {'message': 'Menu updated successfully', 'created': 2, 'updated': 0, 'deleted': 0})
+        self.assertEqual(
+            dict(self.restaurant.menu_items.values_list('name', 'category')),
+            {'Momo': 'Main Course', 'Kheer': 'Dessert'},
+        )
+
+        response = self.owner.patch(self.url, {'items': [{'name': 'Momo', 'price': '5.00'}]}, format='json')
+        self.assertEqual((response.json()['created'], response.json()['updated']), (0, 1))
+        self.assertEqual(self.restaurant.menu_items.get(name='Momo').price, Decimal('5.00'))
+
+        response = self.owner.put(self.url, {'items': [self.dish('Thukpa', '6.00')]}, format='json')
+        self.assertEqual((response.json()['created'], response.json()['deleted']), (1, 2))
+        self.assertEqual(list(self.restaurant.menu_items.values_list('name', flat=True)), ['Thukpa'])
+
+    def test_bulk_upsert_is_all_or_nothing(self):
+        response = self.owner.patch(self.url, {'items': [
+            self.dish('Momo', '4.50'), self.dish('Momo', '4.00'), self.dish('Kheer', 'free'),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2])
+        self.assertFalse(self.restaurant.menu_items.exists())
+
+        stranger = client_for(make_user('stranger@test.local'))
+        self.assertEqual(stranger.patch(self.url, {'items': [self.dish('Momo', '1.00')]}, format='json').status_code, 403)
+
+    def test_dish_search_filters(self):
+        self.owner.patch(self.url, {'items': [
+            self.dish('Buffalo momo', '4.50', 'main', dietary_info='halal'),
+            self.dish('Veg momo', '3.50', 'Main', dietary_info='vegan'),
+            self.dish('Kheer', '2.00', 'dessert', dietary_info='vegan', is_available=False),
+        ]}, format='json')
+        hidden = make_restaurant('unverified@test.local', is_verified=False)
+        hidden.menu_items.create(name='Secret momo', description='Unlisted', price='1.00', category='Main')
+        client = client_for(make_user('diner@test.local'))
+
+        def search(**params):
+            return [dish['name'] for dish in client.get('/api/dishes/search/', params).json()['dishes']]
+
+        self.assertEqual(search(), ['Kheer', 'Veg momo', 'Buffalo momo'])
+        self.assertEqual(search(category='MAIN'), ['Veg momo', 'Buffalo momo'])
+        self.assertEqual(search(dietary='vegan', is_available='true'), ['Veg momo'])
+        self.assertEqual(search(min_price='3', max_price='4'), ['Veg momo'])
+        self.assertEqual(set(search(q='momo')), {'Veg momo', 'Buffalo momo'})
+        self.assertEqual(search(q='momo', category='main', max_price='4'), ['Veg momo'])
+        self.assertEqual(client.get('/api/dishes/search/', {'min_price': 'cheap'}).status_code, 400)
+        self.assertEqual(client.get('/api/dishes/search/', {'max_price': 'NaN'}).status_code, 400)
+
+
+class MapClusterTests(TestCase):
+    def cells(self):
+        return {
+            (level, x, y): (count, round(lat_sum, 6), round(lon_sum, 6))
+            for level, x, y, count, lat_sum, lon_sum in RestaurantClusterCell.objects.values_list(
+                'level', 'x', 'y', 'count', 'lat_sum', 'lon_sum'
+            )
+        }
+
+    def test_incremental_cells_match_a_rebuild(self):
+        make_restaurant('center@test.local')
+        moving = make_restaurant('moving@test.local', lat=CENTER[0] + 0.5)
+        # An empty cell elsewhere is left alone by the scoped cleanup
+        RestaurantClusterCell.objects.create(level=CELL_BITS, x=0, y=0)
+
+        location = RestaurantLocation.objects.get(restaurant=moving)
+        location.latitude = Decimal(f'{CENTER[0] - 0.5:.6f}')
+        location.save()
+        make_restaurant('gone@test.local', lat=CENTER[0] + 1).location.delete()
+
+        incremental = self.cells()
+        self.assertEqual(incremental.pop((CELL_BITS, 0, 0)), (0, 0, 0))
+        self.assertEqual(rebuild_cells(RestaurantLocation, RestaurantClusterCell), len(incremental))
+        self.assertEqual(self.cells(), incremental)
+
+
+def make_store(email, **fields):
+    owner = make_user(email, 'store')
+    fields = {'store_name': 'Corner Store', 'store_address': 'Asan', 'is_verified': True, **fields}
+    return StoreUserProfile.objects.create(user=owner, **fields)
+
+
+class ProductCatalogTests(TestCase):
+    url = '/api/store-products/catalog/'
+
+    def setUp(self):
+        store = make_store('store@test.local')
+        other = make_store('other@test.local', store_name='Other Store')
+        hidden = make_store('hidden@test.local', is_verified=False)
+        self.products = {
+            name: StoreProduct.objects.create(store=shop, name=name, description=description, price=price,
+                                              category=category, stock=stock)
+            for shop, name, description, price, category, stock in [
+                (store, 'Red onion', 'Fresh from Nuwakot', '3.00', 'Vegetables', 10),
+                (store, 'Spring onion', 'A bunch', '1.50', 'Vegetables', 0),
+                (other, 'Onion pickle', 'Spicy achar', '7.00', 'Pickles', 4),
+                (other, 'Yak cheese', 'Hard cheese, goes with onion', '30.00', 'Dairy', 2),
+                (hidden, 'Secret onion', 'Unlisted', '1.00', 'Vegetables', 5),
+            ]
+        }
+        self.store, self.other = store, other
+
+    def names(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [product['name'] for product in response.json()['products']]
+
+    def test_filters_and_facets(self):
+        response = self.client.get(self.url, {'category': 'vegetables', 'in_stock': 'true'}).json()
+        self.assertEqual([product['name'] for product in response['products']], ['Red onion'])
+        self.assertEqual((response['count'], response['facets']['in_stock']), (1, 1))
+        self.assertEqual(response['facets']['categories'], [
+            {'category': 'Dairy', 'count': 1}, {'category': 'Pickles', 'count': 1},
+            {'category': 'Vegetables', 'count': 1},
+        ])
+
+        self.assertEqual(self.names(min_price='2', max_price='10', sort='price'), ['Red onion', 'Onion pickle'])
+        self.assertEqual(self.names(store_id=self.other.pk, sort='price_desc'), ['Yak cheese', 'Onion pickle'])
+
+    def test_keyset_pages_cover_every_product(self):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(self.url, {'sort': 'name', 'page_size': 3, **({'cursor': cursor} if cursor else {})})
+            body = response.json()
+            seen += [product['name'] for product in body['products']]
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['Onion pickle', 'Red onion', 'Spring onion', 'Yak cheese'])
+
+    @skipUnless(connection.vendor == 'sqlite', "Relevance ranking needs FTS5")
+    def test_relevance_prefers_name_matches(self):
+        names = self.names(q='onion')
+        self.assertEqual(names[-1], 'Yak cheese')
+        self.assertEqual(set(names), {'Red onion', 'Spring onion', 'Onion pickle', 'Yak cheese'})
+
+    def test_unmatchable_text_falls_back_to_newest(self):
+        response = self.client.get(self.url, {'q': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sort'], 'newest')
+        self.assertEqual(len(response.json()['products']), 4)
+
+    def test_rejects_non_finite_prices(self):
+        for params in ({'min_price': 'NaN'}, {'max_price': 'Infinity'}, {'min_price': '-inf'}, {'max_price': 'cheap'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+
+class InventorySyncTests(TestCase):
+    url = '/api/store-products/inventory/'
+
+    def setUp(self):
+        self.store = make_store('store@test.local')
+        self.client = client_for(self.store.user)
+        StoreProduct.objects.create(store=self.store, sku='APL', name='Apple', price='2.00', category='Fruits', stock=5)
+        StoreProduct.objects.create(store=self.store, sku='BAN', name='Banana', price='4.00', category='Fruits', stock=5)
+
+    def sync(self, lines, name='stock.ndjson', **data):
+        upload = SimpleUploadedFile(name, '\n'.join(lines).encode('utf-8'))
+        response = self.client.post(self.url, {'file': upload, **data})
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+
+    def test_reports_every_record(self):
+        *results, summary = self.sync([
+            '{"sku": "APL", "name": "Apple", "price": "2.00", "category": "Fruits"}',
+            '{"sku": "BAN", "price": "3.50"}',
+            '{"sku": "CAB", "name": "Cabbage", "price": "1.00", "category": "Vegetables", "stock": 3}',
+            '{"name": "No sku"}',
+            '{oops',
+            '{"sku": "DAL", "name": "Dal", "price": "cheap", "category": "Grains"}',
+        ])
+        self.assertEqual(
+            [(result['line'], result['sku'], result['status']) for result in results],
+            [(1, 'APL', 'unchanged'), (2, 'BAN', 'updated'), (3, 'CAB', 'created'),
+             (4, None, 'failed'), (5, None, 'failed'), (6, 'DAL', 'failed')],
+        )
+        self.assertEqual(results[1]['fields'], ['price'])
+        self.assertIn('price', results[5]['errors'])
+        self.assertEqual(summary['summary'], {
+            'processed': 6, 'created': 1, 'updated': 1, 'unchanged': 1, 'failed': 3, 'dry_run': False,
+        })
+        self.assertEqual(
+            dict(self.store.products.values_list('sku', 'price')),
+            {'APL': Decimal('2.00'), 'BAN': Decimal('3.50'), 'CAB': Decimal('1.00')},
+        )
+
+    def test_later_lines_win_for_a_repeated_sku(self):
+        *results, _ = self.sync([
+            '{"sku": "CAB", "name": "Cabbage", "price": "1.00", "category": "Vegetables"}',
+            '{"sku": "CAB", "price": "1.25"}',
+            '{"sku": "CAB", "price": "1.25"}',
+        ])
+        self.assertEqual([result['status'] for result in results], ['created', 'updated', 'unchanged'])
+        self.assertEqual(self.store.products.get(sku='CAB').price, Decimal('1.25'))
+
+    def test_dry_run_writes_nothing(self):
+        before = list(self.store.products.order_by('sku').values_list('sku', 'price', 'updated_at'))
+        *results, summary = self.sync(
+            ['sku,name,price,category', 'BAN,,9.99,', 'CAB,Cabbage,1.00,Vegetables'], name='stock.csv', dry_run='true',
+        )
+        self.assertEqual([result['status'] for result in results], ['updated', 'created'])
+        self.assertTrue(summary['summary']['dry_run'])
+        self.assertEqual(list(self.store.products.order_by('sku').values_list('sku', 'price', 'updated_at')), before)
+
+    def test_dry_run_reports_repeated_skus_like_a_real_run(self):
+        lines = [
+            '{"sku": "CAB", "name": "Cabbage", "price": "1.00", "category": "Vegetables"}',
+            '{"sku": "BAN", "price": "3.50"}',
+            '{"sku": "CAB", "price": "1.25"}',
+            '{"sku": "BAN", "price": "3.50"}',
+            '{"sku": "CAB", "price": "1.25"}',
+        ]
+        *dry, _ = self.sync(lines, dry_run='true')
+        self.assertEqual(self.store.products.count(), 2)
+        *real, _ = self.sync(lines)
+        self.assertEqual(dry, real)
+        self.assertEqual([result['status'] for result in real], ['created', 'updated', 'updated', 'unchanged', 'unchanged'])
+
+    @skipUnless(connection.vendor == 'sqlite', "FTS5 indexes are SQLite only")
+    def test_bulk_created_products_are_searchable(self):
+        self.sync(['{"sku": "CAB", "name": "Savoy cabbage", "price": "1.00", "category": "Vegetables"}'])
+        products = self.client.get('/api/store-products/catalog/', {'q': 'savoy'}).json()['products']
+        self.assertEqual([product['sku'] for product in products], ['CAB'])
+
+
+class OrderReservationTests(TestCase):
+    def setUp(self):
+        store = make_store('store@test.local')
+        self.onion = StoreProduct.objects.create(store=store, name='Onion', price='2.00', category='Vegetables', stock=5)
+        self.rice = StoreProduct.objects.create(store=store, name='Rice', price='9.00', category='Grains', stock=1)
+        self.store = store
+        self.client = client_for(make_user('customer@test.local'))
+
+    def place(self, **quantities):
+        items = [{'product_id': getattr(self, name).pk, 'quantity': quantity} for name, quantity in quantities.items()]
+        return self.client.post('/api/orders/', {'store_id': self.store.pk, 'items': items}, format='json')
+
+    def stock(self):
+        return tuple(StoreProduct.objects.filter(pk=product.pk).values_list('stock', flat=True).get()
+                     for product in (self.onion, self.rice))
+
+    def expire(self, order_id):
+        Order.objects.filter(order_id=order_id).update(reservation_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_insufficient_stock_rolls_back_the_whole_order(self):
+        response = self.place(onion=2, rice=2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Rice has insufficient stock')
+        self.assertEqual(self.stock(), (5, 1))
+        self.assertFalse(Order.objects.exists())
+
+    def test_payment_loses_to_an_earlier_release(self):
+        order_id = self.place(onion=2, rice=1).json()['order']['order_id']
+        self.assertEqual(self.stock(), (3, 0))
+        self.expire(order_id)
+        order = Order.objects.get(order_id=order_id)
+        self.assertTrue(release_reservation(order.pk))
+
+        response = self.client.post('/api/payments/process/', {'order_id': order_id}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(confirm_reservation(order))
+        self.assertFalse(release_reservation(order.pk))
+        order.refresh_from_db()
+        self.assertEqual((order.status, self.stock()), ('cancelled', (5, 1)))
+
+    def test_release_loses_to_an_earlier_payment(self):
+        order_id = self.place(onion=2).json()['order']['order_id']
+        response = self.client.post('/api/payments/process/', {'order_id': order_id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(order_id=order_id)
+        self.assertFalse(release_reservation(order.pk, timezone.now() + timedelta(days=1)))
+        self.assertEqual((order.status, self.stock()), ('paid', (3, 1)))
+
+    def test_sweeper_returns_expired_stock_only(self):
+        expired = self.place(onion=2).json()['order']['order_id']
+        held = self.place(onion=1, rice=1).json()['order']['order_id']
+        self.expire(expired)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('release_expired_reservations', stdout=io.StringIO())
+
+        self.assertEqual(self.stock(), (4, 0))
+        self.assertEqual(
+            dict(Order.objects.values_list('order_id', 'status')), {expired: 'cancelled', held: 'payment_pending'},
+        )
+        self.assertIsNone(Order.objects.get(order_id=expired).reservation_expires_at)
+
+
+class IdempotentOrderTests(TestCase):
+    def setUp(self):
+        store = make_store('store@test.local')
+        self.onion = StoreProduct.objects.create(store=store, name='Onion', price='2.00', category='Vegetables', stock=5)
+        self.body = {'store_id': store.pk, 'items': [{'product_id': self.onion.pk, 'quantity': 2}]}
+        self.client = client_for(make_user('customer@test.local'))
+
+    def place(self, key='order-1', body=None):
+        return self.client.post('/api/orders/', body or self.body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def stock(self):
+        return StoreProduct.objects.get(pk=self.onion.pk).stock
+
+    def test_retry_replays_the_first_response(self):
+        first = self.place()
+        retry = self.place()
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual((Order.objects.count(), self.stock()), (1, 3))
+
+        self.assertEqual(self.place(key='order-2').status_code, 201)
+        self.assertEqual((Order.objects.count(), self.stock()), (2, 1))
+
+    def test_key_reused_for_a_different_body_is_rejected(self):
+        self.place()
+        response = self.place(body={**self.body, 'notes': 'Ring twice'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual((Order.objects.count(), self.stock()), (1, 3))
+
+    def test_expired_keys_are_forgotten(self):
+        self.place()
+        IdempotencyRecord.objects.update(created_at=timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS + 1))
+        response = self.place()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual((Order.objects.count(), IdempotencyRecord.objects.count(), self.stock()), (2, 1, 1))
+
+    def place_losing_race(self, **kwargs):
+        """Place an order whose first replay lookup misses, as if the other copy had not committed yet"""
+        calls = []
+
+        def racing(*args):
+            calls.append(args)
+            return None if len(calls) == 1 else find_replay(*args)
+
+        with mock.patch('users.views.find_replay', side_effect=racing):
+            response = self.place(**kwargs)
+        self.assertEqual(len(calls), 2)
+        return response
+
+    def test_losing_a_race_replays_the_winner(self):
+        first = self.place()
+        retry = self.place_losing_race()
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual((Order.objects.count(), self.stock()), (1, 3))
+
+    def test_losing_a_race_with_a_different_body_is_rejected(self):
+        self.place()
+        response = self.place_losing_race(body={**self.body, 'notes': 'Ring twice'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual((Order.objects.count(), self.stock()), (1, 3))
+
+
+@override_settings(ORDER_INBOX_SETTLE_SECONDS=0)
+class StoreOrderInboxTests(TestCase):
+    url = '/api/store-orders/'
+
+    def setUp(self):
+        cache.clear()
+        self.store = make_store('store@test.local')
+        self.customer = make_user('customer@test.local')
+        self.client = client_for(self.store.user)
+
+    def order(self, **fields):
+        fields = {'order_id': str(uuid.uuid4()), 'status': 'paid', **fields}
+        return Order.objects.create(customer=self.customer, store=self.store, **fields)
+
+    def inbox(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [order['order_id'] for order in body['orders']], body['since']
+
+    def test_delta_sync_returns_each_change_once(self):
+        first, second = self.order(), self.order()
+        ids, since = self.inbox()
+        self.assertEqual(ids, [first.order_id, second.order_id])
+
+        first.status = 'processing'
+        first.save()
+        ids, since = self.inbox(since=since)
+        self.assertEqual(ids, [first.order_id])
+        self.assertEqual(self.inbox(since=since), ([], since))
+
+        self.assertEqual(self.inbox(status='paid')[0], [second.order_id])
+        response = self.client.get(self.url, {'page_size': 1}).json()
+        self.assertTrue(response['has_more'])
+        self.assertEqual(self.client.get(self.url, {'since': 'garbage'}).status_code, 404)
+
+    def test_long_poll_wakes_on_a_new_order(self):
+        self.order()
+        _, since = self.inbox()
+        placed = []
+
+        def sleep(seconds):
+            if not placed:
+                placed.append(self.order())
+                notify_store(self.store.pk)
+
+        with mock.patch('users.order_inbox.time.sleep', side_effect=sleep) as sleeper:
+            ids, _ = self.inbox(since=since, wait=10)
+        self.assertEqual(ids, [placed[0].order_id])
+        self.assertEqual(sleeper.call_count, 1)
+
+    @override_settings(ORDER_INBOX_SETTLE_SECONDS=60)
+    def test_changes_are_held_back_until_settled(self):
+        order = self.order()
+        self.assertEqual(self.inbox(), ([], None))
+        Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(self.inbox()[0], [order.order_id])
+
+    @override_settings(ORDER_INBOX_SETTLE_SECONDS=60)
+    def test_long_poll_does_not_return_unsettled_changes(self):
+        clock = [0.0]
+
+        def sleep(seconds):
+            if not clock[0]:
+                self.order()
+                notify_store(self.store.pk)
+            clock[0] += seconds
+
+        with mock.patch('users.order_inbox.time.sleep', side_effect=sleep), \
+                mock.patch('users.order_inbox.time.monotonic', side_effect=lambda: clock[0]):
+            self.assertEqual(self.inbox(wait=3), ([], None))
+        self.assertEqual(clock[0], 3)
+
+    def test_release_stamps_the_time_of_the_release(self):
+        order = self.order(status='payment_pending', reservation_expires_at=timezone.now() - timedelta(hours=1))
+        sweep_started = timezone.now() - timedelta(minutes=5)
+        released_after = timezone.now()
+        self.assertTrue(release_reservation(order.pk, sweep_started + timedelta(minutes=1)))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.assertGreaterEqual(order.updated_at, released_after)
+
+
+@override_settings(ORDER_INBOX_RECHECK_SECONDS=5, ORDER_INBOX_SETTLE_SECONDS=2)
+class InboxWaitTests(TestCase):
+    """wait_for_changes against a fake clock"""
+
+    def setUp(self):
+        cache.clear()
+        self.clock = 0.0
+        self.checks = []
+
+    def wait(self, events, visible_at, timeout=20):
+        """
+        Wait while `events` ({time: callback}) fire and has_changes turns true
+        at `visible_at`; returns (found, times has_changes was called)
+        """
+        events = dict(events)
+
+        def sleep(seconds):
+            self.clock += seconds
+            for at in [at for at in events if at <= self.clock]:
+                events.pop(at)()
+
+        def has_changes():
+            self.checks.append(self.clock)
+            return visible_at is not None and self.clock >= visible_at
+
+        with mock.patch('users.order_inbox.time.sleep', side_effect=sleep), \
+                mock.patch('users.order_inbox.time.monotonic', side_effect=lambda: self.clock):
+            found = wait_for_changes(7, current_version(7), has_changes, timeout)
+        return found, self.checks
+
+    def test_version_bump_wakes_the_waiter(self):
+        found, checks = self.wait({1: lambda: notify_store(7)}, visible_at=0)
+        self.assertTrue(found)
+        self.assertEqual(checks, [1])
+
+    def test_unsettled_change_is_checked_again_once_settled(self):
+        # The change is notified at 1s but only passes the settle filter at 3s
+        found, checks = self.wait({1: lambda: notify_store(7)}, visible_at=3)
+        self.assertTrue(found)
+        self.assertEqual(checks, [1, 3])
+
+    def test_unnotified_changes_are_found_by_the_periodic_recheck(self):
+        found, checks = self.wait({}, visible_at=4)
+        self.assertTrue(found)
+        self.assertEqual(checks, [5])
+
+    def test_other_stores_and_quiet_periods_do_not_query(self):
+        found, checks = self.wait({1: lambda: notify_store(8)}, visible_at=None, timeout=12)
+        self.assertFalse(found)
+        self.assertEqual(checks, [5, 10])
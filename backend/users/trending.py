@@ -0,0 +1,104 @@
+"""
+Time-decayed trending scores for recipes.
+
+A recipe's score is the sum of its interaction weights, each decayed by
+exp(-rate * age). Because every score decays by the same factor, we store
+log(sum of weight * exp(rate * (t_event - EPOCH))) instead. The ranking is
+unchanged over time, each interaction is a single atomic
+`score = logaddexp(score, log(weight) + rate * (now - EPOCH))` UPDATE, and the
+top N is a plain scan of the `-trending_score` index. Nothing is ever
+recomputed globally.
+
+Removals (unlike, deleted rating) are not subtracted: trending measures
+recent activity, not the current totals.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Exp, Greatest, Least, Ln
+from django.utils import timezone
+
+EPOCH = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+WEIGHTS = {
+    'create': 2.0,
+    'view': 0.1,
+    'like': 1.0,
+    'rating': 0.6,  # per star
+}
+
+
+def decay_rate():
+    """Decay per second for the configured half-life"""
+    return math.log(2) / (getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 48) * 3600)
+
+
+def log_weight(event, amount=1, at=None):
+    """Stored-scale (log, epoch-relative) value of `amount` events happening `at`"""
+    at = at or timezone.now()
+    return math.log(WEIGHTS[event] * amount) + decay_rate() * (at - EPOCH).total_seconds()
+
+
+def trending_update(event, amount=1, at=None):
+    """
+    Keyword arguments for QuerySet.update() that fold an event into the score:
+    logaddexp(a, b) = max(a, b) + ln(1 + exp(min(a, b) - max(a, b)))
+    """
+    score = F('trending_score')
+    value = Value(log_weight(event, amount, at))
+    return {
+        'trending_score': Greatest(score, value) + Ln(1 + Exp(Least(score, value) - Greatest(score, value)))
+    }
+
+
+def current_score(stored, at=None):
+    """Decayed score as of `at`, for display; ordering never needs this"""
+    at = at or timezone.now()
+    exponent = stored - decay_rate() * (at - EPOCH).total_seconds()
+    return round(math.exp(exponent), 4) if exponent > -700 else 0.0
+
+
+def logsumexp(values):
+    peak = max(values)
+    return peak + math.log(sum(math.exp(value - peak) for value in values))
+
+
+def rebuild_scores(recipe_model, like_model, rating_model, chunk_size=1000):
+    """
+    Recompute every recipe's score from its likes, ratings and views; returns
+    the number of recipes. Takes the models so migrations can pass theirs.
+    """
+    updated = 0
+    last_pk = None
+    while True:
+        recipes = recipe_model.objects.order_by('pk').only('pk', 'created_at', 'views_count', 'trending_score')
+        if last_pk is not None:
+            recipes = recipes.filter(pk__gt=last_pk)
+        chunk = list(recipes[:chunk_size])
+        if not chunk:
+            return updated
+        last_pk = chunk[-1].pk
+        pks = [recipe.pk for recipe in chunk]
+
+        events = defaultdict(list)
+        for recipe_id, created_at in like_model.objects.filter(recipe_id__in=pks).values_list('recipe_id', 'created_at'):
+            events[recipe_id].append(log_weight('like', at=created_at))
+        for recipe_id, stars, created_at in (
+            rating_model.objects.filter(recipe_id__in=pks).values_list('recipe_id', 'rating', 'created_at')
+        ):
+            events[recipe_id].append(log_weight('rating', stars, at=created_at))
+
+        for recipe in chunk:
+            scores = events[recipe.pk] + [log_weight('create', at=recipe.created_at)]
+            # View times aren't recorded; count them at creation time
+            if recipe.views_count:
+                scores.append(log_weight('view', recipe.views_count, at=recipe.created_at))
+            recipe.trending_score = logsumexp(scores)
+
+        with transaction.atomic():
+            recipe_model.objects.bulk_update(chunk, ['trending_score'])
+        updated += len(chunk)
@@ -6,13 +6,15 @@ from .views import (
     get_current_user, user_profile, store_profile, restaurant_profile,
     change_password, admin_dashboard, user_dashboard,
     # Recipe endpoints
-    recipe_list, recipe_detail, recipe_like, recipe_rating, user_recipes,
+    recipe_list, recipe_search, recipe_pantry_search, recipe_trending, recipe_import, recipe_export,
+    recipe_detail, recipe_like, recipe_rating, recipe_ratings, user_recipes,
     # Restaurant endpoints
-    restaurant_list, restaurant_detail, restaurant_nearby, restaurant_menu, restaurant_rating,
+    restaurant_list, restaurant_detail, restaurant_nearby, restaurant_menu, restaurant_menu_bulk, restaurant_rating,
+    restaurant_page, restaurant_tiles, dish_search,
     # Store product endpoints
-    store_products, store_product_detail,
+    store_products, store_product_detail, product_catalog, store_inventory_sync,
     # Order endpoints
-    orders, order_detail,
+    orders, order_detail, store_order_inbox,
     # Payment endpoints
     process_payment, payment_detail
 )
@@ -45,23 +47,36 @@ urlpatterns = [
     
     # ==================== RECIPES ====================
     path('recipes/', recipe_list, name='recipe_list'),
+    path('recipes/search/', recipe_search, name='recipe_search'),
+    path('recipes/pantry/', recipe_pantry_search, name='recipe_pantry_search'),
+    path('recipes/trending/', recipe_trending, name='recipe_trending'),
+    path('recipes/import/', recipe_import, name='recipe_import'),
+    path('recipes/export/', recipe_export, name='recipe_export'),
     path('recipes/<str:recipe_id>/', recipe_detail, name='recipe_detail'),
     path('recipes/<str:recipe_id>/like/', recipe_like, name='recipe_like'),
     path('recipes/<str:recipe_id>/rating/', recipe_rating, name='recipe_rating'),
+    path('recipes/<str:recipe_id>/ratings/', recipe_ratings, name='recipe_ratings'),
     path('my-recipes/', user_recipes, name='user_recipes'),
     
     # ==================== RESTAURANTS ====================
     path('restaurants/', restaurant_list, name='restaurant_list'),
-    path('restaurants/<str:restaurant_id>/', restaurant_detail, name='restaurant_detail'),
     path('restaurants/nearby/', restaurant_nearby, name='restaurant_nearby'),
+    path('restaurants/tiles/<int:z>/<int:x>/<int:y>/', restaurant_tiles, name='restaurant_tiles'),
+    path('restaurants/<str:restaurant_id>/', restaurant_detail, name='restaurant_detail'),
+    path('restaurants/<str:restaurant_id>/page/', restaurant_page, name='restaurant_page'),
     path('restaurants/<str:restaurant_id>/menu/', restaurant_menu, name='restaurant_menu'),
+    path('restaurants/<str:restaurant_id>/menu/bulk/', restaurant_menu_bulk, name='restaurant_menu_bulk'),
     path('restaurants/<str:restaurant_id>/rating/', restaurant_rating, name='restaurant_rating'),
+    path('dishes/search/', dish_search, name='dish_search'),
     
     # ==================== STORE PRODUCTS ====================
     path('store-products/', store_products, name='store_products'),
+    path('store-products/catalog/', product_catalog, name='product_catalog'),
+    path('store-products/inventory/', store_inventory_sync, name='store_inventory_sync'),
     path('store-products/<int:product_id>/', store_product_detail, name='store_product_detail'),
     
     # ==================== ORDERS ====================
+    path('store-orders/', store_order_inbox, name='store_order_inbox'),
     path('orders/', orders, name='orders'),
     path('orders/<str:order_id>/', order_detail, name='order_detail'),
     
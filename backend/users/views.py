@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
 from .models import (
     CustomUser, UserProfile, StoreUserProfile, RestaurantUserProfile, OTP,
     Recipe, RecipeRating, RecipeLike, RestaurantLocation, RestaurantMenu, RestaurantRating,
@@ -15,12 +16,47 @@ from .serializers import (
     ForgotPasswordSerializer, VerifyPasswordResetOTPSerializer, ResetPasswordSerializer,
     EmailVerificationSerializer, send_verification_email, send_password_reset_email,
     RecipeListSerializer, RecipeDetailSerializer, RecipeCreateUpdateSerializer,
-    RecipeRatingSerializer, RecipeLikeSerializer,
+    RecipeRatingSerializer, RecipeLikeSerializer, RecipeSearchResultSerializer, PantryRecipeSerializer,
+    TrendingRecipeSerializer,
     RestaurantListSerializer, RestaurantDetailSerializer, RestaurantMenuSerializer,
-    RestaurantRatingSerializer, NearbyRestaurantSerializer,
-    StoreProductSerializer, OrderSerializer, OrderItemSerializer, PaymentSerializer
+    RestaurantRatingSerializer, NearbyRestaurantSerializer, NearbyRestaurantResultSerializer,
+    RestaurantOpenFilterSerializer, DishSearchResultSerializer,
+    StoreProductSerializer, CatalogProductSerializer, OrderSerializer, OrderCreateSerializer, OrderFilterSerializer,
+    StoreInboxSerializer, OrderItemSerializer, PaymentSerializer
 )
+from .catalog import PRODUCT_SORTS, catalog_facets, catalog_products, full_text_enabled, rank_products
+from .geo import nearby_restaurants
+from .idempotency import (
+    HEADER as IDEMPOTENCY_HEADER, IdempotencyKeyReused, find_replay, get_key as get_idempotency_key, store_response
+)
+from .ingredients import recipes_for_pantry
+from .inventory_io import InventorySync
+from .map_tiles import MAX_ZOOM as MAP_MAX_ZOOM, get_tile
+from .menus import MenuUpsertError, upsert_menu_items
+from .nearby_cache import get_nearby_payload, grid_degrees, quantize
+from .opening_hours import minute_of_week, open_at_filter
+from .order_inbox import current_version, settled, wait_for_changes
+from .pagination import DeltaSyncPagination, KeysetPagination
+from .recipe_io import FORMATS as RECIPE_IO_FORMATS, RecipeImporter, detect_format, export_recipes, iter_records
+from .recipe_cache import get_recipe_document, get_user_overlay
+from .restaurant_page import (
+    DEFAULT_RATINGS_LIMIT, MAX_RATINGS_LIMIT, SECTIONS as PAGE_SECTIONS,
+    get_page_restaurant, page_etag, page_payload
+)
+from .search import build_match_query, search_dishes, search_recipes
+from .stock import InsufficientStock, claim_stock, confirm_reservation, reservation_expiry
+from .trending import trending_update
+from .view_counter import record_view
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from django.utils import timezone
+from decimal import Decimal
+import csv
+import json
+import uuid
 
 
 # ============================================================================
@@ -398,7 +434,11 @@ def user_dashboard(request):
     
     return Response({
         'user': UserSerializer(user).data,
-        'profile': UserProfileSerializer(profile).data if profile else None
+        'profile': UserProfileSerializer(profile).data if profile else None,
+        'stats': {
+            # recipe_list no longer counts; this COUNT is covered by recipe_author_created_idx
+            'recipes_created': user.recipes.count(),
+        }
     }, status=status.HTTP_200_OK)
 
 
@@ -410,7 +450,7 @@ def user_dashboard(request):
 @permission_classes([IsAuthenticated])
 def recipe_list(request):
     """
-    GET: Fetch all recipes (with pagination)
+    GET: Fetch recipes (cursor pagination: ?cursor=, ?page_size=; optional ?difficulty=)
     POST: Create a new recipe
     """
     if request.method == 'POST':
@@ -423,11 +463,91 @@ def recipe_list(request):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    # GET - List all recipes
-    recipes = Recipe.objects.all()
-    serializer = RecipeListSerializer(recipes, many=True, context={'request': request})
+    # GET - List recipes, newest first (cursor paginated)
+    recipes = Recipe.objects.select_related('author__profile')
+    difficulty = request.query_params.get('difficulty')
+    if difficulty:
+        recipes = recipes.filter(difficulty=difficulty)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(recipes, request)
+    serializer = RecipeListSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data, key='recipes')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recipe_search(request):
+    """
+    Full-text search over recipe title, description, ingredients and dietary tags
+    Query params: q (required), difficulty, cuisine_type, limit (max 50), offset
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+    except ValueError:
+        return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    recipes = search_recipes(
+        query,
+        difficulty=request.query_params.get('difficulty'),
+        cuisine_type=request.query_params.get('cuisine_type'),
+        limit=limit,
+        offset=offset,
+    )
+    serializer = RecipeSearchResultSerializer(recipes, many=True, context={'request': request})
+    return Response({
+        'query': query,
+        'count': len(recipes),
+        'recipes': serializer.data
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recipe_trending(request):
+    """
+    Top trending recipes (likes, ratings and views with exponential time decay)
+    Query params: limit (default 10, max 50)
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    recipes = Recipe.objects.select_related('author__profile').order_by('-trending_score', 'id')[:limit]
+    serializer = TrendingRecipeSerializer(recipes, many=True, context={'request': request})
+    return Response({
+        'count': len(serializer.data),
+        'recipes': serializer.data
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recipe_pantry_search(request):
+    """
+    "What can I cook": recipes ranked by how much of their ingredients a pantry covers
+    Query params: ingredients (comma-separated, required), max_missing, limit (max 50)
+    """
+    pantry = [item for item in request.query_params.get('ingredients', '').split(',') if item.strip()]
+    if not pantry:
+        return Response({'error': 'ingredients is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        max_missing = request.query_params.get('max_missing')
+        max_missing = max(int(max_missing), 0) if max_missing not in (None, '') else None
+    except ValueError:
+        return Response({'error': 'limit and max_missing must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    recipes = recipes_for_pantry(pantry, max_missing=max_missing, limit=limit)
+    serializer = PantryRecipeSerializer(recipes, many=True, context={'request': request})
     return Response({
-        'count': recipes.count(),
+        'count': len(recipes),
         'recipes': serializer.data
     }, status=status.HTTP_200_OK)
 
@@ -441,15 +561,23 @@ def recipe_detail(request, recipe_id):
     DELETE: Delete recipe (author only)
     """
     try:
-        recipe = Recipe.objects.get(id=recipe_id)
-    except Recipe.DoesNotExist:
+        recipe_id = uuid.UUID(recipe_id)
+    except ValueError:
         return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
     
     if request.method == 'GET':
-        recipe.views_count += 1
-        recipe.save()
-        serializer = RecipeDetailSerializer(recipe, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Shared cached document + per-user overlay
+        try:
+            data = get_recipe_document(recipe_id)
+        except Recipe.DoesNotExist:
+            return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
+        record_view(recipe_id)
+        return Response({**data, **get_user_overlay(recipe_id, request.user)}, status=status.HTTP_200_OK)
+    
+    try:
+        recipe = Recipe.objects.get(id=recipe_id)
+    except Recipe.DoesNotExist:
+        return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
     
     # Check if user is author
     if recipe.author != request.user:
@@ -479,14 +607,17 @@ def recipe_like(request, recipe_id):
     except Recipe.DoesNotExist:
         return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    like = RecipeLike.objects.filter(recipe=recipe, user=request.user).first()
-    
-    if like:
-        like.delete()
-        return Response({'message': 'Like removed', 'liked': False}, status=status.HTTP_200_OK)
-    else:
+    with transaction.atomic():
+        deleted, _ = RecipeLike.objects.filter(recipe=recipe, user=request.user).delete()
+        if deleted:
+            Recipe.objects.filter(pk=recipe.pk).update(likes_count=F('likes_count') - 1)
+            return Response({'message': 'Like removed', 'liked': False}, status=status.HTTP_200_OK)
+        
         RecipeLike.objects.create(recipe=recipe, user=request.user)
-        return Response({'message': 'Recipe liked', 'liked': True}, status=status.HTTP_201_CREATED)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            likes_count=F('likes_count') + 1, **trending_update('like')
+        )
+    return Response({'message': 'Recipe liked', 'liked': True}, status=status.HTTP_201_CREATED)
 
 
 @api_view(['GET', 'POST', 'PUT', 'DELETE'])
@@ -510,57 +641,194 @@ def recipe_rating(request, recipe_id):
         return Response({'message': 'No rating found'}, status=status.HTTP_404_NOT_FOUND)
     
     if request.method == 'POST' or request.method == 'PUT':
-        data = request.data
+        serializer = RecipeRatingSerializer(rating, data=request.data, partial=rating is not None)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if rating:
-            serializer = RecipeRatingSerializer(rating, data=data, partial=True)
-        else:
-            serializer = RecipeRatingSerializer(data=data)
-        
-        if serializer.is_valid():
-            if rating:
-                rating = serializer.save()
-            else:
+        try:
+            with transaction.atomic():
+                # Re-read under a row lock: the aggregates take the difference
+                # from the value this transaction replaces
+                serializer.instance = recipe.ratings.select_for_update().filter(user=request.user).first()
+                created = serializer.instance is None
+                if created and 'rating' not in serializer.validated_data:
+                    return Response({'error': 'No rating found'}, status=status.HTTP_404_NOT_FOUND)
+                old_value = 0 if created else serializer.instance.rating
                 rating = serializer.save(recipe=recipe, user=request.user)
-            return Response({
-                'message': 'Rating saved successfully',
-                'rating': RecipeRatingSerializer(rating).data
-            }, status=status.HTTP_201_CREATED if not rating else status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    rating_sum=F('rating_sum') + (rating.rating - old_value),
+                    rating_count=F('rating_count') + (1 if created else 0),
+                    **Recipe.star_histogram_update(added=rating.rating, removed=old_value),
+                    # Only new ratings are activity; editing one must not inflate the score
+                    **(trending_update('rating', rating.rating) if created else {}),
+                )
+        except IntegrityError:
+            # A concurrent request created this user's rating first
+            return Response({'error': 'Rating was changed by another request, please retry'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({
+            'message': 'Rating saved successfully',
+            'rating': RecipeRatingSerializer(rating).data
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
     
     if request.method == 'DELETE':
-        if rating:
+        with transaction.atomic():
+            rating = recipe.ratings.select_for_update().filter(user=request.user).first()
+            if rating is None:
+                return Response({'error': 'No rating found'}, status=status.HTTP_404_NOT_FOUND)
             rating.delete()
-            return Response({'message': 'Rating deleted'}, status=status.HTTP_200_OK)
-        return Response({'error': 'No rating found'}, status=status.HTTP_404_NOT_FOUND)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                rating_sum=F('rating_sum') - rating.rating,
+                rating_count=F('rating_count') - 1,
+                **Recipe.star_histogram_update(removed=rating.rating),
+            )
+        return Response({'message': 'Rating deleted'}, status=status.HTTP_200_OK)
 
 
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def user_recipes(request):
-    """Get current user's recipes"""
-    recipes = Recipe.objects.filter(author=request.user)
-    serializer = RecipeListSerializer(recipes, many=True, context={'request': request})
+def recipe_import(request):
+    """
+    Bulk import recipes from an uploaded NDJSON or CSV file (admin only)
+    Expected fields: file; optional file_format (ndjson/csv), dry_run
+    Records may set author_email; otherwise the admin becomes the author.
+    """
+    if not request.user.is_admin:
+        return Response({'error': 'Only admins can access this endpoint'}, status=status.HTTP_403_FORBIDDEN)
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    fmt = request.data.get('file_format') or detect_format(upload.name)
+    if fmt not in RECIPE_IO_FORMATS:
+        return Response({'error': 'file_format must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+    importer = RecipeImporter(request.user, dry_run=dry_run)
+    try:
+        report = importer.run(iter_records(upload, fmt))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        # Chunks before the unreadable part are already imported; say how many
+        return Response({'error': f'Could not read file: {exc}', 'report': importer.report},
+                        status=status.HTTP_400_BAD_REQUEST)
     return Response({
-        'count': recipes.count(),
-        'recipes': serializer.data
+        'message': 'Import validated' if dry_run else 'Import finished',
+        'report': report
     }, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recipe_export(request):
+    """
+    Stream every recipe as NDJSON or CSV (admin only)
+    Query params: file_format (ndjson/csv); `format` is taken by DRF's renderer override
+    """
+    if not request.user.is_admin:
+        return Response({'error': 'Only admins can access this endpoint'}, status=status.HTTP_403_FORBIDDEN)
+    
+    fmt = request.query_params.get('file_format', 'ndjson')
+    if fmt not in RECIPE_IO_FORMATS:
+        return Response({'error': 'file_format must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_recipes(fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="recipes.{fmt}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recipe_ratings(request, recipe_id):
+    """
+    All ratings of a recipe, newest first (cursor paginated)
+    Query params: stars (1-5), cursor, page_size
+    """
+    try:
+        recipe = Recipe.objects.only('pk').get(id=recipe_id)
+    except (Recipe.DoesNotExist, ValidationError):
+        return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    ratings = RecipeRating.objects.filter(recipe=recipe).select_related('user')
+    stars = request.query_params.get('stars')
+    if stars:
+        if stars not in {'1', '2', '3', '4', '5'}:
+            return Response({'error': 'stars must be between 1 and 5'}, status=status.HTTP_400_BAD_REQUEST)
+        ratings = ratings.filter(rating=int(stars))
+    
+    paginator = KeysetPagination(ordering=RecipeRating.RECENT_ORDERING)
+    page = paginator.paginate_queryset(ratings, request)
+    serializer = RecipeRatingSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data, key='ratings')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_recipes(request):
+    """Get current user's recipes (cursor paginated)"""
+    recipes = Recipe.objects.filter(author=request.user).select_related('author__profile')
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(recipes, request)
+    serializer = RecipeListSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data, key='recipes')
+
+
 # ============================================================================
 # RESTAURANT ENDPOINTS
 # ============================================================================
 
+# Sort options for restaurant_list: keyset ordering, always ending in a unique column
+RESTAURANT_SORTS = {
+    'rating': ('-sort_rating', 'id'),
+    'newest': ('-created_at', 'id'),
+    'name': ('restaurant_name', 'id'),
+}
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def restaurant_list(request):
-    """Get all restaurants with locations"""
-    restaurants = RestaurantUserProfile.objects.filter(is_verified=True).prefetch_related('location')
-    serializer = RestaurantListSerializer(restaurants, many=True)
-    return Response({
-        'count': restaurants.count(),
-        'restaurants': serializer.data
-    }, status=status.HTTP_200_OK)
+    """
+    Get all verified restaurants with locations (cursor pagination: ?cursor=, ?page_size=)
+    Filters: city, country, cuisine_type (exact), is_open (true/false), min_rating,
+    open_now (true/false) or open_at (ISO datetime)
+    Sort: ?sort=rating (default), newest or name
+    """
+    params = request.query_params
+    sort = params.get('sort', 'rating')
+    if sort not in RESTAURANT_SORTS:
+        return Response({'error': f"sort must be one of {', '.join(RESTAURANT_SORTS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    open_filter = RestaurantOpenFilterSerializer(data=params)
+    if not open_filter.is_valid():
+        return Response(open_filter.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    restaurants = (
+        RestaurantUserProfile.objects.filter(is_verified=True, location__isnull=False)
+        .select_related('location')
+        .annotate(sort_rating=F('location__rating_avg'))
+    )
+    if params.get('cuisine_type'):
+        restaurants = restaurants.filter(cuisine_type=params['cuisine_type'])
+    if params.get('city'):
+        restaurants = restaurants.filter(location__city=params['city'])
+    if params.get('country'):
+        restaurants = restaurants.filter(location__country=params['country'])
+    if params.get('is_open'):
+        restaurants = restaurants.filter(location__is_open=params['is_open'].lower() in ('1', 'true', 'yes'))
+    if params.get('min_rating'):
+        try:
+            restaurants = restaurants.filter(location__rating_avg__gte=parse_price(params['min_rating']))
+        except (ValueError, ArithmeticError):
+            return Response({'error': 'min_rating must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    if open_filter.validated_data.get('open_at'):
+        restaurants = restaurants.filter(open_at_filter(open_filter.validated_data['open_at']))
+    
+    paginator = KeysetPagination(ordering=RESTAURANT_SORTS[sort])
+    page = paginator.paginate_queryset(restaurants, request)
+    serializer = RestaurantListSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data, key='restaurants')
 
 
 @api_view(['GET'])
@@ -568,7 +836,9 @@ def restaurant_list(request):
 def restaurant_detail(request, restaurant_id):
     """Get detailed restaurant information"""
     try:
-        restaurant = RestaurantUserProfile.objects.get(id=restaurant_id)
+        restaurant = RestaurantUserProfile.objects.select_related('location').prefetch_related(
+            'menu_items', Prefetch('ratings', queryset=RestaurantRating.objects.select_related('user'))
+        ).get(id=restaurant_id)
     except RestaurantUserProfile.DoesNotExist:
         return Response({'error': 'Restaurant not found'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -576,55 +846,104 @@ def restaurant_detail(request, restaurant_id):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-@api_view(['POST'])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def restaurant_page(request, restaurant_id):
+    """
+    Restaurant profile plus selected sections in one request
+    Query params: include (comma separated: location, menu, ratings, my_rating; default all),
+    ratings_limit (default 10, max 50)
+    Sends an ETag; a matching If-None-Match gets 304 after a single query.
+    """
+    include = request.query_params.get('include')
+    sections = set(include.split(',')) if include else set(PAGE_SECTIONS)
+    sections.discard('')
+    unknown = sections - set(PAGE_SECTIONS)
+    if unknown:
+        return Response({'error': f"Unknown sections: {', '.join(sorted(unknown))}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        ratings_limit = min(max(int(request.query_params.get('ratings_limit', DEFAULT_RATINGS_LIMIT)), 1),
+                            MAX_RATINGS_LIMIT)
+    except ValueError:
+        return Response({'error': 'ratings_limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        restaurant = get_page_restaurant(int(restaurant_id))
+    except (ValueError, RestaurantUserProfile.DoesNotExist):
+        return Response({'error': 'Restaurant not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    etag = page_etag(restaurant, sections, ratings_limit, request.user)
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(page_payload(restaurant, sections, ratings_limit, request.user),
+                            status=status.HTTP_200_OK)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def restaurant_nearby(request):
-    """Find nearby restaurants based on latitude, longitude and radius"""
-    from decimal import Decimal
-    import math
+    """
+    Find nearby restaurants based on latitude, longitude and radius, nearest first
+    Optional: cuisine_type, limit (k nearest), open_now or open_at (ISO datetime)
+    GET: query params; the point is snapped to a grid cell and the result is
+    cached server side and sent with ETag/Cache-Control
+    POST: JSON body; exact point, never cached
+    """
+    params = request.query_params if request.method == 'GET' else request.data
+    serializer = NearbyRestaurantSerializer(data=params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = NearbyRestaurantSerializer(data=request.data)
-    if serializer.is_valid():
-        lat = float(serializer.validated_data['latitude'])
-        lon = float(serializer.validated_data['longitude'])
-        radius = serializer.validated_data.get('radius', 10)  # km
-        cuisine = serializer.validated_data.get('cuisine_type', '').strip()
-        
-        # Get all restaurants with locations
-        restaurants = RestaurantUserProfile.objects.filter(
-            is_verified=True
-        ).prefetch_related('location').exclude(location__isnull=True)
-        
-        # Filter by radius using Haversine formula
-        nearby = []
-        for restaurant in restaurants:
-            if not restaurant.location:
-                continue
-            
-            rest_lat = float(restaurant.location.latitude)
-            rest_lon = float(restaurant.location.longitude)
-            
-            # Haversine formula
-            R = 6371  # Earth's radius in km
-            dlat = math.radians(rest_lat - lat)
-            dlon = math.radians(rest_lon - lon)
-            a = math.sin(dlat/2)**2 + math.cos(math.radians(lat)) * math.cos(math.radians(rest_lat)) * math.sin(dlon/2)**2
-            c = 2 * math.asin(math.sqrt(a))
-            distance = R * c
-            
-            if distance <= radius:
-                if cuisine and cuisine.lower() not in restaurant.cuisine_type.lower():
-                    continue
-                nearby.append(restaurant)
-        
-        serializer = RestaurantListSerializer(nearby, many=True)
-        return Response({
+    data = serializer.validated_data
+    lat, lon = float(data['latitude']), float(data['longitude'])
+    radius = data['radius']  # km
+    cuisine = data.get('cuisine_type', '').strip()
+    limit = data.get('limit')
+    open_at = data.get('open_at')
+    
+    def build(lat, lon):
+        nearby = nearby_restaurants(lat, lon, radius, cuisine=cuisine, limit=limit, open_at=open_at)
+        return {
             'count': len(nearby),
-            'restaurants': serializer.data,
+            'restaurants': NearbyRestaurantResultSerializer(nearby, many=True).data,
             'search_radius_km': radius
-        }, status=status.HTTP_200_OK)
+        }
     
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if request.method == 'POST':
+        return Response(build(lat, lon), status=status.HTTP_200_OK)
+    
+    lat, lon = quantize(lat, lon)
+    payload, etag = get_nearby_payload(lat, lon, radius, cuisine, limit, lambda: {
+        **build(lat, lon),
+        'center': {'latitude': lat, 'longitude': lon},
+        'grid_degrees': grid_degrees(),
+    }, open_minute=minute_of_week(open_at) if open_at else None)
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(payload, status=status.HTTP_200_OK)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'NEARBY_CACHE_MAX_AGE', 30))
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def restaurant_tiles(request, z, x, y):
+    """
+    Map tile z/x/y (Web Mercator) of verified restaurants
+    Below MAP_CLUSTER_MAX_ZOOM: clusters with count and centroid
+    From MAP_CLUSTER_MAX_ZOOM on: individual restaurants
+    """
+    if z > MAP_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return Response({'error': 'Tile out of range'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(get_tile(z, x, y), status=status.HTTP_200_OK)
 
 
 @api_view(['GET', 'POST'])
@@ -662,6 +981,73 @@ def restaurant_menu(request, restaurant_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['PUT', 'PATCH'])
+@permission_classes([IsAuthenticated])
+def restaurant_menu_bulk(request, restaurant_id):
+    """
+    Upsert many menu items at once (restaurant owner only)
+    Expected fields: items (list of menu items; matched by id, else by name)
+    PUT: replace the menu, deleting items not in the payload
+    PATCH: create or update the given items, leaving the others alone
+    """
+    try:
+        restaurant = RestaurantUserProfile.objects.get(id=restaurant_id)
+    except RestaurantUserProfile.DoesNotExist:
+        return Response({'error': 'Restaurant not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if restaurant.user != request.user:
+        return Response({'error': 'Only restaurant owner can edit menu'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        result = upsert_menu_items(restaurant, request.data.get('items'), replace=request.method == 'PUT')
+    except MenuUpsertError as exc:
+        return Response({'errors': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'message': 'Menu updated successfully', **result}, status=status.HTTP_200_OK)
+
+
+def parse_price(value):
+    """Decimal from a query param (a price or a rating), None if blank; NaN and infinities raise ValueError"""
+    if not value:
+        return None
+    price = Decimal(value)
+    if not price.is_finite():
+        raise ValueError(f'{value} is not a finite number')
+    return price
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dish_search(request):
+    """
+    Search dishes across all restaurant menus
+    Query params: q (full-text on name/description), min_price, max_price, category,
+    dietary (substring of dietary_info), is_available (true/false), limit (max 50), offset
+    """
+    params = request.query_params
+    try:
+        limit = min(max(int(params.get('limit', 20)), 1), 50)
+        offset = max(int(params.get('offset', 0)), 0)
+        min_price = parse_price(params.get('min_price'))
+        max_price = parse_price(params.get('max_price'))
+    except (ValueError, ArithmeticError):
+        return Response({'error': 'limit, offset and prices must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    is_available = params.get('is_available')
+    if is_available is not None:
+        is_available = is_available.lower() in ('1', 'true', 'yes')
+    
+    query = params.get('q', '').strip()
+    dishes = search_dishes(
+        query, min_price=min_price, max_price=max_price, category=params.get('category'),
+        dietary=params.get('dietary'), is_available=is_available, limit=limit, offset=offset,
+    )
+    return Response({
+        'query': query,
+        'count': len(dishes),
+        'dishes': DishSearchResultSerializer(dishes, many=True).data
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['GET', 'POST', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def restaurant_rating(request, restaurant_id):
@@ -679,28 +1065,41 @@ def restaurant_rating(request, restaurant_id):
         return Response({'message': 'No rating found'}, status=status.HTTP_404_NOT_FOUND)
     
     if request.method == 'POST' or request.method == 'PUT':
-        data = request.data
-        if rating:
-            serializer = RestaurantRatingSerializer(rating, data=data, partial=True)
-        else:
-            serializer = RestaurantRatingSerializer(data=data)
+        serializer = RestaurantRatingSerializer(rating, data=request.data, partial=rating is not None)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if serializer.is_valid():
-            if rating:
-                rating = serializer.save()
-            else:
+        try:
+            with transaction.atomic():
+                # Re-read under a row lock, as recipe_rating does
+                serializer.instance = restaurant.ratings.select_for_update().filter(user=request.user).first()
+                created = serializer.instance is None
+                if created and 'rating' not in serializer.validated_data:
+                    return Response({'error': 'No rating found'}, status=status.HTTP_404_NOT_FOUND)
+                old_value = 0 if created else serializer.instance.rating
                 rating = serializer.save(restaurant=restaurant, user=request.user)
-            return Response({
-                'message': 'Rating saved',
-                'rating': RestaurantRatingSerializer(rating).data
-            }, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                RestaurantLocation.objects.filter(restaurant=restaurant).update(
+                    **RestaurantLocation.rating_update(rating.rating - old_value, 1 if created else 0)
+                )
+        except IntegrityError:
+            # A concurrent request created this user's rating first
+            return Response({'error': 'Rating was changed by another request, please retry'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({
+            'message': 'Rating saved',
+            'rating': RestaurantRatingSerializer(rating).data
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
     
     if request.method == 'DELETE':
-        if rating:
+        with transaction.atomic():
+            rating = restaurant.ratings.select_for_update().filter(user=request.user).first()
+            if rating is None:
+                return Response({'error': 'No rating found'}, status=status.HTTP_404_NOT_FOUND)
             rating.delete()
-            return Response({'message': 'Rating deleted'}, status=status.HTTP_200_OK)
-        return Response({'error': 'No rating found'}, status=status.HTTP_404_NOT_FOUND)
+            RestaurantLocation.objects.filter(restaurant=restaurant).update(
+                **RestaurantLocation.rating_update(-rating.rating, -1)
+            )
+        return Response({'message': 'Rating deleted'}, status=status.HTTP_200_OK)
 
 
 # ============================================================================
@@ -747,7 +1146,7 @@ def store_products(request):
     except StoreUserProfile.DoesNotExist:
         return Response({'error': 'Store profile not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    serializer = StoreProductSerializer(data=request.data)
+    serializer = StoreProductSerializer(data=request.data, context={'store': store})
     if serializer.is_valid():
         product = serializer.save(store=store)
         return Response({
@@ -757,6 +1156,84 @@ def store_products(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def product_catalog(request):
+    """
+    Browse products of all verified stores (cursor pagination: ?cursor=, ?page_size=)
+    Query params: q (full-text on name/description/category), category, min_price, max_price,
+    in_stock (true/false), store_id
+    Sort: ?sort=relevance (default with q), newest (default without), price, price_desc or name
+    Facets (category, price range and in-stock counts) cover the whole result set.
+    """
+    params = request.query_params
+    query = params.get('q', '').strip()
+    sort = params.get('sort') or ('relevance' if query else 'newest')
+    if sort not in PRODUCT_SORTS:
+        return Response({'error': f"sort must be one of {', '.join(PRODUCT_SORTS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        min_price = parse_price(params.get('min_price'))
+        max_price = parse_price(params.get('max_price'))
+        store_id = int(params['store_id']) if params.get('store_id') else None
+    except (ValueError, ArithmeticError):
+        return Response({'error': 'Prices and store_id must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    category = params.get('category', '').strip()
+    products = catalog_products(
+        query, min_price=min_price, max_price=max_price, store_id=store_id,
+        in_stock=params.get('in_stock', '').lower() in ('1', 'true', 'yes'),
+    )
+    facets = catalog_facets(products, category)
+    if category:
+        products = products.filter(category__iexact=category)
+    if sort == 'relevance':
+        # Without matchable text or FTS5 there is nothing to rank on
+        if full_text_enabled() and build_match_query(query) is not None:
+            products = rank_products(products, query)
+        else:
+            sort = 'newest'
+    
+    paginator = KeysetPagination(ordering=PRODUCT_SORTS[sort])
+    page = paginator.paginate_queryset(products.select_related('store'), request)
+    response = paginator.get_paginated_response(CatalogProductSerializer(page, many=True).data, key='products')
+    response.data.update(query=query, sort=sort, count=facets.pop('count'), facets=facets)
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def store_inventory_sync(request):
+    """
+    Create or update the caller's products from an uploaded NDJSON or CSV file, matched on sku
+    Expected fields: file; optional file_format (ndjson/csv), dry_run
+    Streams an NDJSON report: one result per record, then a {"summary": ...} line.
+    """
+    if request.user.role != 'store':
+        return Response({'error': 'Only store users can sync inventory'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        store = StoreUserProfile.objects.get(user=request.user)
+    except StoreUserProfile.DoesNotExist:
+        return Response({'error': 'Store profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = request.data.get('file_format') or detect_format(upload.name)
+    if fmt not in RECIPE_IO_FORMATS:
+        return Response({'error': 'file_format must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+    sync = InventorySync(store, dry_run=dry_run)
+    
+    def report():
+        for result in sync.run(iter_records(upload, fmt)):
+            yield json.dumps(result) + '\n'
+        yield json.dumps({'summary': {**sync.summary, 'dry_run': dry_run}}) + '\n'
+    
+    return StreamingHttpResponse(report(), content_type='application/x-ndjson')
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def store_product_detail(request, product_id):
@@ -796,87 +1273,181 @@ def store_product_detail(request, product_id):
 # ORDER ENDPOINTS
 # ============================================================================
 
+ORDER_TAX_RATE = Decimal('0.10')
+
+
+def order_items_prefetch():
+    return Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id'))
+
+
+def with_order_items(queryset):
+    """Everything OrderSerializer reads, in two queries however many orders there are"""
+    return queryset.select_related('customer', 'store').prefetch_related(order_items_prefetch())
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def orders(request):
     """
-    GET: Get user's orders
+    GET: Get user's orders, newest first (cursor pagination: ?cursor=, ?page_size=)
+    Filters: status, store_id, created_after, created_before (ISO datetimes)
     POST: Create a new order
+    Expected fields: store_id, items [{product_id, quantity}]; optional delivery_address, notes
+    An Idempotency-Key header makes retries safe: repeats get the original response.
     """
     if request.method == 'GET':
-        user_orders = Order.objects.filter(customer=request.user).order_by('-created_at')
-        serializer = OrderSerializer(user_orders, many=True)
-        return Response({
-            'count': user_orders.count(),
-            'orders': serializer.data
-        }, status=status.HTTP_200_OK)
+        filters = OrderFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = filters.validated_data
+        
+        user_orders = with_order_items(Order.objects.filter(customer=request.user))
+        if 'status' in params:
+            user_orders = user_orders.filter(status=params['status'])
+        if 'store_id' in params:
+            user_orders = user_orders.filter(store_id=params['store_id'])
+        if 'created_after' in params:
+            user_orders = user_orders.filter(created_at__gte=params['created_after'])
+        if 'created_before' in params:
+            user_orders = user_orders.filter(created_at__lt=params['created_before'])
+        
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(user_orders, request)
+        serializer = OrderSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data, key='orders')
     
     # POST - Create order
     data = request.data
-    
-    # Get or create store
-    store_id = data.get('store_id')
-    if not store_id:
-        return Response({'error': 'store_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        key = get_idempotency_key(request)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    if key:
+        # A retry of an order that already went through gets the original response
+        try:
+            replay = find_replay(request.user, 'orders', key, data)
+        except IdempotencyKeyReused:
+            return Response({'error': f'{IDEMPOTENCY_HEADER} was already used for a different order'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if replay is not None:
+            return replay
+    
+    serializer = OrderCreateSerializer(data=data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    order_data = serializer.validated_data
     
     try:
-        store = StoreUserProfile.objects.get(id=store_id)
+        store = StoreUserProfile.objects.get(id=order_data['store_id'])
     except StoreUserProfile.DoesNotExist:
         return Response({'error': 'Store not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Create order
-    import uuid
-    order = Order.objects.create(
-        order_id=str(uuid.uuid4()),
-        customer=request.user,
-        store=store,
-        delivery_address=data.get('delivery_address', ''),
-        notes=data.get('notes', '')
-    )
+    # Price every line in memory from one query
+    lines = order_data['items']
+    products = store.products.in_bulk({line['product_id'] for line in lines})
+    for line in lines:
+        if line['product_id'] not in products:
+            return Response({'error': f"Product {line['product_id']} not found"}, status=status.HTTP_404_NOT_FOUND)
     
-    # Add order items
-    items_data = data.get('items', [])
-    subtotal = 0
+    quantities = {}
+    for line in lines:
+        quantities[line['product_id']] = quantities.get(line['product_id'], 0) + line['quantity']
+    subtotal = sum(products[line['product_id']].price * line['quantity'] for line in lines)
+    tax = (subtotal * ORDER_TAX_RATE).quantize(Decimal('0.01'))
     
-    for item in items_data:
-        product_id = item.get('product_id')
-        quantity = item.get('quantity', 1)
-        
+    try:
+        with transaction.atomic():
+            # Hold the stock until the order is paid or the reservation expires
+            try:
+                claim_stock(quantities)
+            except InsufficientStock as exc:
+                return Response({'error': f'{products[exc.product_id].name} has insufficient stock'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            
+            order = Order.objects.create(
+                order_id=str(uuid.uuid4()),
+                customer=request.user,
+                store=store,
+                status='payment_pending',
+                subtotal=subtotal,
+                tax=tax,
+                total_amount=subtotal + tax,
+                delivery_address=order_data['delivery_address'],
+                notes=order_data['notes'],
+                reservation_expires_at=reservation_expiry(),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=products[line['product_id']],
+                    quantity=line['quantity'],
+                    price=products[line['product_id']].price,
+                    subtotal=products[line['product_id']].price * line['quantity'],
+                )
+                for line in lines
+            ])
+            prefetch_related_objects([order], order_items_prefetch())
+            
+            response = Response({
+                'message': 'Order created successfully',
+                'order': OrderSerializer(order).data
+            }, status=status.HTTP_201_CREATED)
+            if key:
+                store_response(request.user, 'orders', key, data, response)
+    except IntegrityError:
+        # A concurrent request with this key committed first; ours rolled back
         try:
-            product = StoreProduct.objects.get(id=product_id)
-        except StoreProduct.DoesNotExist:
-            order.delete()
-            return Response({'error': f'Product {product_id} not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        if product.stock < quantity:
-            order.delete()
-            return Response({'error': f'{product.name} has insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        item_subtotal = float(product.price) * quantity
-        OrderItem.objects.create(
-            order=order,
-            product=product,
-            quantity=quantity,
-            price=product.price,
-            subtotal=item_subtotal
-        )
-        subtotal += item_subtotal
+            replay = key and find_replay(request.user, 'orders', key, data)
+        except IdempotencyKeyReused:
+            return Response({'error': f'{IDEMPOTENCY_HEADER} was already used for a different order'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if not replay:
+            raise
+        return replay
     
-    # Calculate tax and total
-    tax = round(subtotal * 0.1, 2)  # 10% tax
-    total = subtotal + tax
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def store_order_inbox(request):
+    """
+    Orders placed at the caller's store, oldest change first, for delta sync
+    Query params: since (cursor from the previous response), status, page_size,
+    wait (long-poll: hold up to this many seconds, capped by ORDER_INBOX_MAX_WAIT,
+    until an order changes)
+    With a status filter, orders that move out of that status are not reported.
+    Changes are listed once they are ORDER_INBOX_SETTLE_SECONDS old.
+    """
+    if request.user.role != 'store':
+        return Response({'error': 'Only store users can access this'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        store = StoreUserProfile.objects.only('pk').get(user=request.user)
+    except StoreUserProfile.DoesNotExist:
+        return Response({'error': 'Store profile not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Update order totals
-    order.subtotal = subtotal
-    order.tax = tax
-    order.total_amount = total
-    order.status = 'payment_pending'
-    order.save()
+    filters = StoreInboxSerializer(data=request.query_params)
+    if not filters.is_valid():
+        return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+    params = filters.validated_data
+    wait = min(params['wait'], getattr(settings, 'ORDER_INBOX_MAX_WAIT', 25))
     
-    return Response({
-        'message': 'Order created successfully',
-        'order': OrderSerializer(order).data
-    }, status=status.HTTP_201_CREATED)
+    inbox = with_order_items(Order.objects.filter(store=store))
+    if 'status' in params:
+        inbox = inbox.filter(status=params['status'])
+    
+    paginator = DeltaSyncPagination()
+    version = current_version(store.pk)
+    page = paginator.paginate_queryset(settled(inbox), request)
+    
+    def has_changes():
+        return paginator.pending(settled(inbox), request).exists()
+    
+    if not page and wait and wait_for_changes(store.pk, version, has_changes, wait):
+        page = paginator.paginate_queryset(settled(inbox), request)
+    
+    serializer = OrderSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data, key='orders')
 
 
 @api_view(['GET', 'PUT'])
@@ -943,24 +1514,30 @@ def process_payment(request):
             'payment': PaymentSerializer(order.payment).data
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    import uuid
-    # Create payment record
-    payment = Payment.objects.create(
-        payment_id=str(uuid.uuid4()),
-        order=order,
-        amount=order.total_amount,
-        payment_method=payment_method,
-        status='pending'
-    )
-    
-    # Demo payment - automatically mark as completed
-    payment.status = 'completed'
-    payment.transaction_id = f'DEMO-{str(uuid.uuid4())[:8].upper()}'
-    payment.save()
-    
-    # Update order status
-    order.status = 'paid'
-    order.save()
+    with transaction.atomic():
+        # The reserved stock becomes the customer's, unless the hold already lapsed
+        if not confirm_reservation(order):
+            transaction.set_rollback(True)
+            return Response({'error': 'The stock reservation for this order has expired, please order again'},
+                            status=status.HTTP_409_CONFLICT)
+        
+        # Create payment record
+        payment = Payment.objects.create(
+            payment_id=str(uuid.uuid4()),
+            order=order,
+            amount=order.total_amount,
+            payment_method=payment_method,
+            status='pending'
+        )
+        
+        # Demo payment - automatically mark as completed
+        payment.status = 'completed'
+        payment.transaction_id = f'DEMO-{str(uuid.uuid4())[:8].upper()}'
+        payment.save()
+        
+        # Update order status
+        order.status = 'paid'
+        order.save()
     
     return Response({
         'message': 'Payment processed successfully (Demo)',